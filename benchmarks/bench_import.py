@@ -0,0 +1,84 @@
+"""
+Measure the cold import time of cgcpluginlib modules with python -X importtime and fail if one exceeds its budget.
+
+Every import runs in a fresh interpreter, the median of several runs is compared with the budget. Modules that must stay lazy are checked as well, for example watchdog must not be loaded by importing cgcpluginlib.cpl.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 7] [--scale 1.0] [--top 10]
+
+Exits with status 1 when a budget is exceeded, so it can run in CI. Use --scale on slow machines.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# module -> (budget in ms of cumulative import time, modules that must not be imported with it)
+BUDGETS = {
+    'cgcpluginlib': (8.0, ['watchdog', 'numpy', 'dataclasses']),
+    'cgcpluginlib.cpl': (20.0, ['watchdog', 'numpy', 'dataclasses']),
+    'cgcpluginlib.pluginrequest': (20.0, ['watchdog', 'numpy']),
+    'cgcpluginlib.ostreamvisual': (25.0, ['watchdog', 'numpy']),
+}
+
+
+def measure(module: str, forbidden: list) -> dict:
+    """
+    Import a module in a fresh interpreter.
+
+    :return: The cumulative import time in ms, the self time per imported module and the forbidden modules that were loaded.
+    """
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([name for name in {forbidden!r} if name in sys.modules]))")
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, check=True)
+
+    self_times = {}
+    total = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        self_times[name] = int(self_us) / 1000
+        if name == module:
+            total = int(cumulative_us) / 1000
+    return {'total_ms': total, 'self_ms': self_times, 'loaded_forbidden': json.loads(result.stdout)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget by this factor')
+    parser.add_argument('--top', type=int, default=10, help='Show the slowest imports of each module')
+    args = parser.parse_args()
+
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        runs = [measure(module, forbidden) for _ in range(args.runs)]
+        median = statistics.median(run['total_ms'] for run in runs)
+        loaded = runs[-1]['loaded_forbidden']
+        budget *= args.scale
+        ok = median <= budget and not loaded
+        failed |= not ok
+
+        slowest = sorted(runs[-1]['self_ms'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(json.dumps({
+            'module': module,
+            'median_ms': round(median, 2),
+            'budget_ms': budget,
+            'loaded_forbidden': loaded,
+            'ok': ok,
+            'slowest_self_ms': {name: round(ms, 2) for name, ms in slowest},
+        }))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
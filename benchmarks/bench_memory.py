@@ -0,0 +1,95 @@
+"""
+Measure the memory and allocation cost of the slotted visual object and geo dataclasses against __dict__ based equivalents.
+
+Usage:
+    python benchmarks/bench_memory.py [--count 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cgcpluginlib import GeoLocationBase, VoBox, VoVertex, JsonObject  # noqa: E402
+from cgcpluginlib.visualobject import VisualObjectType  # noqa: E402
+
+
+# __dict__ based layouts the slotted classes replaced
+@dataclass(repr=False)
+class DictGeoLocationBase(JsonObject):
+    latitude: int = 0
+    longitude: int = 0
+    altitude: int = 0
+
+
+@dataclass(repr=False)
+class DictVoVertex(JsonObject):
+    x: float = 0.0
+    y: float = 0.0
+
+
+@dataclass(repr=False)
+class DictVoBox(JsonObject):
+    name: str = ""
+    xmin: float = 0.0
+    ymin: float = 0.0
+    filterValue: Optional[float] = None
+    clickable: Optional[str] = None
+    labelType: Optional[str] = None
+    outlineColourIndex: Optional[int] = None
+    marker: Optional[object] = None
+    xmax: float = 0.0
+    ymax: float = 0.0
+    fill: Optional[int] = None
+
+    def __post_init__(self):
+        self.visualObjectType = VisualObjectType.BOX
+
+
+CASES = [
+    ('GeoLocationBase', GeoLocationBase, DictGeoLocationBase,
+     lambda cls, i: cls(latitude=i, longitude=i, altitude=i)),
+    ('VoVertex', VoVertex, DictVoVertex,
+     lambda cls, i: cls(x=i * 0.5, y=i * 0.25)),
+    ('VoBox', VoBox, DictVoBox,
+     lambda cls, i: cls(name='box', xmin=i * 0.5, ymin=i * 0.25, xmax=i + 10.5, ymax=i + 20.5, filterValue=0.5)),
+]
+
+
+def measure(cls, make, count: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [make(cls, i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Subtract the list holding the objects
+    per_object = (size - sys.getsizeof(objects)) / count
+    del objects
+    return {'bytes_per_object': round(per_object, 1), 'construct_us_per_object': round(elapsed / count * 1e6, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, slotted_cls, dict_cls, make in CASES:
+        slotted = measure(slotted_cls, make, args.count)
+        legacy = measure(dict_cls, make, args.count)
+        print(json.dumps({
+            'class': name,
+            'slots': slotted,
+            'dict': legacy,
+            'bytes_saved_per_object': round(legacy['bytes_per_object'] - slotted['bytes_per_object'], 1),
+            'json_identical': make(slotted_cls, 1).json() == make(dict_cls, 1).json(),
+        }))
+
+
+if __name__ == '__main__':
+    main()
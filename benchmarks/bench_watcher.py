@@ -0,0 +1,87 @@
+"""
+Compare the idle CPU usage and event-to-callback latency of the file watcher modes.
+
+Each mode runs in its own process because watcher threads cannot be stopped.
+
+Usage:
+    python benchmarks/bench_watcher.py [--idle 5] [--frames 50] [--fps 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def run_child(mode: str, idle: float, frames: int, fps: float) -> dict:
+    from cgcpluginlib.cpl import WatcherMode, start_image_watcher
+
+    with tempfile.TemporaryDirectory() as folder:
+        stop_file = os.path.join(folder, 'stop.json')
+        latencies = []
+        write_times = {}
+        received = threading.Event()
+
+        def callback(path: str):
+            now = time.perf_counter()
+            written = write_times.get(path)
+            if written is not None:
+                latencies.append(now - written)
+            received.set()
+
+        start_image_watcher(folder, stop_file, callback,
+                            mode=WatcherMode(mode))
+
+        cpu_start = time.process_time()
+        time.sleep(idle)
+        idle_cpu = (time.process_time() - cpu_start) / idle
+
+        payload = b'\xff\xd8' + os.urandom(32 * 1024) + b'\xff\xd9'
+        for idx in range(frames):
+            path = os.path.join(folder, f'frame_{idx:06d}.jpg')
+            received.clear()
+            write_times[path] = time.perf_counter()
+            with open(path, 'wb') as f:
+                f.write(payload)
+            received.wait(1.0)
+            time.sleep(1.0 / fps)
+
+    return {
+        'mode': mode,
+        'idle_cpu_percent': round(idle_cpu * 100, 2),
+        'frames': frames,
+        'delivered': len(latencies),
+        'latency_ms_median': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        'latency_ms_max': round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--idle', type=float, default=5.0,
+                        help='Seconds to measure idle CPU for')
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--fps', type=float, default=10.0)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.child, args.idle, args.frames, args.fps)
+        print(json.dumps(result))
+        return
+
+    for mode in ('POLL', 'EVENT'):
+        output = subprocess.run([sys.executable, __file__, '--child', mode, '--idle', str(args.idle),
+                                 '--frames', str(args.frames), '--fps', str(args.fps)],
+                                check=True, capture_output=True, text=True).stdout
+        print(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+A synthetic producer that writes camera frames or telemetry files into a folder at a fixed rate, like the ground control system does for a running plugin.
+
+Usage:
+    python benchmarks/producer.py --folder /tmp/frames --kind jpeg --fps 30 --duration 10
+    python benchmarks/producer.py --folder /tmp/geolocation --kind geolocation --fps 10
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# A minimal JPEG: start of image, padding, end of image. Watchers only look at the extension.
+_JPEG_START = b'\xff\xd8'
+_JPEG_END = b'\xff\xd9'
+
+
+def _geolocation(idx: int) -> dict:
+    return {
+        'iStreamType': 'GEOLOCATION', 'vehicleId': 'bench', 'channelId': '0',
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()) + f'.{idx % 1000:03d}Z',
+        'position': {'geolocation': {'latitude': -338688000 + idx, 'longitude': 1512093000 + idx, 'altitude': 12000},
+                     'angular': {'roll': 10, 'pitch': -200, 'yaw': (idx * 10) % 36000}},
+        'velocity': {'geolocation': {'latitude': 5, 'longitude': 5, 'altitude': 0}},
+    }
+
+
+def _gimbal(idx: int) -> dict:
+    return {'iStreamType': 'GIMBAL', 'vehicleId': 'bench', 'channelId': '0', 'time': '2024-01-01T00:00:00.000Z',
+            'gimbal': {'roll': 0, 'pitch': -9000, 'yaw': (idx * 10) % 36000}}
+
+
+def _battery(idx: int) -> dict:
+    return {'iStreamType': 'BATTERY', 'vehicleId': 'bench', 'channelId': '0', 'time': '2024-01-01T00:00:00.000Z',
+            'percent': 100 - idx % 100, 'voltage': 15400, 'current': -2100, 'cellVoltages': [3850, 3851, 3849, 3850],
+            'numberOfDischarges': 42, 'fullChargeCapacity': [5000], 'designCapacity': 5200, 'temperature': 31}
+
+
+def _signal_strength(idx: int) -> dict:
+    return {'iStreamType': 'SIGNAL_STRENGTH', 'vehicleId': 'bench', 'channelId': '0', 'time': '2024-01-01T00:00:00.000Z',
+            'level': 4, 'dbm': -67, 'standard': 'LTE', 'uplink': 12000, 'downlink': 48000}
+
+
+# kind -> function building the json of sample idx
+TELEMETRY: Dict[str, Callable[[int], dict]] = {
+    'geolocation': _geolocation,
+    'gimbal': _gimbal,
+    'battery': _battery,
+    'signalstrength': _signal_strength,
+}
+
+
+def sample_bytes(kind: str, idx: int = 0, jpeg_size: int = 64 * 1024) -> bytes:
+    """
+    The content of sample idx of a kind: 'jpeg', 'json' (an empty object) or one of TELEMETRY.
+    """
+    if kind == 'jpeg':
+        return _JPEG_START + os.urandom(jpeg_size) + _JPEG_END
+    if kind == 'json':
+        return b'{}'
+    return json.dumps(TELEMETRY[kind](idx)).encode()
+
+
+class SyntheticProducer:
+    """
+    Write numbered files into a folder from a background thread at a fixed rate.
+
+    The time just before each file is opened is recorded, so a consumer can compute the latency from write to callback.
+    """
+
+    def __init__(self, folder: str, kind: str = 'jpeg', fps: float = 30.0, jpeg_size: int = 64 * 1024, count: Optional[int] = None):
+        """
+        Parameters:
+          - folder: The folder to write to, created if needed.
+          - kind: 'jpeg', 'json' or one of TELEMETRY.
+          - fps: Files written per second.
+          - jpeg_size: The size of each JPEG frame in bytes.
+          - count: Stop after this many files. Runs until stop() by default.
+        """
+        self.folder = folder
+        self.kind = kind
+        self.fps = fps
+        self.count = count
+        self.extension = '.jpg' if kind == 'jpeg' else '.json'
+        # JPEG content is generated once, random bytes are slow to make
+        self._jpeg = sample_bytes('jpeg', jpeg_size=jpeg_size) if kind == 'jpeg' else None
+        self.write_times: Dict[str, float] = {}
+        self.written = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(folder, exist_ok=True)
+
+    def write_one(self) -> str:
+        """
+        Write the next file now.
+
+        :return: Its path.
+        """
+        path = os.path.join(self.folder, f'{self.kind}_{self.written:08d}{self.extension}')
+        data = self._jpeg if self._jpeg is not None else sample_bytes(self.kind, self.written)
+        self.write_times[path] = time.perf_counter()
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.written += 1
+        return path
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while not self._stop.is_set() and (self.count is None or self.written < self.count):
+            self.write_one()
+            next_time += interval
+            self._stop.wait(max(0.0, next_time - time.perf_counter()))
+
+    def start(self) -> 'SyntheticProducer':
+        self._thread = threading.Thread(target=self._run, name='SyntheticProducer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def join(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--folder', required=True)
+    parser.add_argument('--kind', default='jpeg', choices=['jpeg', 'json'] + list(TELEMETRY))
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--duration', type=float, default=None, help='Seconds to run, forever by default')
+    parser.add_argument('--jpeg-size', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    producer = SyntheticProducer(args.folder, args.kind, args.fps, args.jpeg_size).start()
+    try:
+        if args.duration is None:
+            producer.join()
+        else:
+            time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    producer.stop()
+    print(f"Wrote {producer.written} files to {args.folder}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Benchmark the hot paths of cgcpluginlib and track regressions.
+
+Cases:
+  - json_*: get_json_repr of OStreamVisual and OStreamGeoInfos payloads of realistic sizes.
+  - parse_*: every parse_IStream* function and parse_plugin_request, reading from a file.
+  - watcher_*: latency from a file being written by a synthetic producer to the watcher callback, per WatcherMode. Each mode runs in its own process, as watcher threads cannot be stopped.
+
+Every case reports a value where lower is better (microseconds per operation, or milliseconds of latency).
+
+Usage:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --compare results.json [--threshold 0.10]
+    python benchmarks/suite.py --filter json --repeat 7
+
+With --compare, the ratio to the baseline is reported per case and the exit status is 1 if any case is slower than the threshold allows.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from producer import TELEMETRY, SyntheticProducer, sample_bytes  # noqa: E402
+
+
+def visual(boxes: int, polygons: int, vertexes: int):
+    from cgcpluginlib import VoBox, VoPolygon, VoVertex, LabelType, ColourIndexType
+    from cgcpluginlib.ostreamvisual import OStreamVisual
+    return OStreamVisual(desc="bench", boxes=[
+        VoBox(name=f"object {i}", xmin=i * 0.37, ymin=i * 0.21, xmax=i * 0.37 + 40.5, ymax=i * 0.21 + 80.25,
+              filterValue=0.87, clickable=f"object-{i}", labelType=LabelType.P, outlineColourIndex=ColourIndexType.C3)
+        for i in range(boxes)
+    ], polygons=[
+        VoPolygon(name=f"region {i}", triangleStripVertexes=[VoVertex(x=j * 1.5, y=i + j * 0.5) for j in range(vertexes)],
+                  fill=ColourIndexType.C5)
+        for i in range(polygons)
+    ])
+
+
+def geoinfos(points: int, polygons: int, vertexes: int):
+    from cgcpluginlib import GeoInfo, GeoLocation, GeoLocationBase, Angular, GeoPolygon
+    from cgcpluginlib.ostreamgeoinfo import OStreamGeoInfos
+    return OStreamGeoInfos(desc="bench", geoInfos=[
+        GeoInfo(position=GeoLocation(geolocation=GeoLocationBase(latitude=-338688000 + i, longitude=1512093000 + i, altitude=1000),
+                                     angular=Angular(yaw=i % 36000)),
+                clickable=f"target-{i}")
+        for i in range(points)
+    ], geoPolygons=[
+        GeoPolygon(name=f"area {i}", positions=[GeoLocationBase(latitude=-338688000 + j * 13, longitude=1512093000 + i * 1000 + j * 7)
+                                                for j in range(vertexes)])
+        for i in range(polygons)
+    ])
+
+
+def plugin_request() -> dict:
+    return {
+        'id': 'bench', 'orgProfileFile': '/org.json', 'jobParamFile': '/job.json', 'userProfileFile': '/user.json',
+        'telemetryFeeds': [{
+            'cameraFeedsImageFolders': [f'/in/camera{i}/images'], 'cameraFeedsVideoFolders': [f'/in/camera{i}/video'],
+            'gimbalsFolder': [f'/in/gimbal{i}'], 'geolocationFolder': f'/in/geolocation{i}',
+            'signalStrengthFolder': f'/in/signal{i}', 'batteryFolder': f'/in/battery{i}',
+        } for i in range(2)],
+        'inputChannels': [{'id': str(i), 'jsonFolder': f'/in/channel{i}'} for i in range(4)],
+        'outputChannels': [{'id': str(i), 'jsonFolder': f'/out/channel{i}'} for i in range(4)],
+    }
+
+
+def micro_cases(folder: str) -> Dict[str, Callable[[], object]]:
+    from cgcpluginlib.jsonobject import get_json_repr
+    from cgcpluginlib.istreambattery import parse_IStreamBattery
+    from cgcpluginlib.istreamgeolocation import parse_IStreamGeoLocation
+    from cgcpluginlib.istreamgimbal import parse_IStreamGimbal
+    from cgcpluginlib.istreamsignalstrength import parse_IStreamSignalStrength
+    from cgcpluginlib.pluginrequest import parse_plugin_request
+
+    cases = {}
+    for name, payload in [('json_visual_small', visual(20, 2, 16)),
+                          ('json_visual_large', visual(1000, 50, 200)),
+                          ('json_geoinfos_small', geoinfos(20, 2, 50)),
+                          ('json_geoinfos_large', geoinfos(1000, 20, 2000))]:
+        cases[name] = (lambda payload=payload: get_json_repr(payload))
+
+    parsers = {'geolocation': parse_IStreamGeoLocation, 'gimbal': parse_IStreamGimbal,
+               'battery': parse_IStreamBattery, 'signalstrength': parse_IStreamSignalStrength}
+    for kind in TELEMETRY:
+        file = os.path.join(folder, f'{kind}.json')
+        with open(file, 'wb') as f:
+            f.write(sample_bytes(kind, 1))
+        cases[f'parse_{kind}'] = (lambda parse=parsers[kind], file=file: parse(file))
+
+    request_file = os.path.join(folder, 'request.json')
+    with open(request_file, 'w') as f:
+        json.dump(plugin_request(), f)
+    cases['parse_plugin_request'] = lambda: parse_plugin_request(request_file)
+    return cases
+
+
+def time_case(fn: Callable[[], object], repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_op = [total / number for total in timer.repeat(repeat, number)]
+    return {'value': statistics.median(per_op) * 1e6, 'unit': 'us', 'min': min(per_op) * 1e6, 'number': number}
+
+
+def watcher_child(mode: str, fps: float, frames: int) -> dict:
+    from cgcpluginlib.cpl import WatcherMode, start_image_watcher
+
+    with tempfile.TemporaryDirectory() as folder:
+        producer = SyntheticProducer(folder, 'jpeg', fps, count=frames)
+        latencies: List[float] = []
+        lock = threading.Lock()
+
+        def callback(path: str):
+            now = time.perf_counter()
+            written = producer.write_times.get(path)
+            if written is not None:
+                with lock:
+                    latencies.append(now - written)
+
+        start_image_watcher(folder, os.path.join(folder, 'stop.json'), callback, mode=WatcherMode(mode))
+        time.sleep(0.2)
+        producer.start()
+        producer.join()
+        time.sleep(0.5)
+
+    latencies.sort()
+    return {
+        'value': statistics.median(latencies) * 1000 if latencies else None,
+        'unit': 'ms',
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        'delivered': len(latencies),
+        'frames': frames,
+        'fps': fps,
+    }
+
+
+def watcher_cases(fps: float, frames: int, name_filter: str = '') -> Dict[str, dict]:
+    results = {}
+    for mode in ('POLL', 'EVENT'):
+        if name_filter not in f'watcher_{mode.lower()}':
+            continue
+        output = subprocess.run([sys.executable, __file__, '--watcher-child', mode, '--fps', str(fps), '--frames', str(frames)],
+                                check=True, capture_output=True, text=True).stdout
+        results[f'watcher_{mode.lower()}'] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> bool:
+    """
+    Print the ratio of every case to the baseline.
+
+    :return: True if no case regressed by more than the threshold.
+    """
+    ok = True
+    for name, result in results.items():
+        before = baseline.get(name, {}).get('value')
+        after = result.get('value')
+        if before is None or after is None:
+            print(json.dumps({'case': name, 'status': 'new' if before is None else 'missing'}))
+            continue
+        ratio = after / before
+        regressed = ratio > 1 + threshold
+        ok &= not regressed
+        print(json.dumps({'case': name, 'baseline': round(before, 3), 'current': round(after, 3), 'unit': result['unit'],
+                          'ratio': round(ratio, 3), 'status': 'REGRESSION' if regressed else 'ok'}))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', help='Write the results json to this file')
+    parser.add_argument('--compare', help='A results json to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed slowdown ratio with --compare')
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fps', type=float, default=30.0, help='Frame rate of the watcher producer')
+    parser.add_argument('--frames', type=int, default=90, help='Frames written per watcher mode')
+    parser.add_argument('--watcher-child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.watcher_child:
+        print(json.dumps(watcher_child(args.watcher_child, args.fps, args.frames)))
+        return
+
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, fn in micro_cases(folder).items():
+            if args.filter in name:
+                results[name] = time_case(fn, args.repeat)
+    results.update(watcher_cases(args.fps, args.frames, args.filter))
+
+    document = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())},
+        'results': {name: {key: round(value, 3) if isinstance(value, float) else value for key, value in result.items()}
+                    for name, result in results.items()},
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        sys.exit(0 if compare(document['results'], baseline, args.threshold) else 1)
+    print(json.dumps(document, indent=2))
+
+
+if __name__ == '__main__':
+    main()
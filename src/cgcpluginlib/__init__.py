@@ -1,6 +1,54 @@
-from .jsonobject import JsonObject
-from .general import LabelType, ColourIndexType, Marker, MarkerType
-from .istream import IStream, IStreamType 
-from .geo import GeoLocation, GeoLocationBase, Angular, GeoInfo, GeoPolygon, GeoInfoType 
-from .ostream import OStream, OStreamType 
-from .visualobject import VoClickMap, VoPoint, VoVector, VoBox, VoImage, VoVertex, VoPolygon, VisualObjectType
+import importlib
+from typing import TYPE_CHECKING
+
+# Public name -> the submodule defining it. Submodules are imported on first access (PEP 562), so a plugin only pays for the modules it uses.
+_LAZY_ATTRS = {
+    'JsonObject': 'jsonobject',
+    'LabelType': 'general',
+    'ColourIndexType': 'general',
+    'Marker': 'general',
+    'MarkerType': 'general',
+    'IStream': 'istream',
+    'IStreamType': 'istream',
+    'GeoLocation': 'geo',
+    'GeoLocationBase': 'geo',
+    'Angular': 'geo',
+    'GeoInfo': 'geo',
+    'GeoPolygon': 'geo',
+    'GeoInfoType': 'geo',
+    'OStream': 'ostream',
+    'OStreamType': 'ostream',
+    'VoClickMap': 'visualobject',
+    'VoPoint': 'visualobject',
+    'VoVector': 'visualobject',
+    'VoBox': 'visualobject',
+    'VoImage': 'visualobject',
+    'VoVertex': 'visualobject',
+    'VoPolygon': 'visualobject',
+    'VisualObjectType': 'visualobject',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module('.' + module_name, __name__), name)
+    # Later lookups find the name directly and skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .jsonobject import JsonObject
+    from .general import LabelType, ColourIndexType, Marker, MarkerType
+    from .istream import IStream, IStreamType
+    from .geo import GeoLocation, GeoLocationBase, Angular, GeoInfo, GeoPolygon, GeoInfoType
+    from .ostream import OStream, OStreamType
+    from .visualobject import VoClickMap, VoPoint, VoVector, VoBox, VoImage, VoVertex, VoPolygon, VisualObjectType
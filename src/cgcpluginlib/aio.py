@@ -0,0 +1,142 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Type, Union
+from cgcpluginlib import IStream, JsonObject
+from cgcpluginlib.cpl import (_MAX_POLL_INTERVAL, _MIN_POLL_INTERVAL, NewFileHandler, WatcherMode,
+                              _observer_reports_close_events, _rescan_index, _start_event_observer)
+from cgcpluginlib.fileindex import FileIndex
+from cgcpluginlib.istreamdecoder import decode_istream
+from cgcpluginlib.outputwriter import FsyncPolicy, atomic_write_bytes, to_bytes
+
+
+class _ThreadsafeWake:
+    """
+    Sets an asyncio.Event from the observer thread, standing in for the threading.Event of NewFileHandler.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, event: asyncio.Event):
+        self.loop = loop
+        self.event = event
+
+    def set(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The loop was closed while the observer was still running
+            pass
+
+
+async def watch_files(folder: str, file_extensions: List[str], mode: WatcherMode = WatcherMode.EVENT, debug: bool = False) -> AsyncIterator[str]:
+    """
+    Iterate over the newest file of a folder, each time a new file is written.
+
+    Files are yielded latest only: files written while the consumer is busy are skipped, and the next iteration yields the newest file. Folder scans and the watchdog observer start run in the default executor, so the event loop is never blocked by file I/O.
+
+    Parameters:
+        - folder: The folder to watch.
+        - file_extensions: A list of file extensions to watch for.
+        - mode: WatcherMode.EVENT waits for file events (inotify on Linux), falling back to polling when they are unavailable. WatcherMode.POLL always polls, with an adaptive backoff between _MIN_POLL_INTERVAL and _MAX_POLL_INTERVAL seconds instead of the tight loop of the threaded watchers, which would starve the event loop.
+
+    The observer is stopped when the iteration ends, for example when the loop over it breaks.
+    """
+    loop = asyncio.get_running_loop()
+    index = FileIndex(folder, file_extensions)
+    wake = asyncio.Event()
+    observer = None
+    if mode == WatcherMode.EVENT:
+        handler = NewFileHandler(index, _ThreadsafeWake(loop, wake), _observer_reports_close_events())
+        observer = await loop.run_in_executor(None, _start_event_observer, folder, handler, debug)
+
+    try:
+        # Files written before the watcher started
+        await loop.run_in_executor(None, _rescan_index, index, debug)
+        last_processed_file = None
+        poll_interval = _MIN_POLL_INTERVAL
+
+        while True:
+            newest_file = index.newest()
+            if newest_file is not None and newest_file != last_processed_file:
+                last_processed_file = newest_file
+                yield newest_file[0]
+                poll_interval = _MIN_POLL_INTERVAL
+                if observer is None:
+                    # Check straight away in case more files arrived while the consumer was busy
+                    await loop.run_in_executor(None, _rescan_index, index, debug)
+                continue
+
+            if observer is not None:
+                await wake.wait()
+                wake.clear()
+            else:
+                await asyncio.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, _MAX_POLL_INTERVAL)
+                await loop.run_in_executor(None, _rescan_index, index, debug)
+    finally:
+        if observer is not None:
+            observer.stop()
+            await loop.run_in_executor(None, observer.join)
+
+
+def watch_images(folder: str, mode: WatcherMode = WatcherMode.EVENT, debug: bool = False) -> AsyncIterator[str]:
+    """
+    Iterate over the newest image (.jpeg and .jpg) of a folder, each time a new image is written. See watch_files.
+
+    Example:
+        ```
+        async for image_path in watch_images(plugin_request.telemetryFeeds[0].cameraFeedsImageFolders[0]):
+            visual = await loop.run_in_executor(None, run_inference, image_path)
+            await write_ostream(os.path.join(plugin_request.outputChannelFolder(0), 'visual.json'), visual)
+        ```
+    """
+    return watch_files(folder, ['.jpeg', '.jpg'], mode, debug)
+
+
+def watch_jsons(folder: str, mode: WatcherMode = WatcherMode.EVENT, debug: bool = False) -> AsyncIterator[str]:
+    """
+    Iterate over the newest json file of a folder, each time a new json file is written. See watch_files.
+    """
+    return watch_files(folder, ['.json'], mode, debug)
+
+
+async def watch_istream(folder: str, istream_class: Optional[Type[IStream]] = None, mode: WatcherMode = WatcherMode.EVENT, debug: bool = False) -> AsyncIterator[IStream]:
+    """
+    Iterate over the IStreams written to a telemetry or input channel folder, newest only. See watch_files.
+
+    Files are read and decoded in the default executor. Files that are removed, cannot be decoded or miss fields of a nested object are skipped.
+
+    Parameters:
+        - folder: The folder to watch.
+        - istream_class: The IStream class to decode. By default it is picked from the iStreamType of each file.
+
+    Example:
+        ```
+        async for battery in watch_istream(plugin_request.telemetryFeeds[0].batteryFolder, IStreamBattery):
+            print(battery.percent)
+        ```
+    """
+    loop = asyncio.get_running_loop()
+    async for path in watch_jsons(folder, mode, debug):
+        try:
+            istream = await loop.run_in_executor(None, decode_istream, path, istream_class)
+        except (FileNotFoundError, KeyError, ValueError) as error:
+            if debug:
+                print(f"watch_istream: skipping {path}, {error}")
+            continue
+        yield istream
+
+
+def _serialize_and_write(data: Union[JsonObject, str, bytes, bytearray, memoryview], file: str, mode: int, fsync: FsyncPolicy) -> None:
+    atomic_write_bytes(to_bytes(data), file, mode, fsync)
+
+
+async def write_ostream(file: str, data: Union[JsonObject, str, bytes, bytearray, memoryview], mode: int = 0o777, fsync: FsyncPolicy = FsyncPolicy.NEVER) -> None:
+    """
+    Serialize a result and write it atomically in the default executor. Awaiting it is the backpressure: the next result is not produced until this one is in place.
+
+    Parameters:
+      - file: The file to write to, usually in an output channel folder, for example os.path.join(plugin_request.outputChannelFolder(0), 'visual.json').
+      - data: A JsonObject, for example an OStream, or the str or bytes-like object to write.
+      - mode: The permissions of the file.
+      - fsync: See FsyncPolicy.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _serialize_and_write, data, file, mode, fsync)
@@ -0,0 +1,259 @@
+import itertools
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
+from cgcpluginlib import VoClickMap
+from cgcpluginlib.triangulate import strip_triangles
+from cgcpluginlib.visualobject import ClickBox, ClickPolygon
+
+ClickRegion = Union[ClickBox, ClickPolygon]
+Triangle = Tuple[float, float, float, float, float, float]
+
+# Regions covering more grid cells than this are tested on every query instead of being stored in each cell
+_MAX_REGION_CELLS = 1024
+
+
+def _strip_triangles(polygon: ClickPolygon) -> List[Triangle]:
+    return [(a.x, a.y, b.x, b.y, c.x, c.y) for a, b, c in strip_triangles(polygon.triangleStripVertexes or [])]
+
+
+def _is_finite(region: ClickRegion) -> bool:
+    # NaN and infinite coordinates have no grid cell
+    if isinstance(region, ClickBox):
+        return all(map(math.isfinite, (region.xmin, region.ymin, region.xmax, region.ymax)))
+    return all(math.isfinite(vertex.x) and math.isfinite(vertex.y) for vertex in region.triangleStripVertexes or ())
+
+
+def _point_in_triangle(x: float, y: float, triangle: Triangle) -> bool:
+    ax, ay, bx, by, cx, cy = triangle
+    d1 = (x - bx) * (ay - by) - (ax - bx) * (y - by)
+    d2 = (x - cx) * (by - cy) - (bx - cx) * (y - cy)
+    d3 = (x - ax) * (cy - ay) - (cx - ax) * (y - ay)
+    has_negative = d1 < 0 or d2 < 0 or d3 < 0
+    has_positive = d1 > 0 or d2 > 0 or d3 > 0
+    return not (has_negative and has_positive)
+
+
+def _triangle_overlaps_rect(triangle: Triangle, xmin: float, ymin: float, xmax: float, ymax: float) -> bool:
+    # Separating axis test: the rectangle axes, then the triangle edge normals
+    xs = triangle[0::2]
+    ys = triangle[1::2]
+    if max(xs) < xmin or min(xs) > xmax or max(ys) < ymin or min(ys) > ymax:
+        return False
+    corners = ((xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax))
+    for i in range(3):
+        ax, ay = xs[i], ys[i]
+        bx, by = xs[(i + 1) % 3], ys[(i + 1) % 3]
+        cx, cy = xs[(i + 2) % 3], ys[(i + 2) % 3]
+        nx, ny = ay - by, bx - ax
+        inside = (cx - ax) * nx + (cy - ay) * ny
+        if all(((px - ax) * nx + (py - ay) * ny) * inside < 0 for px, py in corners):
+            return False
+    return True
+
+
+def _signature(region: ClickRegion) -> tuple:
+    if isinstance(region, ClickBox):
+        return ('B', region.xmin, region.ymin, region.xmax, region.ymax, region.clickable)
+    return ('P', region.clickable, tuple((vertex.x, vertex.y) for vertex in region.triangleStripVertexes or ()))
+
+
+class ClickIndex:
+    """
+    A uniform grid over the ClickBoxes and ClickPolygons of a VoClickMap, for point and rectangle queries.
+
+    Boxes are stored in every cell they cover, polygons store each triangle of their strip in the cells it covers, so a query only tests the triangles near it. Regions covering more than _MAX_REGION_CELLS cells are kept in a list that every query tests, and a rectangle query larger than the occupied part of the grid walks the occupied cells instead of every cell of the rectangle, so no operation costs more than the size of the data.
+
+    update() rebuilds incrementally: regions that are the same as in the previous map keep their place in the grid, only added and removed regions are touched.
+
+    Example:
+        ```
+        index = ClickIndex(clickmap)
+        clickable = index.clickable_at(x, y)
+        ```
+    """
+
+    def __init__(self, clickmap: Optional[VoClickMap] = None, cell_size: float = 64.0):
+        """
+        Parameters:
+          - clickmap: The VoClickMap to index.
+          - cell_size: The size of a grid cell, in the coordinates of the click map. Around the size of a typical region works best.
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        # region id -> (region, signature, triangles, cells)
+        self._regions: Dict[int, tuple] = {}
+        # cell -> {region id: triangle indices in that cell, empty for a box}
+        self._cells: Dict[Tuple[int, int], Dict[int, List[int]]] = {}
+        # signature -> region ids with that signature
+        self._by_signature: Dict[tuple, List[int]] = {}
+        # ids of the regions too large to store per cell
+        self._large = set()
+        self._next_id = 0
+        if clickmap is not None:
+            self.update(clickmap)
+
+    def __len__(self) -> int:
+        return len(self._regions)
+
+    def _cell_range(self, xmin: float, ymin: float, xmax: float, ymax: float):
+        size = self.cell_size
+        return range(math.floor(xmin / size), math.floor(xmax / size) + 1), range(math.floor(ymin / size), math.floor(ymax / size) + 1)
+
+    def _is_large(self, xs, ys) -> bool:
+        columns, rows = self._cell_range(min(xs), min(ys), max(xs), max(ys))
+        return len(columns) * len(rows) > _MAX_REGION_CELLS
+
+    def add(self, region: ClickRegion) -> int:
+        """
+        Add a ClickBox or ClickPolygon.
+
+        :return: The id of the region, for remove().
+        """
+        if not _is_finite(region):
+            raise ValueError("Click region coordinates must be finite")
+        region_id = self._next_id
+        self._next_id += 1
+        cells = set()
+        if isinstance(region, ClickBox):
+            triangles = None
+            if self._is_large((region.xmin, region.xmax), (region.ymin, region.ymax)):
+                self._large.add(region_id)
+                columns, rows = (), ()
+            else:
+                columns, rows = self._cell_range(min(region.xmin, region.xmax), min(region.ymin, region.ymax),
+                                             max(region.xmin, region.xmax), max(region.ymin, region.ymax))
+            for cx in columns:
+                for cy in rows:
+                    self._cells.setdefault((cx, cy), {})[region_id] = []
+                    cells.add((cx, cy))
+        else:
+            triangles = _strip_triangles(region)
+            if triangles and self._is_large([x for triangle in triangles for x in triangle[0::2]],
+                                            [y for triangle in triangles for y in triangle[1::2]]):
+                self._large.add(region_id)
+                triangles_in_cells = ()
+            else:
+                triangles_in_cells = triangles
+            for i, triangle in enumerate(triangles_in_cells):
+                xs = triangle[0::2]
+                ys = triangle[1::2]
+                columns, rows = self._cell_range(min(xs), min(ys), max(xs), max(ys))
+                for cx in columns:
+                    for cy in rows:
+                        self._cells.setdefault((cx, cy), {}).setdefault(region_id, []).append(i)
+                        cells.add((cx, cy))
+
+        signature = _signature(region)
+        self._regions[region_id] = (region, signature, triangles, cells)
+        self._by_signature.setdefault(signature, []).append(region_id)
+        return region_id
+
+    def remove(self, region_id: int) -> None:
+        """
+        Remove a region by the id add() returned.
+        """
+        region, signature, triangles, cells = self._regions.pop(region_id)
+        self._large.discard(region_id)
+        for cell in cells:
+            entries = self._cells[cell]
+            del entries[region_id]
+            if not entries:
+                del self._cells[cell]
+        ids = self._by_signature[signature]
+        ids.remove(region_id)
+        if not ids:
+            del self._by_signature[signature]
+
+    def clear(self) -> None:
+        self._regions.clear()
+        self._cells.clear()
+        self._large.clear()
+        self._by_signature.clear()
+
+    def update(self, clickmap: VoClickMap) -> Tuple[int, int]:
+        """
+        Make the index match a new VoClickMap, touching only the regions that changed. Regions with NaN or infinite coordinates are skipped.
+
+        :return: (added, removed) region counts.
+        """
+        regions = [region for region in list(clickmap.clickBoxes or []) + list(clickmap.clickPolygons or [])
+                   if _is_finite(region)]
+        wanted = Counter()
+        new_regions = []
+        for region in regions:
+            signature = _signature(region)
+            wanted[signature] += 1
+            if wanted[signature] > len(self._by_signature.get(signature, ())):
+                new_regions.append(region)
+
+        stale = []
+        for signature, ids in self._by_signature.items():
+            extra = len(ids) - wanted.get(signature, 0)
+            if extra > 0:
+                stale.extend(ids[-extra:])
+        for region_id in stale:
+            self.remove(region_id)
+        for region in new_regions:
+            self.add(region)
+        return len(new_regions), len(stale)
+
+    def _hits(self, region_id: int, test_box, test_triangle, triangle_indices: Optional[List[int]]) -> bool:
+        region, _, triangles, _ = self._regions[region_id]
+        if triangles is None:
+            return test_box(region)
+        return any(test_triangle(triangles[i]) for i in triangle_indices)
+
+    def _large_candidates(self):
+        # Large regions are not stored per cell, all their triangles are candidates
+        for region_id in self._large:
+            triangles = self._regions[region_id][2]
+            yield region_id, range(len(triangles)) if triangles is not None else ()
+
+    def query_point(self, x: float, y: float) -> List[ClickRegion]:
+        """
+        :return: The regions containing the point, in the order they were added.
+        """
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return []
+        cell = self._cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)), {})
+        hits = [region_id for region_id, triangle_indices in itertools.chain(cell.items(), self._large_candidates())
+                if self._hits(region_id,
+                              lambda box: min(box.xmin, box.xmax) <= x <= max(box.xmin, box.xmax) and min(box.ymin, box.ymax) <= y <= max(box.ymin, box.ymax),
+                              lambda triangle: _point_in_triangle(x, y, triangle),
+                              triangle_indices)]
+        return [self._regions[region_id][0] for region_id in sorted(hits)]
+
+    def clickable_at(self, x: float, y: float) -> Optional[str]:
+        """
+        :return: The clickable of the first region containing the point, or None.
+        """
+        hits = self.query_point(x, y)
+        return hits[0].clickable if hits else None
+
+    def query_rect(self, xmin: float, ymin: float, xmax: float, ymax: float) -> List[ClickRegion]:
+        """
+        :return: The regions overlapping the rectangle, in the order they were added.
+        """
+        if not all(map(math.isfinite, (xmin, ymin, xmax, ymax))):
+            return []
+        candidates: Dict[int, set] = {}
+        columns, rows = self._cell_range(xmin, ymin, xmax, ymax)
+        if len(columns) * len(rows) > len(self._cells):
+            # Larger than the occupied part of the grid, walk the occupied cells instead
+            cells = [entries for (cx, cy), entries in self._cells.items() if cx in columns and cy in rows]
+        else:
+            cells = [self._cells.get((cx, cy), {}) for cx in columns for cy in rows]
+        for entries in cells:
+            for region_id, triangle_indices in entries.items():
+                candidates.setdefault(region_id, set()).update(triangle_indices)
+        for region_id, triangle_indices in self._large_candidates():
+            candidates[region_id] = triangle_indices
+
+        hits = [region_id for region_id, triangle_indices in candidates.items()
+                if self._hits(region_id,
+                              lambda box: min(box.xmin, box.xmax) <= xmax and max(box.xmin, box.xmax) >= xmin and min(box.ymin, box.ymax) <= ymax and max(box.ymin, box.ymax) >= ymin,
+                              lambda triangle: _triangle_overlaps_rect(triangle, xmin, ymin, xmax, ymax),
+                              triangle_indices)]
+        return [self._regions[region_id][0] for region_id in sorted(hits)]
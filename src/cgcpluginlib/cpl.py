@@ -3,12 +3,237 @@ import os
 import json
 import threading
 import time
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from enum import Enum
 from typing import Callable
+from cgcpluginlib import metrics, tracing
+from cgcpluginlib.fileindex import FileIndex
+from cgcpluginlib.outputwriter import atomic_write_bytes
 
+# Bounds of the adaptive backoff used when a folder has to be polled
+_MIN_POLL_INTERVAL = 0.005
+_MAX_POLL_INTERVAL = 0.5
 
-def _start_file_watcher(folder: str, stop_file: str, callback: Callable[[str], None], file_extensions: list[str], timeout: int = 120000, debug: bool = False) -> None:
+
+class WatcherMode(str, Enum):
+    """
+    How a file watcher discovers new files.
+      - POLL: Rescan the folder in a tight loop. A rescan only lists the folder when it changed and only stats new files and the newest file, see FileIndex. An older file rewritten in place under the same name is only noticed in EVENT mode.
+      - EVENT: Sleep until the OS reports a new file (inotify on Linux). Falls back to an adaptive backoff poll when file events are unavailable. Without inotify a file can be reported before it is completely written, see NewFileHandler.
+    """
+    POLL = "POLL"
+    EVENT = "EVENT"
+
+
+def _observer_class():
+    # watchdog is only imported once a watcher is started, it is a large part of the import time of this module
+    from watchdog.observers import Observer
+    return Observer
+
+
+class EventHandler:
+    """
+    Base class of the file event handlers passed to watchdog observers.
+
+    Observers only call dispatch(), so handlers do not need to subclass watchdog's FileSystemEventHandler, which would import watchdog when this module is imported.
+    """
+
+    def dispatch(self, event):
+        method = getattr(self, 'on_' + event.event_type, None)
+        if method is not None:
+            method(event)
+
+
+class NewFileHandler(EventHandler):
+    """
+    Keep a FileIndex of a watched folder up to date from file events and wake the watcher thread.
+
+    When the observer reports close-write events (inotify on Linux), a file is only indexed once it has been closed or renamed into the folder, so the callback never sees a half written file.
+
+    Other observers (FSEvents on macOS, Windows) report no close events, so files are indexed as soon as they are created or modified and a file that is still being written can reach the callback. Producers on those platforms should write to a temporary name and rename it into place, as OutputWriter does.
+    """
+
+    def __init__(self, index: FileIndex, wake: threading.Event, close_events: bool):
+        self.index = index
+        self.wake = wake
+        self.close_events = close_events
+
+    def _record(self, path: str):
+        if self.index.update(path):
+            self.wake.set()
+
+    def on_created(self, event):
+        if not self.close_events and not event.is_directory:
+            self._record(event.src_path)
+
+    def on_modified(self, event):
+        if not self.close_events and not event.is_directory:
+            self._record(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self._record(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.discard(event.src_path)
+            self._record(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.discard(event.src_path)
+
+
+class _WatcherInstrumentation:
+    """
+    Runs the callback of one watched folder while metrics or tracing are enabled.
+
+    Metrics:
+      - watcher[folder].detect: Seconds from the modified time of a file until the watcher picked it up.
+      - watcher[folder].callback: Seconds the callback ran for.
+      - watcher[folder].skipped: Files never passed to the callback because a newer file arrived first.
+
+    Trace spans: 'discover' from the modified time of a file until it was picked up, and 'callback'.
+    """
+
+    def __init__(self, folder: str):
+        self.detect = metrics.histogram(f"watcher[{folder}].detect")
+        self.callback = metrics.histogram(f"watcher[{folder}].callback")
+        self.skipped = metrics.counter(f"watcher[{folder}].skipped")
+        self.last_mtime = None
+
+    def run(self, index: FileIndex, newest_file: tuple, callback: Callable[[str], None]) -> None:
+        path, mtime = newest_file
+        start = time.perf_counter()
+        detect_latency = time.time() - mtime
+        if metrics.ENABLED:
+            self.detect.record(detect_latency)
+            if self.last_mtime is not None:
+                # Everything after the previous file except the newest one was passed over
+                skipped = len(index.since(self.last_mtime)) - 1
+                if skipped > 0:
+                    self.skipped.inc(skipped)
+        self.last_mtime = mtime
+        tracing.add_span('discover', start - detect_latency, start, 'watcher', file=path)
+
+        try:
+            callback(path)
+        finally:
+            end = time.perf_counter()
+            if metrics.ENABLED:
+                self.callback.record(end - start)
+            tracing.add_span('callback', start, end, 'watcher', file=path)
+
+
+def _rescan_index(index: FileIndex, debug: bool = False) -> None:
+    try:
+        index.rescan()
+    except FileNotFoundError as error:
+        if debug:
+            print(f"start_file_watcher: {error}")
+
+
+def _event_observer_class():
+    """
+    :return: The watchdog observer class, or None if the platform has no file events and the observer would only poll.
+    """
+    # Watchdog's polling observer rescans every file each second, our own backoff poll is cheaper
+    Observer = _observer_class()
+    try:
+        from watchdog.observers.polling import PollingObserver
+        if Observer is PollingObserver:
+            return None
+    except ImportError:
+        pass
+    return Observer
+
+
+def _start_event_observer(folder: str, handler: NewFileHandler, debug: bool = False):
+    """
+    Start a watchdog observer on the folder.
+
+    :return: The started observer, or None if the platform cannot deliver file events for the folder.
+    """
+    Observer = _event_observer_class()
+    if Observer is None:
+        return None
+
+    observer = Observer()
+    try:
+        observer.schedule(handler, folder)
+        observer.start()
+    except OSError as error:
+        if debug:
+            print(f"start_file_watcher: falling back to polling, {error}")
+        return None
+    return observer
+
+
+def _observer_reports_close_events() -> bool:
+    try:
+        from watchdog.observers.inotify import InotifyObserver
+    except Exception:
+        return False
+    return _observer_class() is InotifyObserver
+
+
+def _start_event_file_watcher(folder: str, stop_file: str, callback: Callable[[str], None], file_extensions: list[str], timeout: int = 120000, debug: bool = False) -> None:
+    """
+    Spawn a thread that runs the callback on the most recent file in the folder whenever a new file is written.
+
+    The thread sleeps until the observer reports a created or close-write event. Bursts of files are coalesced so only the newest one is passed to the callback. If file events are unavailable, the folder is polled with an adaptive backoff between _MIN_POLL_INTERVAL and _MAX_POLL_INTERVAL seconds.
+    """
+    index = FileIndex(folder, file_extensions)
+    wake = threading.Event()
+    handler = NewFileHandler(index, wake, _observer_reports_close_events())
+    observer = _start_event_observer(folder, handler, debug)
+
+    def process():
+        last_populate_time = time.time()
+        last_processed_file = None
+        poll_interval = _MIN_POLL_INTERVAL
+        instrumentation = _WatcherInstrumentation(folder)
+
+        # Files written before the watcher started
+        _rescan_index(index, debug)
+
+        while True:
+            newest_file = index.newest()
+            if newest_file is not None and newest_file != last_processed_file:
+                last_processed_file = newest_file
+                if metrics.ENABLED or tracing.ENABLED:
+                    instrumentation.run(index, newest_file, callback)
+                else:
+                    callback(newest_file[0])
+                last_populate_time = time.time()
+                poll_interval = _MIN_POLL_INTERVAL
+                if observer is None:
+                    # Check straight away in case more files arrived during the callback
+                    _rescan_index(index, debug)
+                continue
+
+            idle_time = time.time() - last_populate_time
+            if idle_time > timeout and len(index) == 0:
+                error_msg = f"Folder {folder} is empty and has not been populated for {timeout} seconds"
+                exit_plugin_on_error(error_msg, stop_file)
+
+            if observer is not None:
+                wake.wait(max(timeout - idle_time, _MAX_POLL_INTERVAL))
+                wake.clear()
+            else:
+                time.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, _MAX_POLL_INTERVAL)
+                _rescan_index(index, debug)
+
+    # Setup processing thread
+    processing_thread = threading.Thread(
+        target=process, args=())
+    processing_thread.daemon = True
+    processing_thread.start()
+    discovery = "events" if observer is not None else "polling"
+    print(f"File watcher started on folder: {folder} ({discovery})")
+
+
+def _start_file_watcher(folder: str, stop_file: str, callback: Callable[[str], None], file_extensions: list[str], timeout: int = 120000, debug: bool = False, mode: WatcherMode = WatcherMode.POLL) -> None:
     """
     Spawn a thread to watch a folder for file changes. Thread contains a while loop that runs the callback on the most recent file in the folder.
 
@@ -18,39 +243,46 @@ def _start_file_watcher(folder: str, stop_file: str, callback: Callable[[str], N
         - callback: Callback function that will be looped upon.
         - file_extensions: A list of file extensions that the file watcher will check for.
         - timeout: The number of seconds to wait before exiting if no files are present in the folder.
+        - mode: How new files are discovered, see WatcherMode.
     """
+    if mode == WatcherMode.EVENT:
+        _start_event_file_watcher(folder, stop_file, callback,
+                                  file_extensions, timeout, debug)
+        return
+
     def process():
         last_populate_time = time.time()
         last_processed_file = None
 
-        file_extension_tuple = tuple(file_extensions)
+        # Kept across passes, so the newest file is found without sorting the folder
+        index = FileIndex(folder, file_extensions)
+        instrumentation = _WatcherInstrumentation(folder)
 
         while True:
-            sorted_files = None
             try:
-                with os.scandir(folder) as entries:
-                    # Sort by modified time, oldest first, newest last
-                    sorted_files = sorted((entry for entry in entries if entry.name.lower(
-                    ).endswith(file_extension_tuple)), key=lambda entry: entry.stat().st_mtime)
+                index.rescan()
             except FileNotFoundError as error:
                 if debug:
                     print(f"start_file_watcher: {error}")
                 continue
 
-            if len(list(sorted_files)) == 0:
+            newest_file = index.newest()
+            if newest_file is None:
                 if time.time() - last_populate_time > timeout:
                     error_msg = f"Folder {folder} is empty and has not been populated for {timeout} seconds"
                     exit_plugin_on_error(error_msg, stop_file)
                 else:
                     continue
 
-            jpeg_file = sorted_files.pop()
-            if last_processed_file is not None and jpeg_file.path == last_processed_file.path and jpeg_file.stat().st_mtime == last_processed_file.stat().st_mtime:
+            if newest_file == last_processed_file:
                 continue
-            last_processed_file = jpeg_file
+            last_processed_file = newest_file
 
-            jpeg_path = jpeg_file.path
-            callback(jpeg_path)
+            if metrics.ENABLED or tracing.ENABLED:
+                instrumentation.run(index, newest_file, callback)
+            else:
+                jpeg_path = newest_file[0]
+                callback(jpeg_path)
 
             last_populate_time = time.time()
 
@@ -62,37 +294,39 @@ def _start_file_watcher(folder: str, stop_file: str, callback: Callable[[str], N
     print(f"File watcher started on folder: {folder}")
 
 
-def start_image_watcher(folder: str, stop_file: str, callback: Callable[[str], None], timeout: int = 120000, debug: bool = False) -> None:
+def start_image_watcher(folder: str, stop_file: str, callback: Callable[[str], None], timeout: int = 120000, debug: bool = False, mode: WatcherMode = WatcherMode.POLL) -> None:
     """
     Spawn a thread to watch a folder for image (.jpeg and .jpg) file changes. Thread contains a while loop that runs the callback on the most recent file in the folder.
 
     Parameters:
         - folder: The folder to watch for file changes.
         - stop_file: The file that will be created should the file watcher throw an error.
-        - callback: Callback function that will be looped upon.
+        - callback: Callback function that will be looped upon. Pass a workqueue.WorkDispatcher to run it on a pool of workers instead of the watcher thread.
         - timeout: The number of seconds to wait before exiting if no files are present in the folder.
+        - mode: How new files are discovered. WatcherMode.EVENT sleeps until a file is written instead of rescanning the folder in a loop.
     """
     file_extensions = ['.jpeg', '.jpg']
     _start_file_watcher(folder, stop_file, callback,
-                        file_extensions, timeout, debug)
+                        file_extensions, timeout, debug, mode)
 
 
-def start_json_watcher(folder: str, stop_file: str, callback: Callable[[str], None], timeout: int = 120000, debug: bool = False) -> None:
+def start_json_watcher(folder: str, stop_file: str, callback: Callable[[str], None], timeout: int = 120000, debug: bool = False, mode: WatcherMode = WatcherMode.POLL) -> None:
     """
     Spawn a thread to watch a folder for json file changes. Thread contains a while loop that runs the callback on the most recent file in the folder.
 
     Parameters:
         - folder: The folder to watch for file changes.
         - stop_file: The file that will be created should the file watcher throw an error.
-        - callback: Callback function that will be looped upon.
+        - callback: Callback function that will be looped upon. Pass a workqueue.WorkDispatcher to run it on a pool of workers instead of the watcher thread.
         - timeout: The number of seconds to wait before exiting if no files are present in the folder.
+        - mode: How new files are discovered. WatcherMode.EVENT sleeps until a file is written instead of rescanning the folder in a loop.
     """
     file_extensions = ['.json']
     _start_file_watcher(folder, stop_file, callback,
-                        file_extensions, timeout, debug)
+                        file_extensions, timeout, debug, mode)
 
 
-class StopFileHandler(FileSystemEventHandler):
+class StopFileHandler(EventHandler):
     def __init__(self, stop_file):
         self.stop_file = stop_file
 
@@ -100,9 +334,16 @@ class StopFileHandler(FileSystemEventHandler):
         if event.src_path == self.stop_file:
             msg = 'Stop file detected'
             print(msg)
+            _flush_diagnostics()
             os._exit(0)
 
 
+def _flush_diagnostics() -> None:
+    # os._exit skips atexit handlers, so the trace and the last metrics snapshot are written here
+    tracing.flush()
+    metrics.disable()
+
+
 def start_stop_file_watcher(stop_file: str):
     """
     Spawn a thread to watch for a stop file and gracefully exit when the stop file exists.
@@ -116,7 +357,7 @@ def start_stop_file_watcher(stop_file: str):
     stop_folder = os.path.dirname(stop_file)
 
     stop_file_handler = StopFileHandler(stop_file)
-    stop_observer = Observer()
+    stop_observer = _observer_class()()
     stop_observer.schedule(stop_file_handler, stop_folder)
     stop_observer.start()
     print(f"Stop file watcher started for {stop_file}")
@@ -152,16 +393,15 @@ def exit_plugin_on_error(msg: str, stop_file: str) -> None:
 
 def write_string_to_file(data: str, file: str) -> None:
     """
-    Write a string to a file.
+    Write a string to a file. The file is replaced atomically, so readers never see a partially written file.
+
+    Use outputwriter.OutputWriter to write from a background thread instead.
 
     Parameters:
       - data: The string to write.
       - file: The file to write to.
     """
-    with open(file, 'w') as f:
-        f.write(data)
-
-    os.chmod(file, 0o777)
+    atomic_write_bytes(data.encode(), file, 0o777)
 
 
 def parse_args():
@@ -181,6 +421,10 @@ def parse_args():
         output_channel_folder = args.output_channel_folder
         telemetry_stream_folder = args.telemetry_stream_folder
         ```
+
+    With --metrics-interval, metrics are enabled and written to metrics.json in the result folder every that many seconds, see the metrics module.
+
+    With --trace-file, tracing is enabled and a Chrome trace json of the plugin's stages is written to that file when the plugin stops, see the tracing module.
     """
 
     parser = argparse.ArgumentParser()
@@ -199,6 +443,10 @@ def parse_args():
                         help='Output channel folder that contains channel sub folders')
     parser.add_argument('--telemetry-stream-folder', dest='telemetry_stream_folder',
                         help='Telemetry stream folder that contains telemetry stream sub folders')
+    parser.add_argument('--metrics-interval', dest='metrics_interval', type=float,
+                        help='Write metrics.json to the result folder every this many seconds')
+    parser.add_argument('--trace-file', dest='trace_file',
+                        help='Record a Chrome trace of the plugin stages and write it to this file on exit')
 
     args = parser.parse_args()
 
@@ -206,4 +454,9 @@ def parse_args():
         error_msg = 'Missing required arguments'
         exit_plugin_on_error(error_msg, args.stop_file)
 
+    if args.metrics_interval:
+        metrics.enable(args.result_folder, args.metrics_interval)
+    if args.trace_file:
+        tracing.enable(args.trace_file)
+
     return args
@@ -0,0 +1,170 @@
+import bisect
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# A folder modified this recently may change again within its mtime granularity, so an unchanged mtime is not trusted
+_RACY_SECONDS = 2.0
+
+
+class FileIndex:
+    """
+    A persistent index of the files in a folder, ordered by modified time.
+
+    The index is kept up to date from directory deltas instead of being rebuilt on every lookup:
+      - rescan() skips the folder while its modified time is unchanged, otherwise it lists the folder and only stats the names that are not indexed yet. The newest file is stat'd again, so a file rewritten in place is noticed. rescan(restat=True) stats every entry, so older files rewritten in place, for example a rotating set of frame files, move to their new position as well.
+      - update() and discard() apply single file events, for example from a watchdog observer.
+
+    Finding the newest file is O(1) and listing the files modified after a given time is O(log n) plus the size of the result, whatever the size of the folder. A rescan of an unchanged folder costs two stats, one of the folder and one of the newest file, a rescan of a changed folder lists it but only stats the new names.
+    """
+
+    def __init__(self, folder: str, file_extensions: List[str]):
+        self.folder = folder
+        self.file_extension_tuple = tuple(file_extensions)
+        self.lock = threading.Lock()
+        # path -> mtime
+        self._mtimes = {}
+        # (mtime, path) sorted oldest first, newest last
+        self._order = []
+        # Modified time of the folder at the last listing, and when that listing was taken
+        self._folder_mtime_ns = None
+        self._listed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._mtimes)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._mtimes
+
+    def matches(self, path: str) -> bool:
+        """
+        Check if a path has one of the indexed file extensions.
+        """
+        return path.lower().endswith(self.file_extension_tuple)
+
+    def _insert(self, path: str, mtime: float) -> bool:
+        old_mtime = self._mtimes.get(path)
+        if old_mtime == mtime:
+            return False
+        if old_mtime is not None:
+            self._remove(path, old_mtime)
+        self._mtimes[path] = mtime
+        if not self._order or self._order[-1] < (mtime, path):
+            self._order.append((mtime, path))
+        else:
+            bisect.insort(self._order, (mtime, path))
+        return True
+
+    def _remove(self, path: str, mtime: float) -> None:
+        idx = bisect.bisect_left(self._order, (mtime, path))
+        del self._order[idx]
+
+    def update(self, path: str, mtime: Optional[float] = None) -> bool:
+        """
+        Add or refresh a single file.
+
+        Parameters:
+          - path: The file that was created or modified.
+          - mtime: The modified time of the file. The file is stat'd if it is not provided.
+
+        :return: True if the index changed.
+        """
+        if not self.matches(path):
+            return False
+        if mtime is None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                return self.discard(path)
+        with self.lock:
+            return self._insert(path, mtime)
+
+    def discard(self, path: str) -> bool:
+        """
+        Remove a single file from the index.
+
+        :return: True if the file was indexed.
+        """
+        with self.lock:
+            mtime = self._mtimes.pop(path, None)
+            if mtime is None:
+                return False
+            self._remove(path, mtime)
+            return True
+
+    def rescan(self, restat: bool = False) -> bool:
+        """
+        Apply the difference between the folder contents and the index.
+
+        Parameters:
+          - restat: Also stat every file that is already indexed, to pick up older files rewritten in place. This costs a stat per file.
+
+        Raises FileNotFoundError if the folder does not exist.
+
+        :return: True if the index changed.
+        """
+        folder_mtime_ns = os.stat(self.folder).st_mtime_ns
+        if not restat and folder_mtime_ns == self._folder_mtime_ns and \
+                self._listed_at - folder_mtime_ns / 1e9 > _RACY_SECONDS:
+            # No file was added, removed or renamed since the last listing
+            return self._restat_newest()
+
+        listed_at = time.time()
+        with os.scandir(self.folder) as entries:
+            present = {entry.path: entry for entry in entries
+                       if entry.name.lower().endswith(self.file_extension_tuple)}
+
+        changed = False
+        with self.lock:
+            for path in [path for path in self._mtimes if path not in present]:
+                self._remove(path, self._mtimes.pop(path))
+                changed = True
+
+            for path, entry in present.items():
+                if not restat and path in self._mtimes:
+                    continue
+                try:
+                    # The stat is cached on the DirEntry, and is free from scandir on Windows
+                    changed |= self._insert(path, entry.stat().st_mtime)
+                except FileNotFoundError:
+                    pass
+            self._folder_mtime_ns = folder_mtime_ns
+            self._listed_at = listed_at
+        if not restat:
+            changed |= self._restat_newest()
+        return changed
+
+    def _restat_newest(self) -> bool:
+        # A single file rewritten in place keeps being the newest, one stat notices it
+        newest_file = self.newest()
+        if newest_file is None:
+            return False
+        return self.update(newest_file[0])
+
+    def newest(self) -> Optional[Tuple[str, float]]:
+        """
+        :return: The (path, mtime) of the most recently modified file, or None if the index is empty.
+        """
+        with self.lock:
+            if not self._order:
+                return None
+            mtime, path = self._order[-1]
+        return path, mtime
+
+    def since(self, mtime: float, inclusive: bool = False) -> List[Tuple[str, float]]:
+        """
+        List the files modified after the given time.
+
+        Parameters:
+          - mtime: The modified time to list files after.
+          - inclusive: Also list the files modified at exactly that time.
+
+        :return: A list of (path, mtime), oldest first.
+        """
+        with self.lock:
+            if inclusive:
+                idx = bisect.bisect_left(self._order, (mtime, ''))
+            else:
+                idx = bisect.bisect_right(self._order, (mtime, chr(0x10ffff)))
+            return [(path, file_mtime) for file_mtime, path in self._order[idx:]]
@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import List, Optional
 from cgcpluginlib import JsonObject
+from cgcpluginlib.jsonobject import SLOTS
 from cgcpluginlib import LabelType, ColourIndexType, Marker
 
 
@@ -10,7 +11,7 @@ class GeoInfoType(str, Enum):
     LINK = "LINK"
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class GeoLocationBase(JsonObject):
     '''
       - latitude: Unit 1e-7 degree.
@@ -22,7 +23,7 @@ class GeoLocationBase(JsonObject):
     altitude: int = 0
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class Angular(JsonObject):
     '''
     Unit 0.01 degree. From -18000 to 18000.
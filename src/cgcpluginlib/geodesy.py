@@ -0,0 +1,257 @@
+'''
+Vectorised geodesy on arrays of GeoLocationBase fixed point coordinates.
+
+Positions are (N, 2) or (N, 3) arrays of latitude, longitude and optionally altitude in GeoLocationBase units: 1e-7 degree and cm. Distances are in metres, bearings in degrees clockwise from North.
+
+Distances use the haversine formula on a sphere by default, which is within 0.5% of the WGS84 ellipsoid. Pass ellipsoid=True to apply Lambert's correction, which is within a few metres over thousands of kilometres.
+'''
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from cgcpluginlib import GeoLocationBase
+
+# GeoLocationBase units
+DEGREE_SCALE = 1e7
+ALTITUDE_SCALE = 100.0
+# Angular units
+ANGLE_SCALE = 100.0
+
+EARTH_RADIUS = 6371008.8
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+
+def to_degrees(fixed) -> np.ndarray:
+    '''
+    Convert 1e-7 degree integers to float degrees.
+    '''
+    return np.asarray(fixed, dtype=np.float64) / DEGREE_SCALE
+
+
+def from_degrees(degrees) -> np.ndarray:
+    '''
+    Convert float degrees to 1e-7 degree integers.
+    '''
+    return np.rint(np.asarray(degrees, dtype=np.float64) * DEGREE_SCALE).astype(np.int64)
+
+
+def to_array(locations: Sequence[GeoLocationBase]) -> np.ndarray:
+    '''
+    Convert GeoLocationBase objects to an (N, 3) int64 array of latitude, longitude and altitude.
+    '''
+    return np.array([(location.latitude, location.longitude, location.altitude) for location in locations], dtype=np.int64).reshape(-1, 3)
+
+
+def to_geolocations(positions) -> list:
+    '''
+    Convert an (N, 2) or (N, 3) fixed point array to GeoLocationBase objects. Altitude is 0 if the array has no altitude column.
+    '''
+    positions = np.asarray(positions)
+    if positions.shape[-1] == 2:
+        return [GeoLocationBase(latitude=latitude, longitude=longitude) for latitude, longitude in positions.tolist()]
+    return [GeoLocationBase(latitude=latitude, longitude=longitude, altitude=altitude) for latitude, longitude, altitude in positions[:, :3].tolist()]
+
+
+def from_rows(rows) -> np.ndarray:
+    '''
+    Take the (N, 3) positions out of a structured array with latitude, longitude and altitude columns, such as telemetryring.GeoLocationRing.array().
+    '''
+    return np.stack((rows['latitude'], rows['longitude'], rows['altitude']), axis=-1).astype(np.int64)
+
+
+def _radians(positions) -> Tuple[np.ndarray, np.ndarray]:
+    positions = np.asarray(positions)
+    return np.radians(positions[..., 0] / DEGREE_SCALE), np.radians(positions[..., 1] / DEGREE_SCALE)
+
+
+def _central_angle(lat1, lon1, lat2, lon2) -> np.ndarray:
+    hav = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * \
+        np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+
+
+def _lambert(lat1, lon1, lat2, lon2) -> np.ndarray:
+    # Lambert's formula for long lines, using reduced latitudes
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sigma = _central_angle(beta1, lon1, beta2, lon2)
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * \
+            np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * \
+            np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = WGS84_A * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma > 0, distance, 0.0)
+
+
+def distances(a, b, ellipsoid: bool = False) -> np.ndarray:
+    '''
+    Element wise ground distances in metres between two broadcastable position arrays.
+
+    Parameters:
+    - a: Fixed point positions.
+    - b: Fixed point positions.
+    - ellipsoid: Correct for the WGS84 ellipsoid.
+    '''
+    lat1, lon1 = _radians(a)
+    lat2, lon2 = _radians(b)
+    if ellipsoid:
+        return _lambert(lat1, lon1, lat2, lon2)
+    return EARTH_RADIUS * _central_angle(lat1, lon1, lat2, lon2)
+
+
+def distance_matrix(a, b=None, ellipsoid: bool = False) -> np.ndarray:
+    '''
+    Ground distances in metres between every pair of positions.
+
+    Parameters:
+    - a: (N, 2+) fixed point positions.
+    - b: (M, 2+) fixed point positions, a by default.
+    - ellipsoid: Correct for the WGS84 ellipsoid.
+
+    :return: An (N, M) array.
+    '''
+    a = np.asarray(a)
+    b = a if b is None else np.asarray(b)
+    return distances(a[:, None, :2], b[None, :, :2], ellipsoid)
+
+
+def bearings(a, b) -> np.ndarray:
+    '''
+    Element wise initial bearings in degrees from a to b, from 0 to 360 clockwise from North.
+    '''
+    lat1, lon1 = _radians(a)
+    lat2, lon2 = _radians(b)
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def destinations(a, bearing, distance) -> np.ndarray:
+    '''
+    Positions reached by travelling from a along a great circle.
+
+    Parameters:
+    - a: Fixed point start positions. An altitude column is carried over.
+    - bearing: Initial bearings in degrees clockwise from North.
+    - distance: Distances in metres.
+
+    :return: Fixed point positions with the same number of columns as a.
+    '''
+    a = np.asarray(a)
+    lat1, lon1 = _radians(a)
+    bearing = np.radians(np.asarray(bearing, dtype=np.float64))
+    angle = np.asarray(distance, dtype=np.float64) / EARTH_RADIUS
+
+    lat2 = np.arcsin(np.clip(np.sin(lat1) * np.cos(angle) +
+                     np.cos(lat1) * np.sin(angle) * np.cos(bearing), -1.0, 1.0))
+    lon2 = lon1 + np.arctan2(np.sin(bearing) * np.sin(angle) * np.cos(lat1),
+                             np.cos(angle) - np.sin(lat1) * np.sin(lat2))
+    lon2 = (lon2 + np.pi) % (2 * np.pi) - np.pi
+
+    columns = [from_degrees(np.degrees(lat2)), from_degrees(np.degrees(lon2))]
+    if a.shape[-1] > 2:
+        columns.append(np.broadcast_to(a[..., 2], columns[0].shape))
+    return np.stack(columns, axis=-1)
+
+
+def bounding_box(positions) -> Tuple[int, int, int, int]:
+    '''
+    The smallest latitude and longitude box containing the positions.
+
+    :return: (min latitude, min longitude, max latitude, max longitude) in 1e-7 degree. If the box crosses the antimeridian, min longitude is greater than max longitude.
+    '''
+    positions = np.asarray(positions)
+    latitudes = positions[:, 0]
+    longitudes = np.sort(positions[:, 1])
+    # The box leaves out the largest gap between consecutive longitudes, including the one across the antimeridian
+    gaps = np.diff(np.append(longitudes, longitudes[0] + 3600000000))
+    widest = int(np.argmax(gaps))
+    if widest == len(longitudes) - 1:
+        min_longitude, max_longitude = longitudes[0], longitudes[-1]
+    else:
+        min_longitude, max_longitude = longitudes[widest +
+                                                  1], longitudes[widest]
+    return int(latitudes.min()), int(min_longitude), int(latitudes.max()), int(max_longitude)
+
+
+def centroid(positions, weights: Optional[Sequence[float]] = None) -> np.ndarray:
+    '''
+    The centroid of the positions, averaged on the unit sphere so it is correct across the antimeridian and near the poles.
+
+    :return: A fixed point position with the same number of columns as the input. Altitude is the mean altitude.
+    '''
+    positions = np.asarray(positions)
+    lat, lon = _radians(positions)
+    vectors = np.stack((np.cos(lat) * np.cos(lon), np.cos(lat)
+                       * np.sin(lon), np.sin(lat)), axis=-1)
+    x, y, z = np.average(vectors, axis=0, weights=weights)
+    result = [from_degrees(np.degrees(np.arctan2(z, np.hypot(x, y)))),
+              from_degrees(np.degrees(np.arctan2(y, x)))]
+    if positions.shape[-1] > 2:
+        result.append(
+            np.rint(np.average(positions[:, 2], weights=weights)).astype(np.int64))
+    return np.array(result, dtype=np.int64)
+
+
+def to_local(positions, origin) -> np.ndarray:
+    '''
+    Project positions to a local east, north, up frame in metres around an origin. Accurate for distances of a few kilometres.
+
+    Parameters:
+    - positions: Fixed point positions.
+    - origin: A single fixed point position.
+
+    :return: An array of east and north, plus up if the positions have an altitude column.
+    '''
+    positions = np.asarray(positions)
+    origin = np.asarray(origin)
+    lat, lon = _radians(positions)
+    lat0, lon0 = _radians(origin)
+    dlon = (lon - lon0 + np.pi) % (2 * np.pi) - np.pi
+    east = dlon * np.cos(lat0) * EARTH_RADIUS
+    north = (lat - lat0) * EARTH_RADIUS
+    columns = [east, north]
+    if positions.shape[-1] > 2:
+        origin_altitude = origin[2] if origin.shape[-1] > 2 else 0
+        columns.append((positions[..., 2] - origin_altitude) / ALTITUDE_SCALE)
+    return np.stack(columns, axis=-1)
+
+
+def from_local(local, origin) -> np.ndarray:
+    '''
+    The inverse of to_local.
+
+    :return: Fixed point positions, with altitude if local has an up column.
+    '''
+    local = np.asarray(local, dtype=np.float64)
+    origin = np.asarray(origin)
+    lat0, lon0 = _radians(origin)
+    lat = lat0 + local[..., 1] / EARTH_RADIUS
+    lon = lon0 + local[..., 0] / (EARTH_RADIUS * np.cos(lat0))
+    lon = (lon + np.pi) % (2 * np.pi) - np.pi
+    columns = [from_degrees(np.degrees(lat)), from_degrees(np.degrees(lon))]
+    if local.shape[-1] > 2:
+        origin_altitude = origin[2] if origin.shape[-1] > 2 else 0
+        columns.append(
+            np.rint(local[..., 2] * ALTITUDE_SCALE + origin_altitude).astype(np.int64))
+    return np.stack(columns, axis=-1)
+
+
+def track_speeds(positions, times) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Ground speeds and headings between consecutive samples of a track, for example from telemetryring.GeoLocationRing.
+
+    Parameters:
+    - positions: (N, 2+) fixed point positions.
+    - times: N times in seconds.
+
+    :return: (speeds in m/s, headings in degrees), each with N - 1 entries.
+    '''
+    positions = np.asarray(positions)
+    times = np.asarray(times, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = distances(positions[:-1], positions[1:]) / np.diff(times)
+    return speeds, bearings(positions[:-1], positions[1:])
@@ -0,0 +1,141 @@
+import os
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+from cgcpluginlib.ostreamheatmap import HeatmapInfo, OStreamHeatmap
+from cgcpluginlib.outputwriter import OutputWriter, atomic_write_bytes
+from cgcpluginlib.pngencoder import PngEncoder
+
+# Colour map anchors, evenly spaced from the lowest to the highest value
+COLOUR_MAPS: Dict[str, Sequence[Tuple[int, int, int]]] = {
+    'jet': [(0, 0, 128), (0, 0, 255), (0, 128, 255), (0, 255, 255), (128, 255, 128), (255, 255, 0), (255, 128, 0), (255, 0, 0), (128, 0, 0)],
+    'hot': [(10, 0, 0), (128, 0, 0), (255, 0, 0), (255, 128, 0), (255, 255, 0), (255, 255, 128), (255, 255, 255)],
+    'viridis': [(68, 1, 84), (72, 40, 120), (62, 74, 137), (49, 104, 142), (38, 130, 142), (31, 158, 137), (53, 183, 121), (109, 205, 89), (180, 222, 44), (253, 231, 37)],
+    'grey': [(0, 0, 0), (255, 255, 255)],
+}
+
+# Palette index of pixels without data, it is fully transparent
+NO_DATA = 0
+
+
+def make_lut(colour_map: Union[str, Sequence[Tuple[int, int, int]]] = 'jet', alpha: int = 255) -> np.ndarray:
+    """
+    Build a 256 entry RGBA palette. Entry 0 is transparent for pixels without data, entries 1 to 255 run through the colour map.
+
+    Parameters:
+      - colour_map: The name of one of COLOUR_MAPS, or a list of RGB anchors.
+      - alpha: The opacity of the coloured entries.
+    """
+    anchors = np.asarray(COLOUR_MAPS[colour_map] if isinstance(colour_map, str) else colour_map, dtype=np.float64)
+    positions = np.linspace(0.0, 1.0, len(anchors))
+    steps = np.linspace(0.0, 1.0, 255)
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for channel in range(3):
+        lut[1:, channel] = np.rint(np.interp(steps, positions, anchors[:, channel]))
+    lut[1:, 3] = alpha
+    return lut
+
+
+class HeatmapRenderer:
+    """
+    Render 2-D scalar grids to palette PNG images for OStreamHeatmap.
+
+    Values are scaled by HeatmapInfo.scalingFactor, the value at full scale: 0 maps to the first colour of the LUT and scalingFactor to the last. NaN values, and values below transparent_below, are left transparent.
+
+    The LUT is stored in the PNG palette, so a pixel is encoded as a single byte index and never expanded to RGB. The scaling, index and scanline buffers are reused while the grid size stays the same.
+
+    Example:
+        ```
+        renderer = HeatmapRenderer(HeatmapInfo(scalingFactor=40.0, scalingUnit="C"), colour_map='hot')
+        renderer.write(temperatures, os.path.join(plugin_request.outputChannelFolder(0), 'heatmap.json'))
+        ```
+    """
+
+    def __init__(self, heatmapInfo: Optional[HeatmapInfo] = None, colour_map: Union[str, Sequence[Tuple[int, int, int]], np.ndarray] = 'jet', alpha: int = 255, transparent_below: Optional[float] = None, level: int = 1):
+        """
+        Parameters:
+          - heatmapInfo: The scaling of the grid values. HeatmapInfo() by default.
+          - colour_map: A name from COLOUR_MAPS, a list of RGB anchors, or a (256, 4) RGBA LUT from make_lut().
+          - alpha: The opacity of the heatmap, when the LUT is built from a colour map.
+          - transparent_below: Leave values below this transparent.
+          - level: The zlib compression level.
+        """
+        self.heatmapInfo = heatmapInfo or HeatmapInfo()
+        if isinstance(colour_map, np.ndarray):
+            self.lut = np.asarray(colour_map, dtype=np.uint8)
+        else:
+            self.lut = make_lut(colour_map, alpha)
+        self.transparent_below = transparent_below
+        self.encoder = PngEncoder(level)
+        self._scaled: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+
+    def _buffers(self, shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        if self._scaled is None or self._scaled.shape != shape:
+            self._scaled = np.empty(shape, dtype=np.float32)
+            self._mask = np.empty(shape, dtype=bool)
+        return self._scaled, self._mask
+
+    def indices(self, grid: np.ndarray) -> np.ndarray:
+        """
+        Map a grid to palette indices, in the scanline buffer of the encoder.
+
+        :return: A (height, width) uint8 view that is overwritten by the next call.
+        """
+        grid = np.asarray(grid)
+        if grid.ndim != 2:
+            raise ValueError("the grid must be 2-D")
+        height, width = grid.shape
+        scaled, mask = self._buffers(grid.shape)
+        scale = self.heatmapInfo.scalingFactor or 1.0
+
+        # 0 to scalingFactor -> 1.5 to 255.5, truncated to the indices 1 to 255
+        np.multiply(grid, 254.0 / scale, out=scaled, casting='unsafe')
+        np.clip(scaled, 0.0, 254.0, out=scaled)
+        scaled += 1.5
+        np.isnan(scaled, out=mask)
+        if self.transparent_below is not None:
+            mask |= grid < self.transparent_below
+        scaled[mask] = NO_DATA
+
+        pixels = self.encoder.pixels(height, width)[:, :, 0]
+        np.copyto(pixels, scaled, casting='unsafe')
+        return pixels
+
+    def render(self, grid: np.ndarray) -> bytes:
+        """
+        Render a grid to PNG bytes.
+        """
+        height, width = np.shape(grid)
+        self.indices(grid)
+        return self.encoder.encode_buffer(height, width, 1, self.lut)
+
+    def write(self, grid: np.ndarray, json_file: str, heatmap: Optional[OStreamHeatmap] = None, writer: Optional[OutputWriter] = None) -> OStreamHeatmap:
+        """
+        Render a grid next to an OStreamHeatmap json file and write both.
+
+        The image is written first, to the json file name with a .png extension, and the imageUrl of the heatmap is set to its file name.
+
+        Parameters:
+          - grid: The 2-D grid of values.
+          - json_file: The OStreamHeatmap json file.
+          - heatmap: The OStreamHeatmap to write, for example with a clickMap. A new one by default. Its heatmapInfo is set if it has none.
+          - writer: Queue both files on this OutputWriter instead of writing them on the calling thread.
+
+        :return: The OStreamHeatmap.
+        """
+        image_file = os.path.splitext(json_file)[0] + '.png'
+        png = self.render(grid)
+
+        if heatmap is None:
+            heatmap = OStreamHeatmap()
+        if heatmap.heatmapInfo is None:
+            heatmap.heatmapInfo = self.heatmapInfo
+        heatmap.imageUrl = os.path.basename(image_file)
+
+        if writer is not None:
+            writer.write(png, image_file)
+            writer.write(heatmap, json_file)
+        else:
+            atomic_write_bytes(png, image_file)
+            atomic_write_bytes(heatmap.json_bytes(), json_file)
+        return heatmap
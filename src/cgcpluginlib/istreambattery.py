@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-import json
 from typing import List, Optional
 from cgcpluginlib import IStream, IStreamType
+from cgcpluginlib.jsondecoder import JsonSource, decode_json
 
 
 @dataclass(repr=False)
@@ -22,43 +22,11 @@ class IStreamBattery(IStream):
         self.iStreamType = IStreamType.BATTERY
 
 
-def parse_IStreamBattery(file: str):
+def parse_IStreamBattery(file: JsonSource) -> IStreamBattery:
     '''
     Parse the IStreamBattery file.
 
     Parameters:
-    - file: The IStreamBattery file.
+    - file: The IStreamBattery file. Bytes, a memoryview or an already parsed dict are accepted as well.
     '''
-    with open(file) as f:
-        data = json.load(f)
-
-        iStreamType = data.get('iStreamType', None)
-        vehicleId = data.get('vehicleId', None)
-        channelId = data.get('channelId', None)
-        time = data.get('time', None)
-
-        percent = data.get('percent', None)
-        voltage = data.get('voltage', None)
-        current = data.get('current', None)
-        cellVoltages = data.get('cellVoltages', None)
-        numberOfDischarges = data.get('numberOfDischarges', None)
-        fullChargeCapacity = data.get('fullChargeCapacity', None)
-        designCapacity = data.get('designCapacity', None)
-        temperature = data.get('temperature', None)
-
-        istream_battery = IStreamBattery(
-            iStreamType=iStreamType,
-            vehicleId=vehicleId,
-            channelId=channelId,
-            time=time,
-            percent=percent,
-            voltage=voltage,
-            current=current,
-            cellVoltages=cellVoltages,
-            numberOfDischarges=numberOfDischarges,
-            fullChargeCapacity=fullChargeCapacity,
-            designCapacity=designCapacity,
-            temperature=temperature
-        )
-
-        return istream_battery
+    return decode_json(IStreamBattery, file)
@@ -0,0 +1,44 @@
+from typing import Iterable, List, Optional, Type
+from cgcpluginlib import IStream, IStreamType, tracing
+from cgcpluginlib.jsondecoder import JsonSource, get_decoder, load_json
+from cgcpluginlib.istreambattery import IStreamBattery
+from cgcpluginlib.istreamgeolocation import IStreamGeoLocation
+from cgcpluginlib.istreamgimbal import IStreamGimbal
+from cgcpluginlib.istreamsignalstrength import IStreamSignalStrength
+
+
+ISTREAM_CLASSES = {
+    IStreamType.BATTERY: IStreamBattery,
+    IStreamType.GEOLOCATION: IStreamGeoLocation,
+    IStreamType.GIMBAL: IStreamGimbal,
+    IStreamType.SIGNAL_STRENGTH: IStreamSignalStrength,
+}
+
+
+def decode_istream(source: JsonSource, istream_class: Optional[Type[IStream]] = None) -> IStream:
+    '''
+    Decode any IStream from a file path, bytes, memoryview or an already parsed dict.
+
+    Parameters:
+    - source: The IStream json.
+    - istream_class: The IStream class to decode. By default it is picked from the iStreamType of the json, unknown types are decoded as a plain IStream.
+    '''
+    with tracing.span('decode_istream', 'decode'):
+        data = load_json(source)
+        if istream_class is None:
+            istream_class = ISTREAM_CLASSES.get(data.get('iStreamType'), IStream)
+        return get_decoder(istream_class)(data)
+
+
+def decode_istreams(sources: Iterable[JsonSource], istream_class: Optional[Type[IStream]] = None) -> List[IStream]:
+    '''
+    Decode a batch of IStreams, see decode_istream.
+
+    Parameters:
+    - sources: The IStream jsons.
+    - istream_class: The IStream class to decode, picked per item from iStreamType by default.
+    '''
+    if istream_class is not None:
+        decoder = get_decoder(istream_class)
+        return [decoder(load_json(source)) for source in sources]
+    return [decode_istream(source) for source in sources]
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-import json
 from typing import Optional
 from cgcpluginlib import IStream, IStreamType
-from cgcpluginlib import GeoLocation, GeoLocationBase, Angular
+from cgcpluginlib import GeoLocation
+from cgcpluginlib.jsondecoder import JsonSource, decode_json
 
 
 @dataclass(repr=False)
@@ -17,59 +17,11 @@ class IStreamGeoLocation(IStream):
         self.iStreamType = IStreamType.GEOLOCATION
 
 
-def parse_IStreamGeoLocation(file: str):
+def parse_IStreamGeoLocation(file: JsonSource) -> IStreamGeoLocation:
     '''
     Parse the IStreamGeoLocation file.
 
     Parameters:
-    - file: The IStreamGeoLocation file.
+    - file: The IStreamGeoLocation file. Bytes, a memoryview or an already parsed dict are accepted as well.
     '''
-    with open(file) as f:
-        data = json.load(f)
-
-        iStreamType = data.get('iStreamType', None)
-        vehicleId = data.get('vehicleId', None)
-        channelId = data.get('channelId', None)
-        time = data.get('time', None)
-
-        position = data.get('position', None)
-        velocity = data.get('velocity', None)
-
-        if position is not None:
-            position = GeoLocation(
-                geolocation=GeoLocationBase(
-                    latitude=position['geolocation']['latitude'],
-                    longitude=position['geolocation']['longitude'],
-                    altitude=position['geolocation']['altitude']
-                ),
-                angular=Angular(
-                    roll=position['angular']['roll'],
-                    pitch=position['angular']['pitch'],
-                    yaw=position['angular']['yaw']
-                )
-            )
-
-        if velocity is not None:
-            velocity = GeoLocation(
-                geolocation=GeoLocationBase(
-                    latitude=velocity['geolocation']['latitude'],
-                    longitude=velocity['geolocation']['longitude'],
-                    altitude=velocity['geolocation']['altitude']
-                ),
-                angular=Angular(
-                    roll=velocity['angular']['roll'],
-                    pitch=velocity['angular']['pitch'],
-                    yaw=velocity['angular']['yaw']
-                )
-            )
-
-        istream_geolocation = IStreamGeoLocation(
-            iStreamType=iStreamType,
-            vehicleId=vehicleId,
-            channelId=channelId,
-            time=time,
-            position=position,
-            velocity=velocity
-        )
-
-    return istream_geolocation
+    return decode_json(IStreamGeoLocation, file)
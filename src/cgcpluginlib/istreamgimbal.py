@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional
 from cgcpluginlib import IStream, IStreamType
 from cgcpluginlib import Angular
-import json
+from cgcpluginlib.jsondecoder import JsonSource, decode_json
 
 
 @dataclass(repr=False)
@@ -16,36 +16,11 @@ class IStreamGimbal(IStream):
         self.iStreamType = IStreamType.GIMBAL
 
 
-def parse_IStreamGimbal(file: str):
+def parse_IStreamGimbal(file: JsonSource) -> IStreamGimbal:
     '''
-    Parse the IStreamBattery file.
+    Parse the IStreamGimbal file.
 
     Parameters:
-    - file: The IStreamBattery file.
+    - file: The IStreamGimbal file. Bytes, a memoryview or an already parsed dict are accepted as well.
     '''
-    with open(file) as f:
-        data = json.load(f)
-
-        iStreamType = data.get('iStreamType', None)
-        vehicleId = data.get('vehicleId', None)
-        channelId = data.get('channelId', None)
-        time = data.get('time', None)
-
-        gimbal = data.get('gimbal', None)
-        roll = gimbal['roll']
-        pitch = gimbal['pitch']
-        yaw = gimbal['yaw']
-
-        istream_gimbal = IStreamGimbal(
-            iStreamType=iStreamType,
-            vehicleId=vehicleId,
-            channelId=channelId,
-            time=time,
-            gimbal=Angular(
-                roll=roll,
-                pitch=pitch,
-                yaw=yaw
-            )
-        )
-
-        return istream_gimbal
+    return decode_json(IStreamGimbal, file)
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import Optional
 from cgcpluginlib import IStream, IStreamType
-import json
+from cgcpluginlib.jsondecoder import JsonSource, decode_json
 
 
 @dataclass(repr=False)
@@ -19,37 +19,11 @@ class IStreamSignalStrength(IStream):
         self.iStreamType = IStreamType.SIGNAL_STRENGTH
 
 
-def parse_IStreamSignalStrength(file: str):
+def parse_IStreamSignalStrength(file: JsonSource) -> IStreamSignalStrength:
     '''
-    Parse the IStreamBattery file.
+    Parse the IStreamSignalStrength file.
 
     Parameters:
-    - file: The IStreamBattery file.
+    - file: The IStreamSignalStrength file. Bytes, a memoryview or an already parsed dict are accepted as well.
     '''
-    with open(file) as f:
-        data = json.load(f)
-
-        iStreamType = data.get('iStreamType', None)
-        vehicleId = data.get('vehicleId', None)
-        channelId = data.get('channelId', None)
-        time = data.get('time', None)
-
-        level = data.get('level', None)
-        dbm = data.get('dbm', None)
-        standard = data.get('standard', None)
-        uplink = data.get('uplink', None)
-        downlink = data.get('downlink', None)
-
-        istream_gimbal = IStreamSignalStrength(
-            iStreamType=iStreamType,
-            vehicleId=vehicleId,
-            channelId=channelId,
-            time=time,
-            level=level,
-            dbm=dbm,
-            standard=standard,
-            uplink=uplink,
-            downlink=downlink
-        )
-
-        return istream_gimbal
+    return decode_json(IStreamSignalStrength, file)
@@ -0,0 +1,137 @@
+import dataclasses
+import json
+import os
+import typing
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Type, TypeVar, Union
+from cgcpluginlib import tracing
+
+T = TypeVar('T')
+
+JsonSource = Union[str, os.PathLike, bytes, bytearray, memoryview, dict]
+
+# dataclass -> function building an instance from a parsed json dict
+_decoders: Dict[type, Callable[[dict], Any]] = {}
+# The same for dataclasses nested in another one, which raise KeyError for missing fields
+_nested_decoders: Dict[type, Callable[[dict], Any]] = {}
+
+
+def load_json(source: JsonSource) -> Any:
+    """
+    Parse json from a file path, a buffer or an already parsed dict.
+
+    Parameters:
+      - source: A file path, bytes, bytearray, memoryview or dict. Strings are treated as file paths.
+    """
+    if isinstance(source, dict):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return json.loads(source)
+    if isinstance(source, memoryview):
+        return json.loads(source.tobytes())
+    with tracing.span('read', 'read', file=source):
+        with open(source, 'rb') as f:
+            data = f.read()
+    return json.loads(data)
+
+
+def _enum_converter(enum_type: Type[Enum]) -> Callable[[Any], Any]:
+    def convert(value):
+        if value is None:
+            return None
+        try:
+            return enum_type(value)
+        except ValueError:
+            # Keep values added to the platform after this library was released
+            return value
+    return convert
+
+
+def _dataclass_converter(cls: type) -> Callable[[Any], Any]:
+    def convert(value):
+        if not isinstance(value, dict):
+            return value
+        decoder = _nested_decoders.get(cls)
+        if decoder is None:
+            decoder = _build_decoder(cls, nested=True)
+        return decoder(value)
+    return convert
+
+
+def _list_converter(item_converter: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def convert(value):
+        if not isinstance(value, list):
+            return value
+        return [item_converter(item) for item in value]
+    return convert
+
+
+def _converter_for(hint: Any) -> Optional[Callable[[Any], Any]]:
+    """
+    Build the function converting a json value to the annotated type, or None if the json value can be used as is.
+    """
+    origin = typing.get_origin(hint)
+    args = typing.get_args(hint)
+
+    if origin is Union:
+        # Optional[X]
+        candidates = [arg for arg in args if arg is not type(None)]
+        return _converter_for(candidates[0]) if len(candidates) == 1 else None
+    if origin in (list, typing.List):
+        item_converter = _converter_for(args[0]) if args else None
+        return _list_converter(item_converter) if item_converter is not None else None
+    if isinstance(hint, type) and issubclass(hint, Enum):
+        return _enum_converter(hint)
+    if dataclasses.is_dataclass(hint):
+        return _dataclass_converter(hint)
+    return None
+
+
+def get_decoder(cls: Type[T]) -> Callable[[dict], T]:
+    """
+    Get the decoder for a dataclass, building and caching it on first use.
+
+    The decoder is generated from the dataclass fields and their annotations. Nested dataclasses, lists of dataclasses and enums are converted, other values are passed through. Fields missing from the json are set to None, but a nested object missing one of its fields raises KeyError.
+
+    Parameters:
+      - cls: The dataclass to decode.
+    """
+    decoder = _decoders.get(cls)
+    if decoder is not None:
+        return decoder
+    return _build_decoder(cls, nested=False)
+
+
+def _build_decoder(cls: type, nested: bool) -> Callable[[dict], Any]:
+    hints = typing.get_type_hints(cls)
+    namespace = {'cls': cls}
+    arguments = []
+    for idx, field in enumerate(dataclasses.fields(cls)):
+        if not field.init:
+            continue
+        value = f"data[{field.name!r}]" if nested else f"get({field.name!r})"
+        converter = _converter_for(hints.get(field.name))
+        if converter is None:
+            arguments.append(f"{field.name}={value}")
+        else:
+            namespace[f"convert_{idx}"] = converter
+            arguments.append(f"{field.name}=convert_{idx}({value})")
+
+    source = "def decode(data):\n    get = data.get\n    return cls(" + \
+        ", ".join(arguments) + ")\n"
+    exec(source, namespace)
+    decoder = namespace['decode']
+    (_nested_decoders if nested else _decoders)[cls] = decoder
+    return decoder
+
+
+def decode_json(cls: Type[T], source: JsonSource) -> T:
+    """
+    Decode a dataclass from json.
+
+    Parameters:
+      - cls: The dataclass to decode.
+      - source: A file path, bytes, bytearray, memoryview or an already parsed dict.
+    """
+    with tracing.span(cls.__name__, 'decode'):
+        return get_decoder(cls)(load_json(source))
@@ -1,4 +1,11 @@
+import dataclasses
 import json
+import sys
+from typing import Any, Callable, Dict
+from cgcpluginlib import tracing
+
+# Keyword arguments for @dataclass that give instances __slots__ instead of a __dict__, on Python versions that support it
+SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
 
 class CustomEncoder(json.JSONEncoder):
@@ -11,16 +18,123 @@ def remove_null_values(d) -> dict:
     return result
 
 
+# Types that json.dumps writes as is
+_SCALAR_TYPES = {str, int, float, bool, type(None)}
+
+# type -> function converting an instance to plain dicts, lists and scalars
+_plans: Dict[type, Callable[[Any], Any]] = {}
+
+
+def _to_plain(obj):
+    obj_type = type(obj)
+    if obj_type in _SCALAR_TYPES:
+        return obj
+    plan = _plans.get(obj_type)
+    if plan is None:
+        plan = _compile_plan(obj_type)
+    return plan(obj)
+
+
+def _scalar_plan(obj):
+    return obj
+
+
+def _sequence_plan(obj):
+    return [value if type(value) in _SCALAR_TYPES else _to_plain(value) for value in obj]
+
+
+def _dict_plan(obj):
+    return {key: value if type(value) in _SCALAR_TYPES else _to_plain(value) for key, value in obj.items() if value is not None}
+
+
+def _object_plan(obj):
+    return {key: value if type(value) in _SCALAR_TYPES else _to_plain(value) for key, value in obj.__dict__.items() if value is not None}
+
+
+def _dataclass_plan(obj_type: type) -> Callable[[Any], Any]:
+    """
+    Generate the plan of a dataclass that stores fields in slots or has trailing json fields.
+
+    Fields are written in declaration order, followed by the trailing fields and any other instance attributes, the same order a __dict__ based instance would have.
+    """
+    trailing = tuple(getattr(obj_type, '_json_trailing_fields', ()))
+    field_names = tuple(field.name for field in dataclasses.fields(obj_type)
+                        if field.name not in trailing) + trailing
+    has_dict = obj_type.__dictoffset__ != 0
+
+    lines = ["def plan(obj):", "    out = {}"]
+    for name in field_names:
+        lines += [f"    value = obj.{name}",
+                  "    if value is not None:",
+                  f"        out[{name!r}] = value if type(value) in scalar_types else to_plain(value)"]
+    if has_dict:
+        lines += ["    for key, value in obj.__dict__.items():",
+                  "        if value is not None and key not in known_names:",
+                  "            out[key] = value if type(value) in scalar_types else to_plain(value)"]
+    lines.append("    return out")
+
+    namespace = {'scalar_types': _SCALAR_TYPES, 'to_plain': _to_plain,
+                 'known_names': frozenset(field_names)}
+    exec("\n".join(lines) + "\n", namespace)
+    return namespace['plan']
+
+
+def _uses_slots(obj_type: type) -> bool:
+    return any(vars(klass).get('__slots__') for klass in obj_type.__mro__)
+
+
+def _compile_plan(obj_type: type) -> Callable[[Any], Any]:
+    # Enums are str or int subclasses, json.dumps writes them by value
+    if issubclass(obj_type, (str, int, float)):
+        plan = _scalar_plan
+    elif issubclass(obj_type, (list, tuple)):
+        plan = _sequence_plan
+    elif issubclass(obj_type, dict):
+        plan = _dict_plan
+    elif dataclasses.is_dataclass(obj_type) and (_uses_slots(obj_type) or getattr(obj_type, '_json_trailing_fields', ())):
+        plan = _dataclass_plan(obj_type)
+    else:
+        plan = _object_plan
+    _plans[obj_type] = plan
+    return plan
+
+
+class JsonLayoutList(list):
+    """
+    A list of values that are already plain dicts, lists and scalars without None values, for example built straight from arrays. The serializer writes it without converting it again.
+    """
+    __slots__ = ()
+
+
+_plans[JsonLayoutList] = _scalar_plan
+
+
 def get_json_repr(obj) -> str:
-    output = json.dumps(obj, cls=CustomEncoder)
-    filtered_dict = json.loads(output, object_hook=remove_null_values)
-    filtered_output = json.dumps(filtered_dict)
-    return filtered_output
+    """
+    Serialize an object to json, leaving out None values.
+
+    The object graph is converted in a single pass using a conversion plan cached per class, then encoded once. The output is the same as encoding with CustomEncoder and dropping None values with remove_null_values.
+    """
+    with tracing.span(type(obj).__name__, 'serialize'):
+        return json.dumps(_to_plain(obj))
 
 
 class JsonObject:
+    # Subclasses declared with SLOTS have no __dict__, other subclasses still get one
+    __slots__ = ()
+
+    # Dataclass fields written to json after the other fields
+    _json_trailing_fields = ()
+
     def __repr__(self) -> str:
         return get_json_repr(self)
 
     def json(self) -> str:
         return get_json_repr(self)
+
+    def json_bytes(self) -> bytes:
+        """
+        The json representation encoded as bytes, ready to be written to a file opened in binary mode.
+        """
+        # json.dumps escapes non ascii characters, so the ascii codec is a straight copy
+        return get_json_repr(self).encode('ascii')
@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Union
+
+# Read by instrumented code before it takes a timestamp, so disabled metrics cost one attribute lookup
+ENABLED = False
+
+# Histogram buckets are exact below 2 * _SUB_BUCKETS microseconds, above that every power of two is split into _SUB_BUCKETS buckets, a relative error of at most 1 / _SUB_BUCKETS
+_PRECISION = 5
+_SUB_BUCKETS = 1 << _PRECISION
+_PERCENTILES = (50, 90, 99, 99.9)
+
+_lock = threading.Lock()
+_counters: Dict[str, 'Counter'] = {}
+_histograms: Dict[str, 'Histogram'] = {}
+_gauges: Dict[str, Callable[[], Optional[Callable]]] = {}
+_started = time.time()
+_reporter: Optional['_Reporter'] = None
+
+
+class Counter:
+    """
+    A count of events, for example dropped frames.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.value = 0
+
+
+def _bucket(value: int) -> int:
+    shift = value.bit_length() - _PRECISION - 1
+    if shift <= 0:
+        return value
+    return (shift << _PRECISION) + (value >> shift)
+
+
+def _bucket_value(bucket: int) -> int:
+    """
+    The lowest value counted in a bucket.
+    """
+    if bucket < 2 * _SUB_BUCKETS:
+        return bucket
+    shift = (bucket >> _PRECISION) - 1
+    return (bucket - (shift << _PRECISION)) << shift
+
+
+class Histogram:
+    """
+    A latency histogram with log-linear buckets, in the style of HdrHistogram.
+
+    Durations are recorded in whole microseconds. Recording is O(1) and the memory used does not depend on the number of samples, percentiles are accurate to about 3%.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts: List[int] = []
+            self.count = 0
+            self._total = 0
+            self._min = None
+            self._max = 0
+
+    def record(self, seconds: float) -> None:
+        """
+        Record a duration in seconds. Negative durations, from clock adjustments, are recorded as 0.
+        """
+        value = max(0, int(seconds * 1e6))
+        bucket = _bucket(value)
+        with self._lock:
+            if bucket >= len(self._counts):
+                self._counts.extend([0] * (bucket + 1 - len(self._counts)))
+            self._counts[bucket] += 1
+            self.count += 1
+            self._total += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+
+    def percentile(self, percent: float) -> float:
+        """
+        :return: The duration in seconds that percent of the recorded durations do not exceed, or 0 if nothing was recorded.
+        """
+        with self._lock:
+            return self._percentile(percent)
+
+    def _percentile(self, percent: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                # The highest value of the bucket, but never above the largest recorded value
+                return min(_bucket_value(bucket + 1) - 1, self._max) / 1e6
+        return self._max / 1e6
+
+    def summary(self) -> dict:
+        """
+        :return: The count, and the min, mean, max and percentiles in seconds.
+        """
+        with self._lock:
+            result = {
+                'count': self.count,
+                'min': (self._min or 0) / 1e6,
+                'mean': self._total / self.count / 1e6 if self.count else 0.0,
+                'max': self._max / 1e6,
+            }
+            for percent in _PERCENTILES:
+                result[f'p{percent:g}'] = self._percentile(percent)
+        return result
+
+
+def counter(name: str) -> Counter:
+    """
+    Get or create the counter with a name.
+    """
+    with _lock:
+        metric = _counters.get(name)
+        if metric is None:
+            metric = _counters[name] = Counter(name)
+        return metric
+
+
+def histogram(name: str) -> Histogram:
+    """
+    Get or create the histogram with a name.
+    """
+    with _lock:
+        metric = _histograms.get(name)
+        if metric is None:
+            metric = _histograms[name] = Histogram(name)
+        return metric
+
+
+def gauge(name: str, function: Callable[[], Union[int, float, dict]]) -> None:
+    """
+    Register a function that is sampled at every snapshot, for example the depth of a queue.
+
+    A bound method is held weakly, its gauge disappears once its object is garbage collected.
+    """
+    if hasattr(function, '__self__'):
+        reference = weakref.WeakMethod(function)
+    else:
+        def reference():
+            return function
+    with _lock:
+        _gauges[name] = reference
+
+
+def snapshot() -> dict:
+    """
+    Read every metric.
+
+    :return: A dict of the time, the uptime in seconds, and the counters, histograms and gauges by name. Durations are in seconds.
+    """
+    with _lock:
+        counters = list(_counters.values())
+        histograms = list(_histograms.values())
+        gauges = list(_gauges.items())
+
+    sampled = {}
+    for name, reference in gauges:
+        function = reference()
+        if function is None:
+            with _lock:
+                if _gauges.get(name) is reference:
+                    del _gauges[name]
+            continue
+        try:
+            sampled[name] = function()
+        except Exception as error:
+            sampled[name] = f"error: {error}"
+
+    now = time.time()
+    return {
+        'time': now,
+        'uptime': now - _started,
+        'counters': {metric.name: metric.value for metric in counters},
+        'histograms': {metric.name: metric.summary() for metric in histograms},
+        'gauges': sampled,
+    }
+
+
+def write(file: str) -> None:
+    """
+    Write a snapshot to a json file, atomically.
+    """
+    import json
+    from cgcpluginlib.outputwriter import atomic_write_bytes
+    atomic_write_bytes(json.dumps(snapshot(), indent=2).encode(), file, 0o777)
+
+
+def reset() -> None:
+    """
+    Zero every counter and histogram.
+    """
+    with _lock:
+        metrics = list(_counters.values()) + list(_histograms.values())
+    for metric in metrics:
+        metric.reset()
+
+
+class _Reporter:
+    def __init__(self, file: str, interval: float):
+        self.file = file
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="MetricsReporter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._write()
+        self._write()
+
+    def _write(self):
+        try:
+            write(self.file)
+        except OSError as error:
+            print(f"metrics: failed to write {self.file}: {error}")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def enable(folder: Optional[str] = None, interval: float = 10.0, file_name: str = 'metrics.json') -> None:
+    """
+    Start recording metrics. Until this is called, instrumented code records nothing.
+
+    Parameters:
+      - folder: Write a snapshot to file_name in this folder every interval seconds, for example the --result-folder of the plugin. Snapshots are only available from snapshot() by default.
+      - interval: The number of seconds between snapshots written to the folder.
+      - file_name: The name of the snapshot file.
+    """
+    global ENABLED, _reporter
+    ENABLED = True
+    if folder is not None:
+        if _reporter is not None:
+            _reporter.stop()
+        _reporter = _Reporter(os.path.join(folder, file_name), interval)
+
+
+def disable() -> None:
+    """
+    Stop recording metrics. A last snapshot is written if snapshots are being written to a folder.
+    """
+    global ENABLED, _reporter
+    ENABLED = False
+    if _reporter is not None:
+        _reporter.stop()
+        _reporter = None
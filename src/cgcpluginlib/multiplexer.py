@@ -0,0 +1,382 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+from cgcpluginlib import metrics, tracing
+from cgcpluginlib.cpl import _MAX_POLL_INTERVAL, _WatcherInstrumentation, _rescan_index, exit_plugin_on_error
+from cgcpluginlib.fileindex import FileIndex
+from cgcpluginlib.pluginrequest import PluginRequest
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+# Files are only reported once complete: closed after writing, or renamed into the folder
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+
+# wd, mask, cookie, name length
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+class _Inotify:
+    """
+    A non blocking inotify instance, through ctypes so no extension module is needed.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.fd = fd
+
+    def add_watch(self, folder: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), folder)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm_watch(self.fd, wd)
+
+    def read(self) -> List[tuple]:
+        """
+        :return: The pending (wd, mask, name) events.
+        """
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _open_inotify(debug: bool = False) -> Optional[_Inotify]:
+    try:
+        return _Inotify()
+    except (OSError, AttributeError) as error:
+        # AttributeError: the C library has no inotify, for example on macOS
+        if debug:
+            print(f"FolderMultiplexer: inotify unavailable, polling instead, {error}")
+        return None
+
+
+class _Folder:
+    """
+    A watched folder and its callback.
+    """
+
+    def __init__(self, folder: str, callback: Callable[[str], None], file_extensions: List[str]):
+        self.folder = folder
+        self.callback = callback
+        self.index = FileIndex(folder, file_extensions)
+        self.instrumentation = _WatcherInstrumentation(folder)
+        self.wd: Optional[int] = None
+        self.last_processed_file = None
+        self.last_populate_time = time.time()
+
+
+class FolderMultiplexer:
+    """
+    Watch many folders with a single inotify instance and a single dispatch thread.
+
+    Each cpl.start_image_watcher or cpl.start_json_watcher call spawns its own thread, which with many cameras and channels means many threads contending for the GIL. A FolderMultiplexer keeps the thread count at one however many folders are watched, and sleeps until a file event arrives.
+
+    Every folder has its own latest-only coalescing: when several files arrive in a folder before its callback runs, the callback only gets the newest one. Callbacks run on the dispatch thread one after the other, so a slow callback delays every folder. Pass a workqueue.WorkDispatcher as the callback to run it elsewhere.
+
+    Folders that cannot be watched with inotify, because they do not exist yet, were removed or renamed, or the platform has no inotify, are polled every poll_interval seconds. A polled folder switches to events as soon as a watch can be added.
+
+    Example:
+        ```
+        multiplexer = FolderMultiplexer(stop_file=args.stop_file)
+        multiplexer.watch_plugin_request(plugin_request, image_callback=WorkDispatcher(run_inference), json_callback=on_channel_message)
+        multiplexer.start()
+        ```
+    """
+
+    def __init__(self, stop_file: Optional[str] = None, timeout: Optional[float] = None, poll_interval: float = _MAX_POLL_INTERVAL, debug: bool = False):
+        """
+        Parameters:
+          - stop_file: The file that will be created should a folder time out.
+          - timeout: Exit the plugin, like the cpl watchers, if a folder has been empty for this many seconds. Never by default.
+          - poll_interval: The number of seconds between scans of the folders that cannot be watched with inotify.
+        """
+        if timeout is not None and stop_file is None:
+            raise ValueError("stop_file is required with a timeout")
+        self.stop_file = stop_file
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.debug = debug
+
+        self._inotify = _open_inotify(debug)
+        self._folders: List[_Folder] = []
+        self._by_wd: Dict[int, List[_Folder]] = {}
+        self._polled: List[_Folder] = []
+        # Folders whose index changed since their callback last ran
+        self._dirty: Dict[int, _Folder] = {}
+        self._lock = threading.Lock()
+        # A socket pair instead of a pipe, select() on Windows only accepts sockets
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self._wake_write.setblocking(False)
+        # A selector instead of select.select, which fails once a descriptor is above FD_SETSIZE
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+        if self._inotify is not None:
+            self._selector.register(self._inotify.fd, selectors.EVENT_READ)
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def folders(self) -> List[str]:
+        return [folder.folder for folder in self._folders]
+
+    @property
+    def polled_folders(self) -> List[str]:
+        """
+        The folders that are polled because they cannot be watched with inotify.
+        """
+        return [folder.folder for folder in self._polled]
+
+    def watch(self, folder: str, callback: Callable[[str], None], file_extensions: List[str]) -> None:
+        """
+        Run the callback on the newest file in the folder whenever a new file is written. Can be called before or after start().
+
+        Parameters:
+          - folder: The folder to watch.
+          - callback: Called on the dispatch thread with the path of the newest file.
+          - file_extensions: A list of file extensions to watch for.
+
+        Raises RuntimeError once the multiplexer has been stopped.
+        """
+        entry = _Folder(folder, callback, file_extensions)
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("FolderMultiplexer is stopped")
+            self._folders.append(entry)
+            if not self._add_watch(entry):
+                self._polled.append(entry)
+            # Files written before the folder was watched
+            _rescan_index(entry.index, self.debug)
+            self._dirty[id(entry)] = entry
+            self._wake()
+
+    def watch_images(self, folder: str, callback: Callable[[str], None]) -> None:
+        """
+        Watch a folder for images (.jpeg and .jpg), see watch().
+        """
+        self.watch(folder, callback, ['.jpeg', '.jpg'])
+
+    def watch_jsons(self, folder: str, callback: Callable[[str], None]) -> None:
+        """
+        Watch a folder for json files, see watch().
+        """
+        self.watch(folder, callback, ['.json'])
+
+    def watch_plugin_request(self, plugin_request: PluginRequest, image_callback: Optional[Callable[[str], None]] = None, json_callback: Optional[Callable[[str], None]] = None, telemetry_callback: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Watch every folder listed in a PluginRequest. Folder types without a callback are not watched.
+
+        Parameters:
+          - image_callback: Called with the newest image of every cameraFeedsImageFolders folder.
+          - json_callback: Called with the newest json file of every input channel folder.
+          - telemetry_callback: Called with the newest json file of every gimbalsFolder, geolocationFolder, signalStrengthFolder and batteryFolder.
+        """
+        for telemetry_feeds in plugin_request.telemetryFeeds:
+            if image_callback is not None:
+                for folder in telemetry_feeds.cameraFeedsImageFolders or []:
+                    self.watch_images(folder, image_callback)
+            if telemetry_callback is not None:
+                folders = list(telemetry_feeds.gimbalsFolder or []) + [
+                    telemetry_feeds.geolocationFolder, telemetry_feeds.signalStrengthFolder, telemetry_feeds.batteryFolder]
+                for folder in folders:
+                    if folder:
+                        self.watch_jsons(folder, telemetry_callback)
+        if json_callback is not None:
+            for channel in plugin_request.inputChannels:
+                if channel.jsonFolder:
+                    self.watch_jsons(channel.jsonFolder, json_callback)
+
+    def start(self) -> 'FolderMultiplexer':
+        """
+        Start the dispatch thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="FolderMultiplexer")
+        self._thread.daemon = True
+        self._thread.start()
+        discovery = "inotify" if self._inotify is not None else "polling"
+        print(f"Folder multiplexer started on {len(self._folders)} folders ({discovery})")
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the dispatch thread, after the callback that is running returns. Stopping again does nothing.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        with self._lock:
+            self._selector.close()
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._wake_read.close()
+            self._wake_write.close()
+
+    def _wake(self) -> None:
+        # Called with the lock held while not stopped, so the socket is still open
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            pass
+
+    def _add_watch(self, entry: _Folder) -> bool:
+        if self._inotify is None:
+            return False
+        try:
+            entry.wd = self._inotify.add_watch(entry.folder)
+        except OSError as error:
+            if self.debug and error.errno != errno.ENOENT:
+                print(f"FolderMultiplexer: polling {entry.folder}, {error}")
+            return False
+        self._by_wd.setdefault(entry.wd, []).append(entry)
+        return True
+
+    def _mark(self, entry: _Folder) -> None:
+        self._dirty[id(entry)] = entry
+
+    def _handle_events(self) -> None:
+        for wd, mask, name in self._inotify.read():
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost, rebuild every index from the folder contents
+                for entry in self._folders:
+                    _rescan_index(entry.index, self.debug)
+                    self._mark(entry)
+                continue
+
+            entries = self._by_wd.get(wd, [])
+            if mask & _IN_MOVE_SELF:
+                # inotify follows the moved folder, events would be joined onto the old path
+                self._inotify.rm_watch(wd)
+                self._poll_instead(wd)
+                continue
+            if mask & _IN_IGNORED:
+                # The folder is gone, poll until it is back
+                self._poll_instead(wd)
+                continue
+            if mask & _IN_DELETE_SELF:
+                # Followed by IN_IGNORED
+                continue
+            if mask & _IN_ISDIR or not name:
+                continue
+
+            for entry in entries:
+                path = os.path.join(entry.folder, name)
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    changed = entry.index.update(path)
+                else:
+                    changed = entry.index.discard(path)
+                if changed:
+                    self._mark(entry)
+
+    def _poll_instead(self, wd: int) -> None:
+        for entry in self._by_wd.pop(wd, []):
+            entry.wd = None
+            self._polled.append(entry)
+
+    def _poll(self) -> None:
+        for entry in list(self._polled):
+            if self._add_watch(entry):
+                self._polled.remove(entry)
+            _rescan_index(entry.index, self.debug)
+            self._mark(entry)
+
+    def _dispatch(self, entry: _Folder) -> None:
+        newest_file = entry.index.newest()
+        if newest_file is None or newest_file == entry.last_processed_file:
+            return
+        entry.last_processed_file = newest_file
+        try:
+            if metrics.ENABLED or tracing.ENABLED:
+                entry.instrumentation.run(entry.index, newest_file, entry.callback)
+            else:
+                entry.callback(newest_file[0])
+        except Exception:
+            # One failing callback must not stop the other folders
+            traceback.print_exc()
+        entry.last_populate_time = time.time()
+
+    def _check_timeouts(self) -> None:
+        now = time.time()
+        for entry in self._folders:
+            if len(entry.index) == 0 and now - entry.last_populate_time > self.timeout:
+                error_msg = f"Folder {entry.folder} is empty and has not been populated for {self.timeout} seconds"
+                exit_plugin_on_error(error_msg, self.stop_file)
+
+    def _run(self):
+        last_poll = 0.0
+        while not self._stopped:
+            with self._lock:
+                wait = self.poll_interval if self._polled or self.timeout is not None else None
+            if self._dirty:
+                wait = 0
+            ready = {key.fd for key, _ in self._selector.select(wait)}
+            if self._stopped:
+                return
+
+            with self._lock:
+                if self._wake_read.fileno() in ready:
+                    try:
+                        while self._wake_read.recv(_READ_SIZE):
+                            pass
+                    except BlockingIOError:
+                        pass
+                if self._inotify is not None and self._inotify.fd in ready:
+                    self._handle_events()
+                if self._polled and time.monotonic() - last_poll >= self.poll_interval:
+                    last_poll = time.monotonic()
+                    self._poll()
+                dirty = list(self._dirty.values())
+                self._dirty.clear()
+
+            for entry in dirty:
+                self._dispatch(entry)
+            if self.timeout is not None:
+                self._check_timeouts()
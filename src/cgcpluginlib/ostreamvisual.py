@@ -1,7 +1,35 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from enum import Enum
+from itertools import repeat
+from typing import Any, List, Optional, Sequence
 from .ostream import OStream, OStreamType
-from .visualobject import VoPoint, VoVector, VoBox, VoImage, VoPolygon
+from .visualobject import VoPoint, VoVector, VoBox, VoImage, VoPolygon, VisualObjectType
+from .general import LabelType, ColourIndexType
+from .jsonobject import JsonLayoutList
+
+
+def _column(value: Any):
+    """
+    Turn a per-object array into a list, and a single value into an endless repeat of it. None stays None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        return repeat(value.value)
+    if isinstance(value, str) or not hasattr(value, '__len__'):
+        # NumPy scalars are converted to the matching Python type
+        return repeat(value.item() if hasattr(value, 'item') else value)
+    return value.tolist() if hasattr(value, 'tolist') else list(value)
+
+
+def _layouts(visual_object_type: VisualObjectType, columns: list) -> JsonLayoutList:
+    """
+    Zip columns into json layouts, leaving out columns that are None like the serializer leaves out None fields.
+    """
+    columns = [(key, column) for key, column in columns if column is not None]
+    columns.append(('visualObjectType', repeat(visual_object_type.value)))
+    keys = [key for key, _ in columns]
+    return JsonLayoutList(dict(zip(keys, row)) for row in zip(*(column for _, column in columns)))
 
 
 @dataclass(repr=False)
@@ -19,3 +47,93 @@ class OStreamVisual(OStream):
 
     def __post_init__(self):
         self.oStreamType = OStreamType.VISUAL
+
+    @classmethod
+    def from_arrays(cls, boxes=None, points=None, vectors=None, polygons=None, scores=None, labels=None, names: Optional[Sequence[str]] = None, colours=None, fill=None, labelType: Optional[LabelType] = None, clickables=None, src_width: Optional[float] = None, src_height: Optional[float] = None, decimals: Optional[int] = None, refWidth: int = 1920, refHeight: int = 1080, desc: str = "", imageUrl: Optional[str] = None) -> 'OStreamVisual':
+        """
+        Build an OStreamVisual straight from detector output arrays.
+
+        No VoBox, VoPoint, VoVector or VoPolygon objects are created. Each object is stored as a plain dict with the same json layout in a JsonLayoutList, which the serializer writes without converting it again. The output is the same as building the dataclasses from the same values.
+
+        The per-object values (scores, labels, colours, fill and clickables) can be a single value for every object or one value per object. Pass one kind of geometry per call if the kinds have different numbers of objects.
+
+        Parameters:
+          - boxes: N x 4 array of xmin, ymin, xmax, ymax.
+          - points: N x 2 array of x, y.
+          - vectors: N x 4 array of xmin, ymin, xmax, ymax.
+          - polygons: A list of M x 2 arrays of triangle strip vertexes.
+          - scores: Written to filterValue.
+          - labels: Written to name. Integer labels are looked up in names if it is given, and written as strings otherwise.
+          - names: The name of every integer label.
+          - colours: Written to outlineColourIndex.
+          - fill: Written to fill for boxes and polygons.
+          - labelType: The label type of every object.
+          - clickables: Written to clickable.
+          - src_width, src_height: The size of the image the coordinates refer to. Coordinates are rescaled to refWidth and refHeight when given.
+          - decimals: Round coordinates to this many decimals. Writing floats dominates the serialization time, and sub pixel digits are rarely useful.
+          - refWidth, refHeight: The reference size of the visual.
+
+        Example:
+            ```
+            visual = OStreamVisual.from_arrays(boxes=xyxy, scores=conf, labels=cls, names=model.names, colours=ColourIndexType.C3, src_width=640, src_height=640)
+            ```
+        """
+        import numpy as np
+
+        scale_x = refWidth / src_width if src_width else 1.0
+        scale_y = refHeight / src_height if src_height else 1.0
+
+        if labels is not None and names is not None:
+            labels = [names[label] for label in np.asarray(labels).tolist()]
+        if colours is not None and not hasattr(colours, '__len__'):
+            colours = ColourIndexType(colours)
+
+        def name_column():
+            if labels is None:
+                return ('name', repeat(""))
+            # name is a str field, integer class ids without names are written as their string
+            column = _column(labels)
+            return ('name', column if names is not None else map(str, column))
+
+        def attribute_columns():
+            # In VoPoint field order, marker is always left out
+            return [('filterValue', _column(scores)),
+                    ('clickable', _column(clickables)),
+                    ('labelType', _column(labelType)),
+                    ('outlineColourIndex', _column(colours))]
+
+        def scaled(coords, width: int):
+            coords = np.asarray(coords, dtype=np.float64).reshape(-1, width) * \
+                ((scale_x, scale_y) * (width // 2))
+            if decimals is not None:
+                coords = coords.round(decimals)
+            return coords.T.tolist()
+
+        visual = cls(desc=desc, imageUrl=imageUrl,
+                     refWidth=refWidth, refHeight=refHeight)
+
+        if points is not None:
+            x, y = scaled(points, 2)
+            visual.points = _layouts(VisualObjectType.POINT, [
+                name_column(), ('xmin', x), ('ymin', y)] + attribute_columns())
+
+        if vectors is not None:
+            xmin, ymin, xmax, ymax = scaled(vectors, 4)
+            visual.vectors = _layouts(VisualObjectType.VECTOR, [
+                name_column(), ('xmin', xmin), ('ymin', ymin)] + attribute_columns() + [
+                ('xmax', xmax), ('ymax', ymax)])
+
+        if boxes is not None:
+            xmin, ymin, xmax, ymax = scaled(boxes, 4)
+            visual.boxes = _layouts(VisualObjectType.BOX, [
+                name_column(), ('xmin', xmin), ('ymin', ymin)] + attribute_columns() + [
+                ('xmax', xmax), ('ymax', ymax), ('fill', _column(fill))])
+
+        if polygons is not None:
+            strips = [[{'x': x, 'y': y} for x, y in zip(*scaled(polygon, 2))]
+                      for polygon in polygons]
+            visual.polygons = _layouts(VisualObjectType.POLYGON, [
+                name_column(), ('xmin', repeat(0.0)), ('ymin', repeat(0.0))] + attribute_columns() + [
+                ('triangleStripVertexes', strips), ('fill', _column(fill))])
+
+        return visual
@@ -0,0 +1,278 @@
+import itertools
+import os
+import tempfile
+import threading
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, Optional, Union
+from cgcpluginlib import metrics, tracing
+
+if TYPE_CHECKING:
+    from cgcpluginlib import JsonObject
+
+# Numbers the default names, so unnamed writers do not share metrics
+_instance_numbers = itertools.count()
+
+
+class FsyncPolicy(str, Enum):
+    """
+    How hard an OutputWriter tries to get a result onto disk before it becomes visible.
+      - NEVER: Leave flushing to the OS. Fastest, a power cut can leave an empty file.
+      - FILE: fsync the file before renaming it into place.
+      - FILE_AND_DIR: Also fsync the folder after the rename, so the rename itself survives a power cut.
+    """
+    NEVER = "NEVER"
+    FILE = "FILE"
+    FILE_AND_DIR = "FILE_AND_DIR"
+
+
+def atomic_write_bytes(data: bytes, file: str, mode: int = 0o777, fsync: FsyncPolicy = FsyncPolicy.NEVER) -> None:
+    """
+    Write bytes to a file so readers only ever see the old or the complete new content.
+
+    The data is written to a temporary file in the same folder, which gets its permissions before it is renamed over the destination.
+
+    Parameters:
+      - data: The bytes to write.
+      - file: The file to write to.
+      - mode: The permissions of the file.
+      - fsync: See FsyncPolicy.
+    """
+    with tracing.span('write', 'write', file=file, size=len(data)):
+        _atomic_write_bytes(data, file, mode, fsync)
+
+
+def _atomic_write_bytes(data: bytes, file: str, mode: int, fsync: FsyncPolicy) -> None:
+    folder = os.path.dirname(file) or '.'
+    # The temporary name does not end with the extension, so file watchers ignore it
+    fd, tmp_file = tempfile.mkstemp(
+        dir=folder, prefix='.' + os.path.basename(file) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync != FsyncPolicy.NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, file)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if fsync == FsyncPolicy.FILE_AND_DIR and hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _digest(data: bytes) -> bytes:
+    # hashlib is only needed with skip_unchanged, it is imported on first use to keep it out of the import time of cpl
+    import hashlib
+    return hashlib.blake2b(data).digest()
+
+
+def to_bytes(data: Union['JsonObject', str, bytes, bytearray, memoryview]) -> bytes:
+    """
+    The bytes to write for a result: a JsonObject is serialized, a str is encoded as utf-8 and bytes-like objects are copied.
+    """
+    if isinstance(data, str):
+        return data.encode()
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, (bytearray, memoryview)):
+        # A copy, the caller may reuse its buffer once the result is queued
+        return bytes(data)
+    if hasattr(data, 'json_bytes'):
+        return data.json_bytes()
+    raise TypeError(f"Cannot write a {type(data).__name__}, expected a JsonObject, str or bytes")
+
+
+class OutputWriter:
+    """
+    Write results from a background thread, atomically.
+
+    Results are queued per destination file, which is usually one file per output channel. If the disk falls behind, only the newest pending result of each file is written and older ones are dropped.
+
+    With skip_unchanged, a result identical to the last one written to the same file is not written again. JsonObjects are compared by hashing their object graph before it is serialized, so an unchanged result is not serialized either. A keepalive rewrites an unchanged result periodically.
+
+    Example:
+        ```
+        writer = OutputWriter()
+        writer.write(visual, os.path.join(plugin_request.outputChannelFolder(0), 'visual.json'))
+        ...
+        writer.close()
+        ```
+    """
+
+    def __init__(self, mode: int = 0o777, fsync: FsyncPolicy = FsyncPolicy.NEVER, skip_unchanged: bool = False, keepalive: Optional[float] = None, name: Optional[str] = None):
+        """
+        Parameters:
+          - mode: The permissions of the written files.
+          - fsync: See FsyncPolicy.
+          - skip_unchanged: Skip results identical to the last result written to the same file.
+          - keepalive: Write an unchanged result anyway if the file has not been written for this many seconds.
+          - name: The name of the writer thread and the prefix of the metrics of this writer, unique per writer. OutputWriter-<n> by default.
+        """
+        self.mode = mode
+        self.fsync = FsyncPolicy(fsync)
+        self.skip_unchanged = skip_unchanged
+        self.keepalive = keepalive
+        if name is None:
+            name = f"OutputWriter-{next(_instance_numbers)}"
+        self.name = name
+
+        self.written = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.last_write_latency = 0.0
+        self.total_write_latency = 0.0
+        self.max_write_latency = 0.0
+
+        # file -> (data, time queued)
+        self._pending: Dict[str, tuple] = {}
+        # file -> (digest, time) of the last result accepted for that file
+        self._last: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._busy = False
+        self._closed = False
+
+        # Seconds from write() until the file was in place
+        self._latency_histogram = metrics.histogram(f"{name}.write_latency")
+        metrics.gauge(name, self._metric_values)
+
+        self._thread = threading.Thread(
+            target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of files waiting to be written.
+        """
+        return len(self._pending)
+
+    def _metric_values(self) -> dict:
+        return {'queue_depth': len(self._pending), 'written': self.written, 'skipped': self.skipped,
+                'coalesced': self.coalesced, 'failed': self.failed}
+
+    @property
+    def mean_write_latency(self) -> float:
+        """
+        The mean number of seconds from write() until the file was in place.
+        """
+        return self.total_write_latency / self.written if self.written else 0.0
+
+    def write(self, data: Union['JsonObject', str, bytes, bytearray, memoryview], file: str) -> bool:
+        """
+        Queue a result to be written. Returns straight away.
+
+        Parameters:
+          - data: A JsonObject, which is serialized on the calling thread, or the str or bytes-like object to write.
+          - file: The file to write to.
+
+        :return: False if the result was skipped because it is unchanged.
+        """
+        if not hasattr(data, 'json_bytes'):
+            data = to_bytes(data)
+            if self.skip_unchanged and self._unchanged(file, _digest(data)):
+                return False
+        elif self.skip_unchanged:
+            import json
+            import pickle
+            from cgcpluginlib.jsonobject import _to_plain
+            with tracing.span(type(data).__name__, 'serialize'):
+                plain = _to_plain(data)
+                # Pickling stores floats in binary, which is much cheaper than formatting them as json
+                if self._unchanged(file, _digest(pickle.dumps(plain, pickle.HIGHEST_PROTOCOL))):
+                    return False
+                try:
+                    data = json.dumps(plain).encode('ascii')
+                except Exception:
+                    # Do not skip the next identical result, this one was never queued
+                    with self._lock:
+                        self._last.pop(file, None)
+                    raise
+        else:
+            data = data.json_bytes()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("OutputWriter is closed")
+            if file in self._pending:
+                self.coalesced += 1
+            self._pending[file] = (data, time.perf_counter())
+            self._wake.notify()
+        return True
+
+    def _unchanged(self, file: str, digest: bytes) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(file)
+            if last is not None and last[0] == digest and (self.keepalive is None or now - last[1] < self.keepalive):
+                self.skipped += 1
+                return True
+            self._last[file] = (digest, now)
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued result has been written.
+
+        :return: False if the timeout expired first.
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self) -> None:
+        """
+        Write the queued results and stop the writer thread.
+        """
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wake.wait()
+                if not self._pending:
+                    return
+                file, (data, queued) = next(iter(self._pending.items()))
+                del self._pending[file]
+                self._busy = True
+
+            try:
+                atomic_write_bytes(data, file, self.mode, self.fsync)
+            except Exception as error:
+                # Any error, not just OSError, must not kill the thread or flush() and close() would block forever
+                print(f"OutputWriter: failed to write {file}: {error!r}")
+                with self._lock:
+                    self.failed += 1
+                    # Do not skip the next identical result, this one never made it
+                    self._last.pop(file, None)
+            else:
+                latency = time.perf_counter() - queued
+                with self._lock:
+                    self.written += 1
+                    self.last_write_latency = latency
+                    self.total_write_latency += latency
+                    self.max_write_latency = max(
+                        self.max_write_latency, latency)
+                if metrics.ENABLED:
+                    self._latency_histogram.record(latency)
+
+            with self._lock:
+                self._busy = False
+                if not self._pending:
+                    self._idle.notify_all()
@@ -0,0 +1,256 @@
+import os
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from cgcpluginlib import VoClickMap
+from cgcpluginlib.ostreamalphabitmap import OStreamAlphaBitMap
+from cgcpluginlib.outputwriter import OutputWriter, atomic_write_bytes
+from cgcpluginlib.pngencoder import PNG_SIGNATURE, PngEncoder, png_chunk
+from cgcpluginlib.visualobject import ClickBox
+
+Rect = Tuple[int, int, int, int]
+
+_ADLER_BASE = 65521
+# zlib stream header for the deflate method, 32K window and fastest compression
+_ZLIB_HEADER = b'\x78\x01'
+# An empty final fixed Huffman block, ends the deflate stream
+_DEFLATE_END = b'\x03\x00'
+
+
+def adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """
+    The adler32 of two concatenated pieces of data from the adler32 of each piece, as zlib's adler32_combine.
+    """
+    remainder = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % _ADLER_BASE
+    sum1 += (adler2 & 0xffff) + _ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + _ADLER_BASE - remainder
+    sum1 %= _ADLER_BASE
+    sum2 %= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+class OverlayWriter:
+    """
+    A persistent RGBA canvas written as the PNG overlay of an OStreamAlphaBitMap.
+
+    Drawing marks dirty rectangles. write() does nothing if nothing was drawn since the last write, otherwise only the horizontal bands touched by dirty rectangles are compressed again. Every band is compressed on its own and ends with a full flush, so the cached deflate output of clean bands is concatenated with the new output of dirty bands into one valid PNG stream.
+
+    Compression uses the Z_RLE strategy at level 1, which suits overlays that are mostly transparent.
+
+    Drawing with a clickable registers a clickable region, and the OStreamAlphaBitMap gets a VoClickMap with a ClickBox per region. Coordinates are in canvas pixels.
+
+    Example:
+        ```
+        overlay = OverlayWriter()
+        overlay.fill_rect(100, 100, 300, 200, (255, 0, 0, 128), clickable="zone-1")
+        overlay.write(os.path.join(plugin_request.outputChannelFolder(0), 'overlay.json'))
+        ```
+    """
+
+    def __init__(self, width: int = 1920, height: int = 1080, band_height: int = 32, level: int = 1):
+        """
+        Parameters:
+          - width, height: The canvas size.
+          - band_height: The number of rows compressed together. Smaller bands re-encode less after small changes and compress slightly worse.
+          - level: The zlib compression level.
+        """
+        self.width = width
+        self.height = height
+        self.band_height = band_height
+        self.level = level
+        self.encoder = PngEncoder(level)
+        # The canvas lives in the scanline buffer of the encoder, so encoding needs no copy
+        self.canvas = self.encoder.pixels(height, width, 4)
+        self._rows = self.encoder.scanlines(height, width * 4)
+
+        band_count = (height + band_height - 1) // band_height
+        self._bands: List[Optional[bytes]] = [None] * band_count
+        self._band_adlers: List[int] = [1] * band_count
+        self._dirty_rects: List[Rect] = [(0, 0, width, height)]
+        # Whether anything was drawn since the last write, encode() alone does not reset it
+        self._unwritten = True
+        self._regions: Dict[str, Rect] = {}
+
+        self.encoded_bands = 0
+        self.writes = 0
+        self.skipped = 0
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Whether anything was drawn since the last write.
+        """
+        return self._unwritten
+
+    @property
+    def dirty_rects(self) -> List[Rect]:
+        """
+        The (xmin, ymin, xmax, ymax) rectangles changed since the last encode, exclusive of xmax and ymax.
+        """
+        return list(self._dirty_rects)
+
+    def _clip(self, xmin: int, ymin: int, xmax: int, ymax: int) -> Optional[Rect]:
+        xmin, xmax = max(0, int(xmin)), min(self.width, int(xmax))
+        ymin, ymax = max(0, int(ymin)), min(self.height, int(ymax))
+        if xmin >= xmax or ymin >= ymax:
+            return None
+        return xmin, ymin, xmax, ymax
+
+    def mark_dirty(self, xmin: int, ymin: int, xmax: int, ymax: int) -> None:
+        """
+        Mark a rectangle as changed, after drawing into canvas directly.
+        """
+        rect = self._clip(xmin, ymin, xmax, ymax)
+        if rect is not None:
+            self._touch(rect)
+
+    def _touch(self, rect: Rect) -> None:
+        self._dirty_rects.append(rect)
+        self._unwritten = True
+
+    def _add_region(self, clickable: Optional[str], rect: Rect) -> None:
+        if clickable:
+            self._regions[clickable] = rect
+
+    def clear(self, xmin: int = 0, ymin: int = 0, xmax: Optional[int] = None, ymax: Optional[int] = None) -> None:
+        """
+        Make a rectangle transparent, the whole canvas by default. Clickable regions inside it are removed.
+        """
+        rect = self._clip(xmin, ymin, self.width if xmax is None else xmax, self.height if ymax is None else ymax)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self.canvas[y0:y1, x0:x1] = 0
+        self._touch(rect)
+        self._regions = {clickable: region for clickable, region in self._regions.items()
+                         if not (region[0] >= x0 and region[1] >= y0 and region[2] <= x1 and region[3] <= y1)}
+
+    def remove(self, clickable: str) -> None:
+        """
+        Clear a clickable region and remove it from the click map.
+        """
+        rect = self._regions.pop(clickable, None)
+        if rect is not None:
+            self.clear(*rect)
+
+    def fill_rect(self, xmin: int, ymin: int, xmax: int, ymax: int, rgba: Tuple[int, int, int, int], clickable: Optional[str] = None) -> None:
+        """
+        Fill a rectangle, exclusive of xmax and ymax, with a colour. Pixels are replaced, not blended.
+        """
+        rect = self._clip(xmin, ymin, xmax, ymax)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self.canvas[y0:y1, x0:x1] = rgba
+        self._touch(rect)
+        self._add_region(clickable, rect)
+
+    def blit(self, image: np.ndarray, x: int = 0, y: int = 0, clickable: Optional[str] = None) -> None:
+        """
+        Copy an RGBA image onto the canvas with its top left corner at x, y. Pixels are replaced, not blended.
+        """
+        image = np.asarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        rect = self._clip(x, y, x + width, y + height)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self.canvas[y0:y1, x0:x1] = image[y0 - y:y1 - y, x0 - x:x1 - x]
+        self._touch(rect)
+        self._add_region(clickable, rect)
+
+    def draw_mask(self, mask: np.ndarray, rgba: Tuple[int, int, int, int], x: int = 0, y: int = 0, clickable: Optional[str] = None) -> None:
+        """
+        Colour the pixels of a boolean mask, for example a segmentation mask, with its top left corner at x, y. The clickable region is the bounding box of the mask.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) == 0:
+            return
+        columns = np.flatnonzero(mask.any(axis=0))
+        rect = self._clip(x + columns[0], y + rows[0], x + columns[-1] + 1, y + rows[-1] + 1)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        self.canvas[y0:y1, x0:x1][mask[y0 - y:y1 - y, x0 - x:x1 - x]] = rgba
+        self._touch(rect)
+        self._add_region(clickable, rect)
+
+    def clickmap(self) -> Optional[VoClickMap]:
+        """
+        A VoClickMap with a ClickBox per clickable region, or None if there are none.
+        """
+        if not self._regions:
+            return None
+        return VoClickMap(clickBoxes=[ClickBox(xmin=x0, ymin=y0, xmax=x1, ymax=y1, clickable=clickable)
+                                      for clickable, (x0, y0, x1, y1) in self._regions.items()])
+
+    def _encode_band(self, band: int) -> None:
+        start = band * self.band_height
+        data = self._rows[start:start + self.band_height]
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, 9, zlib.Z_RLE)
+        # A full flush ends the band on a byte boundary without back references into other bands
+        self._bands[band] = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+        self._band_adlers[band] = zlib.adler32(data)
+        self.encoded_bands += 1
+
+    def encode(self) -> bytes:
+        """
+        Encode the canvas to PNG, compressing only the bands that changed.
+        """
+        for _, y0, _, y1 in self._dirty_rects:
+            for band in range(y0 // self.band_height, (y1 - 1) // self.band_height + 1):
+                self._bands[band] = None
+        self._dirty_rects = []
+
+        row_bytes = self._rows.shape[1]
+        adler = 1
+        for band in range(len(self._bands)):
+            if self._bands[band] is None:
+                self._encode_band(band)
+            rows = min(self.band_height, self.height - band * self.band_height)
+            adler = adler32_combine(adler, self._band_adlers[band], rows * row_bytes)
+
+        idat = b''.join([_ZLIB_HEADER] + self._bands + [_DEFLATE_END, struct.pack('>I', adler)])
+        return b''.join((PNG_SIGNATURE,
+                         png_chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 6, 0, 0, 0)),
+                         png_chunk(b'IDAT', idat),
+                         png_chunk(b'IEND', b'')))
+
+    def write(self, json_file: str, ostream: Optional[OStreamAlphaBitMap] = None, writer: Optional[OutputWriter] = None, force: bool = False) -> bool:
+        """
+        Write the overlay next to an OStreamAlphaBitMap json file, and the json file, if anything changed since the last write.
+
+        The image is written first, to the json file name with a .png extension. The imageUrl of the OStreamAlphaBitMap is set to its file name and its clickMap to clickmap().
+
+        Parameters:
+          - json_file: The OStreamAlphaBitMap json file.
+          - ostream: The OStreamAlphaBitMap to write. A new one by default.
+          - writer: Queue both files on this OutputWriter instead of writing them on the calling thread.
+          - force: Write even if nothing changed.
+
+        :return: False if the write was skipped because nothing changed.
+        """
+        if not self._unwritten and not force:
+            self.skipped += 1
+            return False
+
+        image_file = os.path.splitext(json_file)[0] + '.png'
+        png = self.encode()
+        if ostream is None:
+            ostream = OStreamAlphaBitMap()
+        ostream.imageUrl = os.path.basename(image_file)
+        ostream.clickMap = self.clickmap()
+
+        if writer is not None:
+            writer.write(png, image_file)
+            writer.write(ostream, json_file)
+        else:
+            atomic_write_bytes(png, image_file)
+            atomic_write_bytes(ostream.json_bytes(), json_file)
+        self._unwritten = False
+        self.writes += 1
+        return True
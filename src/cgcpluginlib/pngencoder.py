@@ -0,0 +1,102 @@
+import struct
+import zlib
+from typing import Optional
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG colour types by number of channels
+_COLOUR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """
+    A PNG chunk: length, type, data and the CRC of type and data.
+    """
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)))
+
+
+class PngEncoder:
+    """
+    Encode 8 bit images to PNG with the standard library zlib.
+
+    The filtered scanlines are assembled in a buffer that is reused while the image size stays the same, so encoding a video rate stream does not allocate a new frame sized buffer every frame.
+
+    Rows are stored unfiltered and compressed with the Z_RLE strategy at level 1, which is several times faster than the defaults and compresses heatmaps and overlays with large flat areas well.
+    """
+
+    def __init__(self, level: int = 1, strategy: int = zlib.Z_RLE):
+        """
+        Parameters:
+          - level: The zlib compression level.
+          - strategy: The zlib compression strategy.
+        """
+        self.level = level
+        self.strategy = strategy
+        self._rows: Optional[np.ndarray] = None
+
+    def scanlines(self, height: int, row_bytes: int) -> np.ndarray:
+        """
+        The reusable (height, 1 + row_bytes) scanline buffer. Column 0 holds the filter type of each row, which is 0 (none).
+        """
+        if self._rows is None or self._rows.shape != (height, row_bytes + 1):
+            self._rows = np.zeros((height, row_bytes + 1), dtype=np.uint8)
+        return self._rows
+
+    def pixels(self, height: int, width: int, channels: int = 1) -> np.ndarray:
+        """
+        A (height, width, channels) view of the scanline buffer to write pixels into before calling encode_buffer(), which saves a copy.
+        """
+        return self.scanlines(height, width * channels)[:, 1:].reshape(height, width, channels)
+
+    def _compress(self, rows: np.ndarray) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, 9, self.strategy)
+        return compressor.compress(rows) + compressor.flush()
+
+    def encode_buffer(self, height: int, width: int, channels: int = 1, palette: Optional[np.ndarray] = None) -> bytes:
+        """
+        Encode the pixels already written to pixels().
+
+        Parameters:
+          - height, width, channels: The image size, as passed to pixels().
+          - palette: A (N, 3) or (N, 4) uint8 colour table for a single channel image of palette indices. The fourth column is the alpha of each entry.
+        """
+        if palette is not None:
+            if channels != 1:
+                raise ValueError("a palette image has one channel")
+            palette = np.asarray(palette, dtype=np.uint8)
+            colour_type = 3
+        else:
+            colour_type = _COLOUR_TYPES[channels]
+
+        chunks = [PNG_SIGNATURE,
+                  png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0))]
+        if palette is not None:
+            chunks.append(png_chunk(b'PLTE', np.ascontiguousarray(palette[:, :3]).tobytes()))
+            if palette.shape[1] == 4:
+                chunks.append(png_chunk(b'tRNS', palette[:, 3].tobytes()))
+        chunks.append(png_chunk(b'IDAT', self._compress(self.scanlines(height, width * channels))))
+        chunks.append(png_chunk(b'IEND', b''))
+        return b''.join(chunks)
+
+    def encode(self, image: np.ndarray, palette: Optional[np.ndarray] = None) -> bytes:
+        """
+        Encode an image.
+
+        Parameters:
+          - image: A (height, width) or (height, width, channels) uint8 array. 1 channel is grey or palette indices, 2 grey and alpha, 3 RGB and 4 RGBA.
+          - palette: See encode_buffer().
+        """
+        image = np.asarray(image)
+        if image.ndim == 2:
+            image = image[:, :, None]
+        height, width, channels = image.shape
+        np.copyto(self.pixels(height, width, channels), image, casting='unsafe')
+        return self.encode_buffer(height, width, channels, palette)
+
+
+def encode_png(image: np.ndarray, palette: Optional[np.ndarray] = None, level: int = 1) -> bytes:
+    """
+    Encode an image to PNG, see PngEncoder.encode().
+    """
+    return PngEncoder(level).encode(image, palette)
@@ -0,0 +1,166 @@
+'''
+Project pixels of the camera image onto the ground.
+
+The camera is a pinhole camera looking along its optical axis, with the principal point in the centre of the reference frame of OStreamVisual (refWidth x refHeight). Its attitude comes from the gimbal Angular, optionally on top of the vehicle Angular, and its position from the vehicle GeoLocationBase. The ground is a flat plane, which is accurate for the footprint of a camera at drone altitudes.
+'''
+from enum import Enum
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import numpy as np
+from cgcpluginlib import Angular, GeoLocation, GeoLocationBase
+from cgcpluginlib.geodesy import ALTITUDE_SCALE, ANGLE_SCALE, from_local
+from cgcpluginlib.istreamgeolocation import IStreamGeoLocation
+from cgcpluginlib.istreamgimbal import IStreamGimbal
+
+# Camera axes (x right, y down, z forward) in body axes (x forward, y right, z down)
+_CAMERA_TO_BODY = np.array([[0.0, 0.0, 1.0],
+                            [1.0, 0.0, 0.0],
+                            [0.0, 1.0, 0.0]])
+
+
+class GroundModel(str, Enum):
+    '''
+    Where the ground is.
+      - FLAT_EARTH: A plane at a fixed altitude, in the same datum as the vehicle altitude.
+      - ABOVE_GROUND: A plane a given height below the vehicle, for example measured by a rangefinder. By default the vehicle altitude is taken as the height above ground.
+    '''
+    FLAT_EARTH = "FLAT_EARTH"
+    ABOVE_GROUND = "ABOVE_GROUND"
+
+
+def _attitude_matrix(roll: int, pitch: int, yaw: int) -> np.ndarray:
+    # Body to North, East, Down rotation for yaw, pitch, roll applied in that order
+    roll, pitch, yaw = np.radians(np.array([roll, pitch, yaw]) / ANGLE_SCALE)
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    return np.array([
+        [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+        [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+        [-sp, cp * sr, cp * cr],
+    ])
+
+
+@lru_cache(maxsize=256)
+def rotation_matrix(roll: int, pitch: int, yaw: int, vehicle_roll: Optional[int] = None, vehicle_pitch: Optional[int] = None, vehicle_yaw: Optional[int] = None) -> np.ndarray:
+    '''
+    The rotation from camera axes (x right, y down, z forward) to North, East, Down.
+
+    Matrices are cached per pose, so a stationary or hovering vehicle computes them once.
+
+    Parameters:
+    - roll, pitch, yaw: The camera attitude in 0.01 degree. Pitch is 0 at the horizon and -9000 straight down, yaw is 0 at North.
+    - vehicle_roll, vehicle_pitch, vehicle_yaw: If given, the camera attitude is relative to this vehicle attitude.
+    '''
+    matrix = _attitude_matrix(roll, pitch, yaw)
+    if vehicle_roll is not None:
+        matrix = _attitude_matrix(vehicle_roll, vehicle_pitch, vehicle_yaw) @ matrix
+    matrix = matrix @ _CAMERA_TO_BODY
+    matrix.flags.writeable = False
+    return matrix
+
+
+class GroundProjector:
+    '''
+    Project pixel coordinates of OStreamVisual onto the ground, vectorised over any number of pixels.
+
+    Example:
+        ```
+        projector = GroundProjector(hfov=84.0)
+        positions, valid = projector.project_istreams(pixels, geolocation, gimbal)
+        ```
+    '''
+
+    def __init__(self, hfov: float, vfov: Optional[float] = None, refWidth: int = 1920, refHeight: int = 1080, model: GroundModel = GroundModel.FLAT_EARTH, ground_altitude: int = 0, height_above_ground: Optional[int] = None, gimbal_relative: bool = False, max_range: Optional[float] = None):
+        '''
+        Parameters:
+        - hfov: The horizontal field of view of the camera in degrees.
+        - vfov: The vertical field of view in degrees. By default pixels are square.
+        - refWidth, refHeight: The reference frame the pixel coordinates are in, the same as OStreamVisual.
+        - model: See GroundModel.
+        - ground_altitude: The ground altitude in cm for FLAT_EARTH.
+        - height_above_ground: The height of the vehicle above the ground in cm for ABOVE_GROUND. By default the vehicle altitude.
+        - gimbal_relative: True if the gimbal Angular is relative to the vehicle, False if it is relative to the horizon and North.
+        - max_range: Pixels that hit the ground further than this many metres away are not valid.
+        '''
+        self.refWidth = refWidth
+        self.refHeight = refHeight
+        self.model = GroundModel(model)
+        self.ground_altitude = ground_altitude
+        self.height_above_ground = height_above_ground
+        self.gimbal_relative = gimbal_relative
+        self.max_range = max_range
+
+        fx = (refWidth / 2) / np.tan(np.radians(hfov) / 2)
+        fy = fx if vfov is None else (refHeight / 2) / np.tan(np.radians(vfov) / 2)
+        # Pixel to camera ray
+        self._inverse_intrinsics = np.array([[1 / fx, 0.0, -refWidth / 2 / fx],
+                                             [0.0, 1 / fy, -refHeight / 2 / fy],
+                                             [0.0, 0.0, 1.0]])
+
+    def _height(self, geolocation: GeoLocationBase) -> Tuple[float, int]:
+        # Height of the camera above the ground in metres, and the ground altitude in cm
+        if self.model == GroundModel.FLAT_EARTH:
+            return (geolocation.altitude - self.ground_altitude) / ALTITUDE_SCALE, self.ground_altitude
+        height = geolocation.altitude if self.height_above_ground is None else self.height_above_ground
+        return height / ALTITUDE_SCALE, geolocation.altitude - height
+
+    def project(self, pixels, position: GeoLocation, gimbal: Optional[Angular] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Project pixels onto the ground.
+
+        Parameters:
+        - pixels: (N, 2) x and y in the reference frame.
+        - position: The vehicle position and attitude.
+        - gimbal: The camera attitude. Without it the camera is fixed to the vehicle, looking forward.
+
+        :return: (positions, valid). positions is an (N, 3) array of latitude, longitude and altitude in GeoLocationBase units. valid is False for pixels at or above the horizon or beyond max_range, their positions are the vehicle position.
+        '''
+        geolocation = position.geolocation or GeoLocationBase()
+        vehicle = position.angular or Angular()
+        if gimbal is None:
+            rotation = rotation_matrix(vehicle.roll, vehicle.pitch, vehicle.yaw)
+        elif self.gimbal_relative:
+            rotation = rotation_matrix(gimbal.roll, gimbal.pitch, gimbal.yaw,
+                                       vehicle.roll, vehicle.pitch, vehicle.yaw)
+        else:
+            rotation = rotation_matrix(gimbal.roll, gimbal.pitch, gimbal.yaw)
+
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        # One matrix product takes every pixel from image coordinates to a North, East, Down ray
+        transform = rotation @ self._inverse_intrinsics
+        rays = pixels @ transform[:, :2].T + transform[:, 2]
+
+        height, ground_altitude = self._height(geolocation)
+        down = rays[:, 2]
+        valid = (down > 1e-9) & (height > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(valid, height / down, 0.0)
+        north = rays[:, 0] * scale
+        east = rays[:, 1] * scale
+        if self.max_range is not None:
+            valid &= np.hypot(north, east) <= self.max_range
+            north[~valid] = 0.0
+            east[~valid] = 0.0
+
+        origin = (geolocation.latitude, geolocation.longitude)
+        positions = np.empty((len(pixels), 3), dtype=np.int64)
+        positions[:, :2] = from_local(np.stack((east, north), axis=-1), origin)
+        positions[:, 2] = np.where(valid, ground_altitude, geolocation.altitude)
+        return positions, valid
+
+    def project_istreams(self, pixels, geolocation: IStreamGeoLocation, gimbal: Optional[IStreamGimbal] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Project pixels onto the ground using the latest IStreamGeoLocation and IStreamGimbal. See project().
+        '''
+        return self.project(pixels, geolocation.position or GeoLocation(), gimbal.gimbal if gimbal is not None else None)
+
+    def project_geolocations(self, pixels, position: GeoLocation, gimbal: Optional[Angular] = None) -> List[Optional[GeoLocationBase]]:
+        '''
+        Project pixels onto the ground, see project().
+
+        :return: A GeoLocationBase per pixel, None for pixels that do not hit the ground.
+        '''
+        positions, valid = self.project(pixels, position, gimbal)
+        return [GeoLocationBase(latitude=latitude, longitude=longitude, altitude=altitude) if ok else None
+                for (latitude, longitude, altitude), ok in zip(positions.tolist(), valid.tolist())]
@@ -0,0 +1,226 @@
+'''
+Level of detail simplification of polylines and polygons of GeoLocationBase positions.
+
+Every vertex gets an importance in metres, computed once in O(n log n). Simplifying with a tolerance keeps the vertices more important than the tolerance, a vertex budget keeps the most important vertices, so one pass serves any number of detail levels.
+'''
+import dataclasses
+import heapq
+import math
+from enum import Enum
+from typing import List, Optional, Sequence, Union
+import numpy as np
+from cgcpluginlib import GeoLocationBase, GeoPolygon
+from cgcpluginlib.geodesy import to_array, to_local
+from cgcpluginlib.ostreamgeoinfo import OStreamGeoInfos
+
+# Segments longer than this are measured with NumPy
+_VECTORISE_SEGMENT = 64
+
+Positions = Union[Sequence[GeoLocationBase], np.ndarray]
+
+
+class SimplifyMethod(str, Enum):
+    '''
+      - DOUGLAS_PEUCKER: Importance is the distance of a vertex from the simplified line. Keeps the shape within the tolerance.
+      - VISVALINGAM: Importance is the square root of the area a vertex adds. Keeps the area and looks smoother at coarse levels.
+    '''
+    DOUGLAS_PEUCKER = "DOUGLAS_PEUCKER"
+    VISVALINGAM = "VISVALINGAM"
+
+
+def _segment_distances(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ab = b - a
+    length2 = ab @ ab
+    if length2 == 0.0:
+        return np.hypot(points[:, 0] - a[0], points[:, 1] - a[1])
+    t = np.clip((points - a) @ ab / length2, 0.0, 1.0)
+    return np.hypot(points[:, 0] - a[0] - t * ab[0], points[:, 1] - a[1] - t * ab[1])
+
+
+def _farthest(xs: list, ys: list, first: int, last: int):
+    ax, ay = xs[first], ys[first]
+    abx, aby = xs[last] - ax, ys[last] - ay
+    length2 = abx * abx + aby * aby
+    split, value = first + 1, -1.0
+    for i in range(first + 1, last):
+        px, py = xs[i] - ax, ys[i] - ay
+        t = (px * abx + py * aby) / length2 if length2 else 0.0
+        t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+        dx, dy = px - t * abx, py - t * aby
+        distance2 = dx * dx + dy * dy
+        if distance2 > value:
+            split, value = i, distance2
+    return split, math.sqrt(value)
+
+
+def _douglas_peucker(xy: np.ndarray) -> np.ndarray:
+    importance = np.zeros(len(xy))
+    importance[0] = importance[-1] = np.inf
+    # A vertex is never more important than the vertex that split its segment, so thresholding gives the Douglas-Peucker result
+    xs = xy[:, 0].tolist()
+    ys = xy[:, 1].tolist()
+    stack = [(0, len(xy) - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        if last - first > _VECTORISE_SEGMENT:
+            distances = _segment_distances(xy[first + 1:last], xy[first], xy[last])
+            split = int(np.argmax(distances))
+            value = float(distances[split])
+            split += first + 1
+        else:
+            # Short segments are cheaper in plain Python than in NumPy
+            split, value = _farthest(xs, ys, first, last)
+        value = min(value, cap)
+        importance[split] = value
+        stack.append((first, split, value))
+        stack.append((split, last, value))
+    return importance
+
+
+def _visvalingam(xy: np.ndarray) -> np.ndarray:
+    count = len(xy)
+    xs = xy[:, 0].tolist()
+    ys = xy[:, 1].tolist()
+    previous = list(range(-1, count - 1))
+    following = list(range(1, count + 1))
+
+    def area(i):
+        a, b = previous[i], following[i]
+        return abs((xs[a] - xs[i]) * (ys[b] - ys[i]) - (xs[b] - xs[i]) * (ys[a] - ys[i])) / 2
+
+    areas = [0.0] * count
+    heap = []
+    for i in range(1, count - 1):
+        areas[i] = area(i)
+        heap.append((areas[i], i))
+    heapq.heapify(heap)
+
+    importance = np.full(count, np.inf)
+    largest = 0.0
+    while heap:
+        value, i = heapq.heappop(heap)
+        if value != areas[i] or importance[i] != np.inf:
+            continue
+        # Removing a vertex can make its neighbours cheaper to remove, the importance never drops below what was already removed
+        largest = max(largest, value)
+        importance[i] = largest
+        a, b = previous[i], following[i]
+        following[a] = b
+        previous[b] = a
+        for j in (a, b):
+            if 0 < j < count - 1:
+                areas[j] = area(j)
+                heapq.heappush(heap, (areas[j], j))
+    return np.sqrt(importance)
+
+
+def vertex_importance(positions: Positions, method: SimplifyMethod = SimplifyMethod.DOUGLAS_PEUCKER, closed: bool = False) -> np.ndarray:
+    '''
+    The importance of each vertex in metres. End points of polylines and the three most important vertices of polygons are infinite, they are always kept.
+
+    Parameters:
+    - positions: GeoLocationBase objects or an (N, 2+) fixed point array.
+    - method: See SimplifyMethod.
+    - closed: True for a polygon, the last vertex connects back to the first.
+    '''
+    if not isinstance(positions, np.ndarray):
+        positions = to_array(positions)
+    count = len(positions)
+    if count <= (3 if closed else 2):
+        return np.full(count, np.inf)
+
+    xy = to_local(positions[:, :2], positions[0])
+    if closed:
+        xy = np.concatenate((xy, xy[:1]))
+    if SimplifyMethod(method) == SimplifyMethod.VISVALINGAM:
+        importance = _visvalingam(xy)
+    else:
+        importance = _douglas_peucker(xy)
+    if closed:
+        importance = importance[:-1]
+        # A polygon needs three vertices
+        importance[np.argsort(importance[1:])[-2:] + 1] = np.inf
+    return importance
+
+
+def _select(importance: np.ndarray, tolerance: Optional[float], max_vertices: Optional[int]) -> np.ndarray:
+    keep = np.isinf(importance)
+    if tolerance is not None:
+        keep |= importance > tolerance
+    else:
+        keep[:] = True
+    if max_vertices is not None and np.count_nonzero(keep) > max_vertices:
+        # The most important vertices up to the budget, never dropping end points
+        budget = max(max_vertices, np.count_nonzero(np.isinf(importance)))
+        order = np.argsort(-importance, kind='stable')[:budget]
+        keep = np.zeros(len(importance), dtype=bool)
+        keep[order] = True
+    return np.flatnonzero(keep)
+
+
+def simplify_indices(positions: Positions, tolerance: Optional[float] = None, max_vertices: Optional[int] = None, method: SimplifyMethod = SimplifyMethod.DOUGLAS_PEUCKER, closed: bool = False) -> np.ndarray:
+    '''
+    The indices of the vertices kept, in order.
+
+    Parameters:
+    - positions: GeoLocationBase objects or an (N, 2+) fixed point array.
+    - tolerance: Drop vertices less important than this many metres.
+    - max_vertices: Keep at most this many vertices.
+    - method: See SimplifyMethod.
+    - closed: True for a polygon.
+    '''
+    return _select(vertex_importance(positions, method, closed), tolerance, max_vertices)
+
+
+def simplify(positions: Positions, tolerance: Optional[float] = None, max_vertices: Optional[int] = None, method: SimplifyMethod = SimplifyMethod.DOUGLAS_PEUCKER, closed: bool = False) -> Positions:
+    '''
+    Simplify a polyline or polygon, see simplify_indices().
+
+    :return: The kept vertices, a list of the same GeoLocationBase objects or an array, like positions.
+    '''
+    indices = simplify_indices(positions, tolerance, max_vertices, method, closed)
+    if isinstance(positions, np.ndarray):
+        return positions[indices]
+    return [positions[i] for i in indices.tolist()]
+
+
+def simplify_polygon(polygon: GeoPolygon, tolerance: Optional[float] = None, max_vertices: Optional[int] = None, method: SimplifyMethod = SimplifyMethod.DOUGLAS_PEUCKER) -> GeoPolygon:
+    '''
+    :return: A copy of the GeoPolygon with simplified positions.
+    '''
+    if not polygon.positions:
+        return dataclasses.replace(polygon)
+    return dataclasses.replace(polygon, positions=simplify(polygon.positions, tolerance, max_vertices, method, closed=True))
+
+
+def simplify_geoinfos(ostream: OStreamGeoInfos, tolerance: Optional[float] = None, max_vertices: Optional[int] = None, method: SimplifyMethod = SimplifyMethod.DOUGLAS_PEUCKER) -> OStreamGeoInfos:
+    '''
+    Simplify every GeoPolygon of an OStreamGeoInfos.
+
+    Parameters:
+    - ostream: The OStreamGeoInfos, it is not modified.
+    - tolerance: Drop vertices less important than this many metres.
+    - max_vertices: The vertex budget shared by all polygons. The least important vertices across all polygons are dropped first, so detailed polygons keep more vertices than simple ones.
+    - method: See SimplifyMethod.
+
+    :return: A copy with simplified polygons. GeoInfos are shared with the original.
+    '''
+    if not ostream.geoPolygons:
+        return dataclasses.replace(ostream)
+
+    importances = [vertex_importance(polygon.positions, method, closed=True) if polygon.positions else np.zeros(0)
+                   for polygon in ostream.geoPolygons]
+    selected = _select(np.concatenate(importances), tolerance, max_vertices)
+
+    polygons: List[GeoPolygon] = []
+    start = 0
+    for polygon, importance in zip(ostream.geoPolygons, importances):
+        end = start + len(importance)
+        indices = selected[np.searchsorted(selected, start):np.searchsorted(selected, end)] - start
+        if polygon.positions:
+            polygon = dataclasses.replace(polygon, positions=[polygon.positions[i] for i in indices.tolist()])
+        polygons.append(polygon)
+        start = end
+    return dataclasses.replace(ostream, geoPolygons=polygons)
@@ -0,0 +1,271 @@
+import bisect
+import copy
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+from cgcpluginlib import IStream, GeoLocation, GeoLocationBase, Angular
+from cgcpluginlib.istreamgeolocation import IStreamGeoLocation
+from cgcpluginlib.istreamgimbal import IStreamGimbal
+
+TimeValue = Union[float, int, str, datetime]
+
+
+def parse_istream_time(value: TimeValue) -> Optional[float]:
+    '''
+    Convert an IStream time to seconds since the epoch.
+
+    Parameters:
+    - value: An ISO 8601 string, a datetime, or a number of seconds since the epoch. Numbers too large to be seconds are treated as milliseconds.
+
+    :return: The time in seconds, or None if it cannot be parsed.
+    '''
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            text = value.strip()
+            if text.endswith('Z') or text.endswith('z'):
+                text = text[:-1] + '+00:00'
+            try:
+                return parse_istream_time(datetime.fromisoformat(text))
+            except ValueError:
+                return None
+    value = float(value)
+    return value / 1000.0 if value > 1e11 else value
+
+
+def format_istream_time(timestamp: float) -> str:
+    '''
+    Convert seconds since the epoch to an ISO 8601 IStream time.
+    '''
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _lerp(a: Optional[int], b: Optional[int], ratio: float) -> Optional[int]:
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    return int(round(a + (b - a) * ratio))
+
+
+def _lerp_angle(a: Optional[int], b: Optional[int], ratio: float) -> Optional[int]:
+    # Angles are in 0.01 degree from -18000 to 18000, take the short way around
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    delta = (b - a + 18000) % 36000 - 18000
+    return int(round((a + delta * ratio + 18000) % 36000 - 18000))
+
+
+def _lerp_angle_e7(a: Optional[int], b: Optional[int], ratio: float) -> Optional[int]:
+    # Longitudes are in 1e-7 degree, take the short way across the antimeridian
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    delta = (b - a + 1800000000) % 3600000000 - 1800000000
+    return int(round((a + delta * ratio + 1800000000) % 3600000000 - 1800000000))
+
+
+def _lerp_geolocation_base(a: Optional[GeoLocationBase], b: Optional[GeoLocationBase], ratio: float) -> Optional[GeoLocationBase]:
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    return GeoLocationBase(
+        latitude=_lerp(a.latitude, b.latitude, ratio),
+        longitude=_lerp_angle_e7(a.longitude, b.longitude, ratio),
+        altitude=_lerp(a.altitude, b.altitude, ratio)
+    )
+
+
+def _lerp_angular(a: Optional[Angular], b: Optional[Angular], ratio: float) -> Optional[Angular]:
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    return Angular(
+        roll=_lerp_angle(a.roll, b.roll, ratio),
+        pitch=_lerp_angle(a.pitch, b.pitch, ratio),
+        yaw=_lerp_angle(a.yaw, b.yaw, ratio)
+    )
+
+
+def _lerp_geolocation(a: Optional[GeoLocation], b: Optional[GeoLocation], ratio: float) -> Optional[GeoLocation]:
+    if a is None or b is None:
+        return a if ratio < 0.5 else b
+    return GeoLocation(
+        geolocation=_lerp_geolocation_base(
+            a.geolocation, b.geolocation, ratio),
+        angular=_lerp_angular(a.angular, b.angular, ratio)
+    )
+
+
+def interpolate_istream(a: IStream, b: IStream, ratio: float) -> IStream:
+    '''
+    Linearly interpolate between two samples of the same feed.
+
+    IStreamGeoLocation positions, velocities and angles and IStreamGimbal angles are interpolated, angles the short way around. Other types return the closer sample.
+
+    Parameters:
+    - a: The earlier sample.
+    - b: The later sample.
+    - ratio: 0 for a, 1 for b.
+    '''
+    if isinstance(a, IStreamGeoLocation) and isinstance(b, IStreamGeoLocation):
+        result = copy.copy(a if ratio < 0.5 else b)
+        result.position = _lerp_geolocation(a.position, b.position, ratio)
+        result.velocity = _lerp_geolocation(a.velocity, b.velocity, ratio)
+        return result
+    if isinstance(a, IStreamGimbal) and isinstance(b, IStreamGimbal):
+        result = copy.copy(a if ratio < 0.5 else b)
+        result.gimbal = _lerp_angular(a.gimbal, b.gimbal, ratio)
+        return result
+    return a if ratio < 0.5 else b
+
+
+class TelemetryHistory:
+    '''
+    A time sorted history of the samples of one telemetry feed, bounded by a time window.
+
+    Samples are keyed by IStream.time. Lookups are O(log n), appending in time order and evicting samples older than the window are amortised O(1). Lookups at a time that cannot be parsed return None, or an empty list for between().
+
+    Example:
+        ```
+        history = TelemetryHistory(window=30.0)
+        history.add(parse_IStreamGeoLocation(file))
+        position = history.interpolate(frame_time)
+        ```
+    '''
+
+    def __init__(self, window: float = 60.0):
+        '''
+        Parameters:
+        - window: The number of seconds of history kept, counted back from the newest sample.
+        '''
+        self.window = window
+        self.lock = threading.Lock()
+        self._times: List[float] = []
+        self._samples: List[IStream] = []
+        # Evicted samples are only removed from the lists once they make up half of them
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._times) - self._head
+
+    def add(self, sample: IStream, timestamp: Optional[TimeValue] = None) -> bool:
+        '''
+        Add a sample.
+
+        Parameters:
+        - sample: The sample to add.
+        - timestamp: The time of the sample, IStream.time by default.
+
+        :return: False if the sample has no usable time or is older than the window.
+        '''
+        timestamp = parse_istream_time(
+            sample.time if timestamp is None else timestamp)
+        if timestamp is None:
+            return False
+
+        with self.lock:
+            times = self._times
+            if len(times) > self._head and timestamp < times[-1]:
+                if timestamp < times[-1] - self.window:
+                    return False
+                idx = bisect.bisect_right(times, timestamp, self._head)
+                times.insert(idx, timestamp)
+                self._samples.insert(idx, sample)
+            else:
+                times.append(timestamp)
+                self._samples.append(sample)
+            self._evict(times[-1] - self.window)
+        return True
+
+    def _evict(self, oldest: float) -> None:
+        self._head = bisect.bisect_left(self._times, oldest, self._head)
+        if self._head > len(self._times) // 2:
+            del self._times[:self._head]
+            del self._samples[:self._head]
+            self._head = 0
+
+    def oldest(self) -> Optional[IStream]:
+        with self.lock:
+            return self._samples[self._head] if len(self) else None
+
+    def newest(self) -> Optional[IStream]:
+        with self.lock:
+            return self._samples[-1] if len(self) else None
+
+    def before(self, timestamp: TimeValue) -> Optional[IStream]:
+        '''
+        :return: The latest sample at or before the time, or None.
+        '''
+        timestamp = parse_istream_time(timestamp)
+        if timestamp is None:
+            return None
+        with self.lock:
+            idx = bisect.bisect_right(self._times, timestamp, self._head)
+            return self._samples[idx - 1] if idx > self._head else None
+
+    def after(self, timestamp: TimeValue) -> Optional[IStream]:
+        '''
+        :return: The earliest sample at or after the time, or None.
+        '''
+        timestamp = parse_istream_time(timestamp)
+        if timestamp is None:
+            return None
+        with self.lock:
+            idx = bisect.bisect_left(self._times, timestamp, self._head)
+            return self._samples[idx] if idx < len(self._times) else None
+
+    def nearest(self, timestamp: TimeValue) -> Optional[IStream]:
+        '''
+        :return: The sample closest in time, or None if the history is empty.
+        '''
+        timestamp = parse_istream_time(timestamp)
+        if timestamp is None:
+            return None
+        with self.lock:
+            idx = bisect.bisect_left(self._times, timestamp, self._head)
+            if idx == len(self._times):
+                return self._samples[-1] if len(self) else None
+            if idx > self._head and timestamp - self._times[idx - 1] <= self._times[idx] - timestamp:
+                return self._samples[idx - 1]
+            return self._samples[idx]
+
+    def interpolate(self, timestamp: TimeValue) -> Optional[IStream]:
+        '''
+        Interpolate a sample at the time, see interpolate_istream. Times outside the history return the oldest or newest sample.
+
+        :return: The interpolated sample, or None if the history is empty.
+        '''
+        timestamp = parse_istream_time(timestamp)
+        if timestamp is None:
+            return None
+        with self.lock:
+            times = self._times
+            idx = bisect.bisect_left(times, timestamp, self._head)
+            if idx == len(times):
+                return self._samples[-1] if len(self) else None
+            if idx == self._head or times[idx] == timestamp:
+                return self._samples[idx]
+            before_time, after_time = times[idx - 1], times[idx]
+            before, after = self._samples[idx - 1], self._samples[idx]
+
+        ratio = (timestamp - before_time) / (after_time - before_time)
+        result = interpolate_istream(before, after, ratio)
+        if result is not before and result is not after:
+            result.time = format_istream_time(timestamp)
+        return result
+
+    def between(self, start: TimeValue, end: TimeValue) -> List[IStream]:
+        '''
+        :return: The samples from start to end inclusive, oldest first.
+        '''
+        start = parse_istream_time(start)
+        end = parse_istream_time(end)
+        if start is None or end is None:
+            return []
+        with self.lock:
+            first = bisect.bisect_left(self._times, start, self._head)
+            last = bisect.bisect_right(self._times, end, self._head)
+            return self._samples[first:last]
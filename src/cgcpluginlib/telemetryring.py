@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional
+import numpy as np
+from cgcpluginlib import IStream, GeoLocation, GeoLocationBase, Angular
+from cgcpluginlib.istreamgeolocation import IStreamGeoLocation
+from cgcpluginlib.istreamgimbal import IStreamGimbal
+from cgcpluginlib.telemetryhistory import format_istream_time, parse_istream_time
+
+# time is in seconds since the epoch, the other columns use the fixed point units of GeoLocationBase and Angular
+GEOLOCATION_DTYPE = np.dtype([
+    ('time', np.float64),
+    ('latitude', np.int32),
+    ('longitude', np.int32),
+    ('altitude', np.int32),
+    ('roll', np.int16),
+    ('pitch', np.int16),
+    ('yaw', np.int16),
+])
+
+GIMBAL_DTYPE = np.dtype([
+    ('time', np.float64),
+    ('roll', np.int16),
+    ('pitch', np.int16),
+    ('yaw', np.int16),
+])
+
+
+class TelemetryRing(ABC):
+    """
+    A fixed capacity ring of telemetry samples stored as a NumPy structured array.
+
+    Once full, every new sample overwrites the oldest one. Samples are expected to be appended in time order, which keeps time range lookups to a binary search.
+
+    Subclasses define the conversion between samples and rows, see GeoLocationRing and GimbalRing.
+    """
+
+    def __init__(self, capacity: int, dtype: np.dtype):
+        """
+        Parameters:
+          - capacity: The maximum number of samples kept.
+          - dtype: The structured dtype of a sample, it must have a float64 time column.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros(capacity, dtype=self.dtype)
+        # The slot the next sample is written to
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append_rows(self, rows: np.ndarray) -> None:
+        """
+        Append a structured array of samples, oldest first.
+        """
+        rows = np.asarray(rows, dtype=self.dtype)
+        if len(rows) >= self.capacity:
+            self._data[:] = rows[-self.capacity:]
+            self._next = 0
+            self._count = self.capacity
+            return
+
+        first = min(len(rows), self.capacity - self._next)
+        self._data[self._next:self._next + first] = rows[:first]
+        self._data[:len(rows) - first] = rows[first:]
+        self._next = (self._next + len(rows)) % self.capacity
+        self._count = min(self._count + len(rows), self.capacity)
+
+    def append(self, sample: IStream) -> bool:
+        """
+        Append a sample.
+
+        :return: False if the sample has no usable time.
+        """
+        row = self.to_row(sample)
+        if row is None:
+            return False
+        self._data[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def extend(self, samples: Iterable[IStream]) -> int:
+        """
+        Append samples, oldest first.
+
+        :return: The number of samples appended.
+        """
+        rows = [row for row in map(self.to_row, samples) if row is not None]
+        if rows:
+            self.append_rows(np.array(rows, dtype=self.dtype))
+        return len(rows)
+
+    def array(self) -> np.ndarray:
+        """
+        :return: A copy of the samples, oldest first.
+        """
+        if self._count < self.capacity:
+            return self._data[:self._count].copy()
+        return np.concatenate((self._data[self._next:], self._data[:self._next]))
+
+    def between(self, start: float, end: float) -> np.ndarray:
+        """
+        :return: A copy of the samples with start <= time <= end, oldest first.
+        """
+        data = self.array()
+        times = data['time']
+        return data[np.searchsorted(times, start, 'left'):np.searchsorted(times, end, 'right')]
+
+    @abstractmethod
+    def to_row(self, sample: IStream) -> Optional[tuple]:
+        """
+        Convert a sample to a row of the structured array, or None if it cannot be stored.
+        """
+
+    @abstractmethod
+    def from_row(self, row) -> IStream:
+        """
+        Convert a row of the structured array back to a sample.
+        """
+
+    def to_istreams(self, rows: Optional[np.ndarray] = None) -> List[IStream]:
+        """
+        Export rows as IStream objects.
+
+        Parameters:
+          - rows: The rows to export, for example the result of between(). All samples by default.
+        """
+        if rows is None:
+            rows = self.array()
+        return [self.from_row(row) for row in rows.tolist()]
+
+
+class GeoLocationRing(TelemetryRing):
+    """
+    A TelemetryRing of IStreamGeoLocation positions, 26 bytes per sample.
+
+    Only the position is stored, velocity is left out.
+    """
+
+    def __init__(self, capacity: int, vehicleId: Optional[str] = None, channelId: Optional[str] = None):
+        """
+        Parameters:
+          - capacity: The maximum number of samples kept.
+          - vehicleId: The vehicleId set on exported samples.
+          - channelId: The channelId set on exported samples.
+        """
+        super().__init__(capacity, GEOLOCATION_DTYPE)
+        self.vehicleId = vehicleId
+        self.channelId = channelId
+
+    def to_row(self, sample: IStreamGeoLocation) -> Optional[tuple]:
+        timestamp = parse_istream_time(sample.time)
+        position = sample.position
+        if timestamp is None or position is None:
+            return None
+        geolocation = position.geolocation or GeoLocationBase()
+        angular = position.angular or Angular()
+        return (timestamp, geolocation.latitude, geolocation.longitude, geolocation.altitude,
+                angular.roll, angular.pitch, angular.yaw)
+
+    def from_row(self, row) -> IStreamGeoLocation:
+        timestamp, latitude, longitude, altitude, roll, pitch, yaw = row
+        return IStreamGeoLocation(
+            vehicleId=self.vehicleId,
+            channelId=self.channelId,
+            time=format_istream_time(timestamp),
+            position=GeoLocation(
+                geolocation=GeoLocationBase(
+                    latitude=latitude, longitude=longitude, altitude=altitude),
+                angular=Angular(roll=roll, pitch=pitch, yaw=yaw)
+            )
+        )
+
+
+class GimbalRing(TelemetryRing):
+    """
+    A TelemetryRing of IStreamGimbal angles, 14 bytes per sample.
+    """
+
+    def __init__(self, capacity: int, vehicleId: Optional[str] = None, channelId: Optional[str] = None):
+        """
+        Parameters:
+          - capacity: The maximum number of samples kept.
+          - vehicleId: The vehicleId set on exported samples.
+          - channelId: The channelId set on exported samples.
+        """
+        super().__init__(capacity, GIMBAL_DTYPE)
+        self.vehicleId = vehicleId
+        self.channelId = channelId
+
+    def to_row(self, sample: IStreamGimbal) -> Optional[tuple]:
+        timestamp = parse_istream_time(sample.time)
+        if timestamp is None or sample.gimbal is None:
+            return None
+        return (timestamp, sample.gimbal.roll, sample.gimbal.pitch, sample.gimbal.yaw)
+
+    def from_row(self, row) -> IStreamGimbal:
+        timestamp, roll, pitch, yaw = row
+        return IStreamGimbal(
+            vehicleId=self.vehicleId,
+            channelId=self.channelId,
+            time=format_istream_time(timestamp),
+            gimbal=Angular(roll=roll, pitch=pitch, yaw=yaw)
+        )
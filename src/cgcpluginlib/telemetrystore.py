@@ -0,0 +1,221 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Type
+from cgcpluginlib import IStream, IStreamType
+from cgcpluginlib.cpl import NewFileHandler, _event_observer_class, _observer_reports_close_events
+from cgcpluginlib.fileindex import FileIndex
+from cgcpluginlib.istreamdecoder import ISTREAM_CLASSES
+from cgcpluginlib.jsondecoder import get_decoder, load_json
+from cgcpluginlib.pluginrequest import PluginRequest
+from cgcpluginlib.telemetryhistory import TelemetryHistory
+
+
+class TelemetryFeed:
+    """
+    The latest decoded IStream of a single telemetry folder.
+
+    The newest file is only read and decoded again when its path, mtime or size changes. When the folder is watched, latest() does no I/O at all until a file event arrives.
+
+    With a history, every file written since the previous refresh is decoded and added to it, not just the newest one.
+    """
+
+    def __init__(self, folder: str, istream_class: Type[IStream], history: Optional[TelemetryHistory] = None):
+        self.folder = folder
+        self.istream_class = istream_class
+        self.history = history
+        self._history_mtime = float('-inf')
+        # Files already added to the history that have exactly _history_mtime, coarse timestamps give several files the same mtime
+        self._history_paths = set()
+        self.index = FileIndex(folder, ['.json'])
+        # Set by the observer when the folder changes
+        self.dirty = threading.Event()
+        self.dirty.set()
+        self.watched = False
+        self.lock = threading.Lock()
+        self._decoder = get_decoder(istream_class)
+        self._source: Optional[Tuple[str, int, int]] = None
+        self._value: Optional[IStream] = None
+        # Complete files that could not be decoded and were skipped
+        self.invalid_files = 0
+
+    def latest(self) -> Optional[IStream]:
+        """
+        :return: The IStream decoded from the newest file in the folder, or None if no file has been read yet.
+        """
+        if self.watched and not self.dirty.is_set():
+            return self._value
+
+        with self.lock:
+            self.dirty.clear()
+            if not self.watched:
+                try:
+                    self.index.rescan()
+                except FileNotFoundError:
+                    return self._value
+
+            if self.history is not None:
+                self._update_history()
+
+            newest_file = self.index.newest()
+            if newest_file is None:
+                return self._value
+
+            path = newest_file[0]
+            try:
+                with open(path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    source = (path, stat.st_mtime_ns, stat.st_size)
+                    if source == self._source:
+                        return self._value
+                    data = f.read()
+                self._value = self._decoder(load_json(data))
+                self._source = source
+            except (FileNotFoundError, ValueError):
+                # Removed or still being written, try again on the next call
+                self.dirty.set()
+            except KeyError as error:
+                # Complete but invalid, skip it until it changes
+                self._source = source
+                self.invalid_files += 1
+                print(f"TelemetryFeed: {path} is missing {error}")
+            return self._value
+
+    def _update_history(self) -> None:
+        files = self.index.since(self._history_mtime, inclusive=True)
+        for idx, (path, mtime) in enumerate(files):
+            if mtime == self._history_mtime and path in self._history_paths:
+                continue
+            try:
+                self.history.add(self._decoder(load_json(path)))
+            except FileNotFoundError:
+                pass
+            except (KeyError, ValueError) as error:
+                if isinstance(error, ValueError) and idx == len(files) - 1:
+                    # The newest file may still be being written, pick it up on the next refresh
+                    break
+                # A newer file exists, so this one is complete but invalid
+                self.invalid_files += 1
+                print(f"TelemetryFeed: skipping {path}, {error!r}")
+            if mtime != self._history_mtime:
+                self._history_mtime = mtime
+                self._history_paths = set()
+            self._history_paths.add(path)
+
+
+class TelemetryStore:
+    """
+    Keep the latest decoded IStream of every telemetry feed in a PluginRequest.
+
+    Example:
+        ```
+        store = TelemetryStore(parse_plugin_request(args.request_file))
+        geolocation = store.latest(IStreamType.GEOLOCATION)
+        gimbal = store.latest(IStreamType.GIMBAL, gimbal=1)
+        ```
+    """
+
+    def __init__(self, plugin_request: PluginRequest, watch: bool = True, history_window: Optional[float] = None):
+        """
+        Parameters:
+          - plugin_request: The plugin request listing the telemetry folders.
+          - watch: Watch the folders for file events so latest() does no I/O until a feed changes. Folders that cannot be watched, for example because they do not exist yet, are checked on every call instead.
+          - history_window: Keep a TelemetryHistory of this many seconds for every feed, see history().
+        """
+        self.feeds: Dict[Tuple[IStreamType, int, int], TelemetryFeed] = {}
+        for feed_idx, telemetry_feeds in enumerate(plugin_request.telemetryFeeds):
+            folders = [
+                (IStreamType.GEOLOCATION, 0, telemetry_feeds.geolocationFolder),
+                (IStreamType.BATTERY, 0, telemetry_feeds.batteryFolder),
+                (IStreamType.SIGNAL_STRENGTH, 0,
+                 telemetry_feeds.signalStrengthFolder),
+            ]
+            folders += [(IStreamType.GIMBAL, gimbal_idx, folder)
+                        for gimbal_idx, folder in enumerate(telemetry_feeds.gimbalsFolder or [])]
+            for istream_type, sub_idx, folder in folders:
+                if folder:
+                    history = TelemetryHistory(
+                        history_window) if history_window is not None else None
+                    self.feeds[(istream_type, feed_idx, sub_idx)] = TelemetryFeed(
+                        folder, ISTREAM_CLASSES[istream_type], history)
+
+        self.observer = self._watch(list(self.feeds.values())) if watch else None
+
+    @staticmethod
+    def _watch(feeds: List[TelemetryFeed]):
+        # Without file events the feeds stay unwatched, latest() checks the folder on every call instead
+        Observer = _event_observer_class()
+        if Observer is None:
+            return None
+        observer = Observer()
+        try:
+            observer.start()
+        except OSError:
+            return None
+
+        close_events = _observer_reports_close_events()
+        for feed in feeds:
+            try:
+                observer.schedule(NewFileHandler(
+                    feed.index, feed.dirty, close_events), feed.folder)
+                feed.index.rescan()
+            except OSError:
+                # The folder does not exist or the watch limit was reached
+                continue
+            feed.watched = True
+        return observer
+
+    def feed(self, istream_type: IStreamType, feed: int = 0, gimbal: int = 0) -> Optional[TelemetryFeed]:
+        """
+        Get a telemetry feed.
+
+        Parameters:
+          - istream_type: The type of telemetry.
+          - feed: The index of the entry in PluginRequest.telemetryFeeds.
+          - gimbal: The index of the folder in gimbalsFolder, only used for IStreamType.GIMBAL.
+        """
+        sub_idx = gimbal if istream_type == IStreamType.GIMBAL else 0
+        return self.feeds.get((istream_type, feed, sub_idx))
+
+    def latest(self, istream_type: IStreamType, feed: int = 0, gimbal: int = 0) -> Optional[IStream]:
+        """
+        Get the latest telemetry sample.
+
+        Parameters:
+          - istream_type: The type of telemetry.
+          - feed: The index of the entry in PluginRequest.telemetryFeeds.
+          - gimbal: The index of the folder in gimbalsFolder, only used for IStreamType.GIMBAL.
+
+        :return: The latest IStream of that feed, or None if the feed does not exist or has no data yet.
+        """
+        telemetry_feed = self.feed(istream_type, feed, gimbal)
+        if telemetry_feed is None:
+            return None
+        return telemetry_feed.latest()
+
+    def history(self, istream_type: IStreamType, feed: int = 0, gimbal: int = 0) -> Optional[TelemetryHistory]:
+        """
+        Get the history of a feed, brought up to date with the files written since the last call.
+
+        Parameters:
+          - istream_type: The type of telemetry.
+          - feed: The index of the entry in PluginRequest.telemetryFeeds.
+          - gimbal: The index of the folder in gimbalsFolder, only used for IStreamType.GIMBAL.
+
+        :return: The history, or None if the feed does not exist or the store was created without a history_window.
+        """
+        telemetry_feed = self.feed(istream_type, feed, gimbal)
+        if telemetry_feed is None or telemetry_feed.history is None:
+            return None
+        telemetry_feed.latest()
+        return telemetry_feed.history
+
+    def stop(self) -> None:
+        """
+        Stop watching the telemetry folders.
+        """
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        for telemetry_feed in self.feeds.values():
+            telemetry_feed.watched = False
@@ -0,0 +1,181 @@
+import atexit
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+# Read by instrumented code before it times a stage, so disabled tracing costs one attribute lookup
+ENABLED = False
+
+# (name, category, start, end, thread id, args), times from time.perf_counter
+_events: deque = deque()
+_thread_names = {}
+_file: Optional[str] = None
+_atexit_registered = False
+
+
+def _record(name: str, category: str, start: float, end: float, args: Optional[dict]) -> None:
+    tid = threading.get_native_id()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    # deque.append is atomic, no lock is needed
+    _events.append((name, category, start, end, tid, args))
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args: Optional[dict]):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, self.category, self.start, time.perf_counter(), self.args)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, category: str = 'user', **args):
+    """
+    A context manager recording how long its block took, as a span of the trace. Does nothing while tracing is disabled.
+
+    Parameters:
+      - name: The name of the stage, for example 'inference'.
+      - category: Groups spans in the trace viewer. The library's own spans use 'watcher', 'dispatcher', 'read', 'decode', 'serialize' and 'write'.
+      - args: Shown with the span in the trace viewer, for example the file being processed.
+
+    Example:
+        ```
+        with tracing.span('inference', file=image_path):
+            detections = model(image)
+        ```
+    """
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, category, args or None)
+
+
+def add_span(name: str, start: float, end: float, category: str = 'user', **args) -> None:
+    """
+    Record a span timed elsewhere. Does nothing while tracing is disabled.
+
+    Parameters:
+      - start, end: Times from time.perf_counter.
+    """
+    if ENABLED:
+        _record(name, category, start, end, args or None)
+
+
+def traced(name: Optional[str] = None, category: str = 'user') -> Callable[[Callable], Callable]:
+    """
+    A decorator recording every call of a function as a span. Whether tracing is enabled is checked on every call, so functions can be decorated before parse_args() enables it.
+
+    Parameters:
+      - name: The name of the span, the qualified name of the function by default.
+
+    Example:
+        ```
+        @tracing.traced()
+        def run_inference(image_path):
+            ...
+        ```
+    """
+    def decorate(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(span_name, category, start, time.perf_counter(), None)
+        return wrapper
+    return decorate
+
+
+def trace_events() -> list:
+    """
+    The recorded spans as Chrome trace events, with a metadata event naming each thread.
+    """
+    pid = os.getpid()
+    events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+              for tid, thread_name in list(_thread_names.items())]
+    for name, category, start, end, tid, args in list(_events):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': round(start * 1e6, 3), 'dur': round((end - start) * 1e6, 3)}
+        if args:
+            event['args'] = {key: value if isinstance(value, (int, float, bool)) else str(value) for key, value in args.items()}
+        events.append(event)
+    return events
+
+
+def flush(file: Optional[str] = None) -> None:
+    """
+    Write every span recorded so far to a Chrome trace json file, which can be opened in Perfetto (ui.perfetto.dev) or chrome://tracing. The file is replaced atomically.
+
+    Parameters:
+      - file: The trace file, the file passed to enable() by default. Nothing is written if neither is set.
+    """
+    file = file or _file
+    if file is None:
+        return
+    import json
+    from cgcpluginlib.outputwriter import atomic_write_bytes
+    document = {'traceEvents': trace_events(), 'displayTimeUnit': 'ms'}
+    try:
+        atomic_write_bytes(json.dumps(document).encode(), file, 0o777)
+    except OSError as error:
+        print(f"tracing: failed to write {file}: {error}")
+
+
+def enable(file: Optional[str] = None, max_events: int = 1000000) -> None:
+    """
+    Start recording spans. Spans are kept in memory and written to the file when the interpreter exits, the stop file is detected, or flush() is called.
+
+    Parameters:
+      - file: The Chrome trace json file to write.
+      - max_events: The number of spans kept in memory, older spans are dropped first.
+    """
+    global ENABLED, _events, _file, _atexit_registered
+    _events = deque(_events, maxlen=max_events)
+    _file = file
+    ENABLED = True
+    if not _atexit_registered:
+        atexit.register(flush)
+        _atexit_registered = True
+
+
+def disable() -> None:
+    """
+    Stop recording spans. Recorded spans are kept until clear().
+    """
+    global ENABLED
+    ENABLED = False
+
+
+def clear() -> None:
+    """
+    Drop every recorded span.
+    """
+    _events.clear()
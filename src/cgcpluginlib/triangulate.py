@@ -0,0 +1,596 @@
+'''
+Turn polygon outlines into the triangle strips of VoPolygon and ClickPolygon.
+
+Outlines are triangulated by ear clipping with holes, following the earcut algorithm: holes are bridged into the outline, and for large outlines the ear test only looks at vertices near the ear through a z-order curve, which keeps it close to O(n log n). The triangles are then joined into a single strip, with degenerate triangles between separate runs.
+
+Strips are cached per outline, so an overlay that does not change between frames is triangulated once.
+'''
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from cgcpluginlib import VoPolygon, VoVertex
+from cgcpluginlib.visualobject import ClickPolygon
+
+# Outlines with more vertices than this use the z-order curve for the ear test
+_HASHED_VERTICES = 80
+
+
+class _Node:
+    __slots__ = ('i', 'x', 'y', 'prev', 'next', 'z', 'prevZ', 'nextZ', 'steiner')
+
+    def __init__(self, i: int, x: float, y: float):
+        self.i = i
+        self.x = x
+        self.y = y
+        self.prev = None
+        self.next = None
+        self.z = 0
+        self.prevZ = None
+        self.nextZ = None
+        self.steiner = False
+
+
+def _area(p: _Node, q: _Node, r: _Node) -> float:
+    return (q.y - p.y) * (r.x - q.x) - (q.x - p.x) * (r.y - q.y)
+
+
+def _equals(p: _Node, q: _Node) -> bool:
+    return p.x == q.x and p.y == q.y
+
+
+def _point_in_triangle(ax, ay, bx, by, cx, cy, px, py) -> bool:
+    return ((cx - px) * (ay - py) >= (ax - px) * (cy - py) and
+            (ax - px) * (by - py) >= (bx - px) * (ay - py) and
+            (bx - px) * (cy - py) >= (cx - px) * (by - py))
+
+
+def _insert_node(i: int, x: float, y: float, last: Optional[_Node]) -> _Node:
+    p = _Node(i, x, y)
+    if last is None:
+        p.prev = p
+        p.next = p
+    else:
+        p.next = last.next
+        p.prev = last
+        last.next.prev = p
+        last.next = p
+    return p
+
+
+def _remove_node(p: _Node) -> None:
+    p.next.prev = p.prev
+    p.prev.next = p.next
+    if p.prevZ is not None:
+        p.prevZ.nextZ = p.nextZ
+    if p.nextZ is not None:
+        p.nextZ.prevZ = p.prevZ
+
+
+def _signed_area(data: List[float], start: int, end: int) -> float:
+    total = 0.0
+    j = end - 2
+    for i in range(start, end, 2):
+        total += (data[j] - data[i]) * (data[i + 1] + data[j + 1])
+        j = i
+    return total
+
+
+def _linked_list(data: List[float], start: int, end: int, clockwise: bool) -> Optional[_Node]:
+    last = None
+    if clockwise == (_signed_area(data, start, end) > 0):
+        for i in range(start, end, 2):
+            last = _insert_node(i // 2, data[i], data[i + 1], last)
+    else:
+        for i in range(end - 2, start - 1, -2):
+            last = _insert_node(i // 2, data[i], data[i + 1], last)
+    if last is not None and _equals(last, last.next):
+        _remove_node(last)
+        last = last.next
+    return last
+
+
+def _filter_points(start: Optional[_Node], end: Optional[_Node] = None) -> Optional[_Node]:
+    # Remove duplicate and collinear points
+    if start is None:
+        return start
+    if end is None:
+        end = start
+    p = start
+    while True:
+        again = False
+        if not p.steiner and (_equals(p, p.next) or _area(p.prev, p, p.next) == 0):
+            _remove_node(p)
+            p = end = p.prev
+            if p is p.next:
+                break
+            again = True
+        else:
+            p = p.next
+        if not again and p is end:
+            break
+    return end
+
+
+def _z_order(x: float, y: float, min_x: float, min_y: float, inv_size: float) -> int:
+    x = int((x - min_x) * inv_size)
+    y = int((y - min_y) * inv_size)
+    x = (x | (x << 8)) & 0x00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F
+    x = (x | (x << 2)) & 0x33333333
+    x = (x | (x << 1)) & 0x55555555
+    y = (y | (y << 8)) & 0x00FF00FF
+    y = (y | (y << 4)) & 0x0F0F0F0F
+    y = (y | (y << 2)) & 0x33333333
+    y = (y | (y << 1)) & 0x55555555
+    return x | (y << 1)
+
+
+def _index_curve(start: _Node, min_x: float, min_y: float, inv_size: float) -> None:
+    nodes = []
+    p = start
+    while True:
+        if p.z == 0:
+            p.z = _z_order(p.x, p.y, min_x, min_y, inv_size)
+        nodes.append(p)
+        p = p.next
+        if p is start:
+            break
+    nodes.sort(key=lambda node: node.z)
+    previous = None
+    for node in nodes:
+        node.prevZ = previous
+        if previous is not None:
+            previous.nextZ = node
+        previous = node
+    previous.nextZ = None
+
+
+def _is_ear(ear: _Node) -> bool:
+    a, b, c = ear.prev, ear, ear.next
+    if _area(a, b, c) >= 0:
+        return False
+    ax, ay, bx, by, cx, cy = a.x, a.y, b.x, b.y, c.x, c.y
+    x0, x1 = min(ax, bx, cx), max(ax, bx, cx)
+    y0, y1 = min(ay, by, cy), max(ay, by, cy)
+    p = c.next
+    while p is not a:
+        if (x0 <= p.x <= x1 and y0 <= p.y <= y1 and
+                _point_in_triangle(ax, ay, bx, by, cx, cy, p.x, p.y) and _area(p.prev, p, p.next) >= 0):
+            return False
+        p = p.next
+    return True
+
+
+def _is_ear_hashed(ear: _Node, min_x: float, min_y: float, inv_size: float) -> bool:
+    a, b, c = ear.prev, ear, ear.next
+    if _area(a, b, c) >= 0:
+        return False
+    ax, ay, bx, by, cx, cy = a.x, a.y, b.x, b.y, c.x, c.y
+    x0, x1 = min(ax, bx, cx), max(ax, bx, cx)
+    y0, y1 = min(ay, by, cy), max(ay, by, cy)
+    min_z = _z_order(x0, y0, min_x, min_y, inv_size)
+    max_z = _z_order(x1, y1, min_x, min_y, inv_size)
+
+    def blocks(p: _Node) -> bool:
+        return (x0 <= p.x <= x1 and y0 <= p.y <= y1 and p is not a and p is not c and
+                _point_in_triangle(ax, ay, bx, by, cx, cy, p.x, p.y) and _area(p.prev, p, p.next) >= 0)
+
+    # Only vertices in the z-order range of the ear's bounding box can be inside it
+    p = ear.prevZ
+    n = ear.nextZ
+    while p is not None and p.z >= min_z and n is not None and n.z <= max_z:
+        if blocks(p) or blocks(n):
+            return False
+        p = p.prevZ
+        n = n.nextZ
+    while p is not None and p.z >= min_z:
+        if blocks(p):
+            return False
+        p = p.prevZ
+    while n is not None and n.z <= max_z:
+        if blocks(n):
+            return False
+        n = n.nextZ
+    return True
+
+
+def _sign(value: float) -> int:
+    return (value > 0) - (value < 0)
+
+
+def _on_segment(p: _Node, q: _Node, r: _Node) -> bool:
+    return min(p.x, r.x) <= q.x <= max(p.x, r.x) and min(p.y, r.y) <= q.y <= max(p.y, r.y)
+
+
+def _intersects(p1: _Node, q1: _Node, p2: _Node, q2: _Node) -> bool:
+    o1 = _sign(_area(p1, q1, p2))
+    o2 = _sign(_area(p1, q1, q2))
+    o3 = _sign(_area(p2, q2, p1))
+    o4 = _sign(_area(p2, q2, q1))
+    if o1 != o2 and o3 != o4:
+        return True
+    return ((o1 == 0 and _on_segment(p1, p2, q1)) or (o2 == 0 and _on_segment(p1, q2, q1)) or
+            (o3 == 0 and _on_segment(p2, p1, q2)) or (o4 == 0 and _on_segment(p2, q1, q2)))
+
+
+def _intersects_polygon(a: _Node, b: _Node) -> bool:
+    p = a
+    while True:
+        if (p.i != a.i and p.next.i != a.i and p.i != b.i and p.next.i != b.i and
+                _intersects(p, p.next, a, b)):
+            return True
+        p = p.next
+        if p is a:
+            return False
+
+
+def _locally_inside(a: _Node, b: _Node) -> bool:
+    if _area(a.prev, a, a.next) < 0:
+        return _area(a, b, a.next) >= 0 and _area(a, a.prev, b) >= 0
+    return _area(a, b, a.prev) < 0 or _area(a, a.next, b) < 0
+
+
+def _middle_inside(a: _Node, b: _Node) -> bool:
+    p = a
+    inside = False
+    px = (a.x + b.x) / 2
+    py = (a.y + b.y) / 2
+    while True:
+        if ((p.y > py) != (p.next.y > py) and p.next.y != p.y and
+                px < (p.next.x - p.x) * (py - p.y) / (p.next.y - p.y) + p.x):
+            inside = not inside
+        p = p.next
+        if p is a:
+            return inside
+
+
+def _is_valid_diagonal(a: _Node, b: _Node) -> bool:
+    return (a.next.i != b.i and a.prev.i != b.i and not _intersects_polygon(a, b) and
+            ((_locally_inside(a, b) and _locally_inside(b, a) and _middle_inside(a, b) and
+              (_area(a.prev, a, b.prev) != 0 or _area(a, b.prev, b) != 0)) or
+             (_equals(a, b) and _area(a.prev, a, a.next) > 0 and _area(b.prev, b, b.next) > 0)))
+
+
+def _split_polygon(a: _Node, b: _Node) -> _Node:
+    # Link a to b with a diagonal, splitting the ring in two
+    a2 = _Node(a.i, a.x, a.y)
+    b2 = _Node(b.i, b.x, b.y)
+    an = a.next
+    bp = b.prev
+    a.next = b
+    b.prev = a
+    a2.next = an
+    an.prev = a2
+    b2.next = a2
+    a2.prev = b2
+    bp.next = b2
+    b2.prev = bp
+    return b2
+
+
+def _cure_local_intersections(start: _Node, triangles: List[int]) -> _Node:
+    p = start
+    while True:
+        a = p.prev
+        b = p.next.next
+        if not _equals(a, b) and _intersects(a, p, p.next, b) and _locally_inside(a, b) and _locally_inside(b, a):
+            triangles.extend((a.i, p.i, b.i))
+            _remove_node(p)
+            _remove_node(p.next)
+            p = start = b
+        p = p.next
+        if p is start:
+            break
+    return _filter_points(p)
+
+
+def _split_earcut(start: _Node, triangles: List[int], min_x: float, min_y: float, inv_size: float) -> None:
+    a = start
+    while True:
+        b = a.next.next
+        while b is not a.prev:
+            if a.i != b.i and _is_valid_diagonal(a, b):
+                c = _split_polygon(a, b)
+                a = _filter_points(a, a.next)
+                c = _filter_points(c, c.next)
+                _earcut_linked(a, triangles, min_x, min_y, inv_size, 0)
+                _earcut_linked(c, triangles, min_x, min_y, inv_size, 0)
+                return
+            b = b.next
+        a = a.next
+        if a is start:
+            return
+
+
+def _earcut_linked(ear: Optional[_Node], triangles: List[int], min_x: float, min_y: float, inv_size: float, rescue: int) -> None:
+    if ear is None:
+        return
+    if rescue == 0 and inv_size:
+        _index_curve(ear, min_x, min_y, inv_size)
+
+    stop = ear
+    while ear.prev is not ear.next:
+        prev = ear.prev
+        nxt = ear.next
+        if _is_ear_hashed(ear, min_x, min_y, inv_size) if inv_size else _is_ear(ear):
+            triangles.extend((prev.i, ear.i, nxt.i))
+            _remove_node(ear)
+            ear = stop = nxt.next
+            continue
+
+        ear = nxt
+        if ear is stop:
+            # No ear found in a full loop, clean up and try harder
+            if rescue == 0:
+                _earcut_linked(_filter_points(ear), triangles, min_x, min_y, inv_size, 1)
+            elif rescue == 1:
+                ear = _cure_local_intersections(_filter_points(ear), triangles)
+                _earcut_linked(ear, triangles, min_x, min_y, inv_size, 2)
+            else:
+                _split_earcut(ear, triangles, min_x, min_y, inv_size)
+            break
+
+
+def _leftmost(start: _Node) -> _Node:
+    p = start
+    leftmost = start
+    while True:
+        if p.x < leftmost.x or (p.x == leftmost.x and p.y < leftmost.y):
+            leftmost = p
+        p = p.next
+        if p is start:
+            return leftmost
+
+
+def _sector_contains_sector(m: _Node, p: _Node) -> bool:
+    return _area(m.prev, m, p.prev) < 0 and _area(p.next, m, m.next) < 0
+
+
+def _find_hole_bridge(hole: _Node, outer: _Node) -> Optional[_Node]:
+    # The outline vertex the leftmost hole vertex can see, found by casting a ray to the left
+    p = outer
+    hx, hy = hole.x, hole.y
+    qx = float('-inf')
+    m = None
+    while True:
+        if hy <= p.y and hy >= p.next.y and p.next.y != p.y:
+            x = p.x + (hy - p.y) * (p.next.x - p.x) / (p.next.y - p.y)
+            if hx >= x > qx:
+                qx = x
+                m = p if p.x < p.next.x else p.next
+                if x == hx:
+                    return m
+        p = p.next
+        if p is outer:
+            break
+    if m is None:
+        return None
+
+    stop = m
+    mx, my = m.x, m.y
+    tan_min = float('inf')
+    p = m
+    while True:
+        if (hx >= p.x >= mx and hx != p.x and
+                _point_in_triangle(hx if hy < my else qx, hy, mx, my, qx if hy < my else hx, hy, p.x, p.y)):
+            tan = abs(hy - p.y) / (hx - p.x)
+            if _locally_inside(p, hole) and (tan < tan_min or (tan == tan_min and (p.x > m.x or (p.x == m.x and _sector_contains_sector(m, p))))):
+                m = p
+                tan_min = tan
+        p = p.next
+        if p is stop:
+            return m
+
+
+def _eliminate_holes(data: List[float], hole_indices: List[int], outer: _Node) -> _Node:
+    queue = []
+    for k, start in enumerate(hole_indices):
+        start *= 2
+        end = hole_indices[k + 1] * 2 if k + 1 < len(hole_indices) else len(data)
+        ring = _linked_list(data, start, end, False)
+        if ring is None:
+            continue
+        if ring is ring.next:
+            ring.steiner = True
+        queue.append(_leftmost(ring))
+    queue.sort(key=lambda node: node.x)
+
+    for hole in queue:
+        bridge = _find_hole_bridge(hole, outer)
+        if bridge is None:
+            continue
+        bridge_reverse = _split_polygon(bridge, hole)
+        _filter_points(bridge_reverse, bridge_reverse.next)
+        outer = _filter_points(bridge, bridge.next)
+    return outer
+
+
+def earcut(data: List[float], hole_indices: Optional[List[int]] = None) -> List[int]:
+    '''
+    Triangulate a polygon with holes.
+
+    Parameters:
+    - data: Flat x, y coordinates of the outline followed by the holes.
+    - hole_indices: The vertex index where each hole starts.
+
+    :return: Vertex indices, three per triangle.
+    '''
+    has_holes = bool(hole_indices)
+    outer_len = hole_indices[0] * 2 if has_holes else len(data)
+    outer = _linked_list(data, 0, outer_len, True)
+    triangles: List[int] = []
+    if outer is None or outer.next is outer.prev:
+        return triangles
+    if has_holes:
+        outer = _eliminate_holes(data, hole_indices, outer)
+
+    min_x = min_y = 0.0
+    inv_size = 0.0
+    if len(data) > _HASHED_VERTICES * 2:
+        xs = data[0:outer_len:2]
+        ys = data[1:outer_len:2]
+        min_x, min_y = min(xs), min(ys)
+        size = max(max(xs) - min_x, max(ys) - min_y)
+        inv_size = 32767 / size if size else 0.0
+
+    _earcut_linked(outer, triangles, min_x, min_y, inv_size, 0)
+    return triangles
+
+
+def stripify(triangles: List[int]) -> List[int]:
+    '''
+    Join triangles into one triangle strip.
+
+    Neighbouring triangles are chained greedily across shared edges. Separate runs are joined with degenerate triangles, which cover nothing.
+
+    :return: Vertex indices of the strip.
+    '''
+    count = len(triangles) // 3
+    corners = [tuple(triangles[3 * t:3 * t + 3]) for t in range(count)]
+    edges = {}
+    for t, (a, b, c) in enumerate(corners):
+        for u, v in ((a, b), (b, c), (c, a)):
+            edges.setdefault((u, v) if u < v else (v, u), []).append(t)
+
+    used = [False] * count
+
+    def neighbour(u: int, v: int) -> Optional[int]:
+        for t in edges[(u, v) if u < v else (v, u)]:
+            if not used[t]:
+                return t
+        return None
+
+    strip: List[int] = []
+    for start in range(count):
+        if used[start]:
+            continue
+        used[start] = True
+        a, b, c = corners[start]
+        # Start so the last edge leads to an unused neighbour, if there is one
+        for rotation in ((a, b, c), (b, c, a), (c, a, b)):
+            if neighbour(rotation[1], rotation[2]) is not None:
+                a, b, c = rotation
+                break
+        run = [a, b, c]
+        while True:
+            u, v = run[-2], run[-1]
+            t = neighbour(u, v)
+            if t is None:
+                break
+            used[t] = True
+            run.append(next(w for w in corners[t] if w != u and w != v))
+        if strip:
+            strip.append(strip[-1])
+            strip.append(run[0])
+        strip.extend(run)
+    return strip
+
+
+def _flatten(outline) -> List[float]:
+    if hasattr(outline, 'tolist'):
+        outline = outline.tolist()
+    flat: List[float] = []
+    for point in outline:
+        if isinstance(point, VoVertex):
+            flat.append(point.x)
+            flat.append(point.y)
+        else:
+            flat.append(point[0])
+            flat.append(point[1])
+    return flat
+
+
+class Triangulator:
+    '''
+    Convert outlines to triangle strips, caching the strips of the most recently used outlines.
+
+    The cache is keyed by the coordinates of the outline and holes, so an unchanged outline costs a hash and a lookup.
+    '''
+
+    def __init__(self, cache_size: int = 256):
+        '''
+        Parameters:
+        - cache_size: The number of outlines kept in the cache. 0 disables caching.
+        '''
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[tuple, List[VoVertex]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def strip(self, outline, holes: Optional[Sequence] = None) -> List[VoVertex]:
+        '''
+        The triangle strip of a polygon.
+
+        Parameters:
+        - outline: The outline as (x, y) pairs, VoVertex objects or an (N, 2) array. It may be open or closed, in either winding.
+        - holes: Outlines of holes in the polygon.
+
+        :return: A new list of VoVertex. The VoVertex objects are shared with the cache and should not be modified.
+        '''
+        data = _flatten(outline)
+        hole_indices = []
+        for hole in holes or ():
+            hole_indices.append(len(data) // 2)
+            data.extend(_flatten(hole))
+
+        key = (tuple(data), tuple(hole_indices))
+        if self.cache_size:
+            with self._lock:
+                vertexes = self._cache.get(key)
+                if vertexes is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return list(vertexes)
+
+        indices = stripify(earcut(data, hole_indices))
+        vertexes = [VoVertex(x=data[2 * i], y=data[2 * i + 1]) for i in indices]
+
+        if self.cache_size:
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = vertexes
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(vertexes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_default_triangulator = Triangulator()
+
+
+def triangle_strip(outline, holes: Optional[Sequence] = None) -> List[VoVertex]:
+    '''
+    The triangle strip of a polygon, cached by a shared Triangulator. See Triangulator.strip().
+    '''
+    return _default_triangulator.strip(outline, holes)
+
+
+def polygon_from_outline(outline, holes: Optional[Sequence] = None, **kwargs) -> VoPolygon:
+    '''
+    A VoPolygon filled with the outline.
+
+    Parameters:
+    - outline: See Triangulator.strip().
+    - holes: See Triangulator.strip().
+    - kwargs: Other VoPolygon fields, for example name, fill or clickable.
+    '''
+    return VoPolygon(triangleStripVertexes=triangle_strip(outline, holes), **kwargs)
+
+
+def click_polygon_from_outline(outline, clickable: str, holes: Optional[Sequence] = None) -> ClickPolygon:
+    '''
+    A ClickPolygon covering the outline.
+    '''
+    return ClickPolygon(triangleStripVertexes=triangle_strip(outline, holes), clickable=clickable)
+
+
+def strip_triangles(vertexes: List[VoVertex]) -> List[Tuple[VoVertex, VoVertex, VoVertex]]:
+    '''
+    The non degenerate triangles of a triangle strip.
+    '''
+    return [(a, b, c) for a, b, c in zip(vertexes, vertexes[1:], vertexes[2:])
+            if (b.x - a.x) * (c.y - a.y) - (c.x - a.x) * (b.y - a.y) != 0.0]
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import List, Optional
 from cgcpluginlib import JsonObject
+from cgcpluginlib.jsonobject import SLOTS
 from cgcpluginlib import LabelType, ColourIndexType, Marker
 
 
@@ -13,11 +14,16 @@ class VisualObjectType(str, Enum):
     IMAGE = "IMAGE"
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoPoint(JsonObject):
     """
     A point is a visual object that is represented by a single point on the screen.
     """
+    _json_trailing_fields = ('visualObjectType',)
+
+    # Set from the default of each subclass, it is not an __init__ argument
+    visualObjectType: VisualObjectType = field(
+        default=VisualObjectType.POINT, init=False)
     name: str = ""
     xmin: float = 0.0
     ymin: float = 0.0
@@ -28,62 +34,63 @@ class VoPoint(JsonObject):
     marker: Optional[Marker] = None
 
     def __post_init__(self):
-        self.visualObjectType = VisualObjectType.POINT
+        # visualObjectType used to be set here, kept for subclasses that call super().__post_init__()
+        pass
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoVector(VoPoint):
     """
     A vector is a visual object that is represented by a line segment on the screen.
     """
+    visualObjectType: VisualObjectType = field(
+        default=VisualObjectType.VECTOR, init=False)
+
     xmax: float = 0.0
     ymax: float = 0.0
 
-    def __post_init__(self):
-        self.visualObjectType = VisualObjectType.VECTOR
-
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoBox(VoVector):
     """
     A box is a visual object that is represented by a rectangle on the screen.
     """
-    fill: Optional[ColourIndexType] = None
+    visualObjectType: VisualObjectType = field(
+        default=VisualObjectType.BOX, init=False)
 
-    def __post_init__(self):
-        self.visualObjectType = VisualObjectType.BOX
+    fill: Optional[ColourIndexType] = None
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoImage(VoBox):
     """
     An image is a visual object that is represented by an image on the screen.
     """
-    imageUrl: str = ""
+    visualObjectType: VisualObjectType = field(
+        default=VisualObjectType.IMAGE, init=False)
 
-    def __post_init__(self):
-        self.visualObjectType = VisualObjectType.IMAGE
+    imageUrl: str = ""
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoVertex(JsonObject):
     x: float = 0.0
     y: float = 0.0
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoPolygon(VoPoint):
     """
     A polygon is a visual object that is represented by a polygon on the screen.
     """
+    visualObjectType: VisualObjectType = field(
+        default=VisualObjectType.POLYGON, init=False)
+
     triangleStripVertexes: Optional[List[VoVertex]] = None
     fill: Optional[ColourIndexType] = None
 
-    def __post_init__(self):
-        self.visualObjectType = VisualObjectType.POLYGON
-
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class ClickPolygon(JsonObject):
     """
     A click polygon is a clickable polygon defined by a triangle strip.
@@ -92,7 +99,7 @@ class ClickPolygon(JsonObject):
     clickable: str = ""
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class ClickBox(JsonObject):
     """
     A click box is a clickable box defined by a rectangle.
@@ -104,7 +111,7 @@ class ClickBox(JsonObject):
     clickable: str = ""
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, **SLOTS)
 class VoClickMap(JsonObject):
     """
     A click map is a collection of clickable polygons and boxes.
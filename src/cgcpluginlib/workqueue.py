@@ -0,0 +1,227 @@
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Optional
+from cgcpluginlib import metrics, tracing
+
+
+class QueuePolicy(str, Enum):
+    """
+    What a WorkDispatcher does with new work when its workers are busy.
+      - LATEST_ONLY: Keep only the newest pending item, older pending items are dropped.
+      - DROP_OLDEST: Queue up to max_queue items, dropping the oldest pending item when full.
+      - PROCESS_ALL: Queue up to max_queue items, blocking the submitter when full so nothing is dropped.
+    """
+    LATEST_ONLY = "LATEST_ONLY"
+    DROP_OLDEST = "DROP_OLDEST"
+    PROCESS_ALL = "PROCESS_ALL"
+
+
+# Marks a sequence number that will never produce a result
+_SKIPPED = object()
+
+# Numbers the default names, so unnamed dispatchers do not share metrics
+_instance_numbers = itertools.count()
+
+
+class WorkDispatcher:
+    """
+    Run a callback on a pool of workers, fed from a bounded queue.
+
+    A WorkDispatcher is callable, so it can be passed as the callback of cpl.start_image_watcher and cpl.start_json_watcher. The watcher thread then only queues the file and goes straight back to discovering new files.
+
+    Example:
+        ```
+        dispatcher = WorkDispatcher(run_inference, workers=4, policy=QueuePolicy.DROP_OLDEST, on_result=write_result, ordered=True)
+        start_image_watcher(folder, stop_file, dispatcher)
+        ```
+    """
+
+    def __init__(self, callback: Callable[[Any], Any], workers: int = 1, policy: QueuePolicy = QueuePolicy.LATEST_ONLY, max_queue: int = 4, use_processes: bool = False, on_result: Optional[Callable[[Any, Any], None]] = None, ordered: bool = False, name: Optional[str] = None):
+        """
+        Parameters:
+          - callback: The function to run on every submitted item. It must be picklable (a module level function) when use_processes is True.
+          - workers: The number of items processed in parallel.
+          - policy: What to do with new items while the workers are busy, see QueuePolicy.
+          - max_queue: The maximum number of pending items for DROP_OLDEST and PROCESS_ALL.
+          - use_processes: Run the callback in a process pool instead of threads, for CPU bound callbacks.
+          - on_result: Called with (item, result) once an item has been processed.
+          - ordered: Deliver results to on_result in submission order. Results of dropped or failed items are skipped.
+          - name: The prefix of the worker thread names and of the metrics of this dispatcher, unique per dispatcher. WorkDispatcher-<n> by default.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+
+        self.callback = callback
+        self.policy = QueuePolicy(policy)
+        self.max_queue = 1 if self.policy == QueuePolicy.LATEST_ONLY else max_queue
+        self.on_result = on_result
+        self.ordered = ordered
+        if name is None:
+            name = f"WorkDispatcher-{next(_instance_numbers)}"
+        self.name = name
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        self._next_seq = 0
+
+        self._deliver_lock = threading.Lock()
+        self._results = {}
+        self._next_delivery = 0
+
+        # Seconds from submit until a worker took the item, and seconds the callback ran for
+        self._wait_histogram = metrics.histogram(f"{name}.queue_wait")
+        self._run_histogram = metrics.histogram(f"{name}.run")
+        metrics.gauge(name, self._metric_values)
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers) if use_processes else None
+        self._threads = []
+        for idx in range(workers):
+            thread = threading.Thread(
+                target=self._work, name=f"{name}-{idx}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __call__(self, item: Any) -> None:
+        self.submit(item)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of items waiting for a worker.
+        """
+        return len(self._queue)
+
+    def _metric_values(self) -> dict:
+        return {'queue_depth': len(self._queue), 'submitted': self.submitted, 'processed': self.processed,
+                'dropped': self.dropped, 'failed': self.failed}
+
+    def submit(self, item: Any) -> None:
+        """
+        Queue an item, applying the queue policy if the queue is full.
+
+        Parameters:
+          - item: The item to pass to the callback, for example a file path.
+        """
+        dropped = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WorkDispatcher is closed")
+
+            if len(self._queue) >= self.max_queue:
+                if self.policy == QueuePolicy.PROCESS_ALL:
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        raise RuntimeError("WorkDispatcher is closed")
+                else:
+                    while len(self._queue) >= self.max_queue:
+                        dropped.append(self._queue.popleft())
+
+            seq = self._next_seq
+            self._next_seq += 1
+            self.submitted += 1
+            self.dropped += len(dropped)
+            self._queue.append((seq, item, time.perf_counter() if metrics.ENABLED or tracing.ENABLED else None))
+            self._not_empty.notify()
+
+        for dropped_seq, dropped_item, _ in dropped:
+            self._complete(dropped_seq, dropped_item, _SKIPPED)
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stop accepting items. Items already queued are still processed.
+
+        Parameters:
+          - wait: Block until the queued items have been processed.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+                if not self._queue:
+                    return
+                seq, item, submitted = self._queue.popleft()
+                self._not_full.notify()
+
+            if submitted is not None:
+                start = time.perf_counter()
+                if metrics.ENABLED:
+                    self._wait_histogram.record(start - submitted)
+                tracing.add_span('queue_wait', submitted, start, 'dispatcher', item=item)
+
+            try:
+                if self._executor is not None:
+                    result = self._executor.submit(
+                        self.callback, item).result()
+                else:
+                    result = self.callback(item)
+            except Exception:
+                traceback.print_exc()
+                with self._lock:
+                    self.failed += 1
+                result = _SKIPPED
+            else:
+                with self._lock:
+                    self.processed += 1
+            if submitted is not None:
+                end = time.perf_counter()
+                if metrics.ENABLED:
+                    self._run_histogram.record(end - start)
+                tracing.add_span(self.name, start, end, 'dispatcher', item=item)
+
+            self._complete(seq, item, result)
+
+    def _complete(self, seq: int, item: Any, result: Any) -> None:
+        if self.on_result is None:
+            return
+
+        if not self.ordered:
+            if result is not _SKIPPED:
+                self._deliver(item, result)
+            return
+
+        # Hold results back until every earlier item has finished or been dropped
+        with self._deliver_lock:
+            self._results[seq] = (item, result)
+            while self._next_delivery in self._results:
+                ready_item, ready_result = self._results.pop(
+                    self._next_delivery)
+                self._next_delivery += 1
+                if ready_result is not _SKIPPED:
+                    self._deliver(ready_item, ready_result)
+
+    def _deliver(self, item: Any, result: Any) -> None:
+        # An exception from on_result must not kill the worker, or PROCESS_ALL submitters would block forever
+        try:
+            self.on_result(item, result)
+        except Exception:
+            traceback.print_exc()